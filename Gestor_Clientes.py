@@ -2,65 +2,451 @@
 # github: https://github.com/cybersecrd
 
 import pandas as pd
-import os
+import argparse
+import base64
+import queue
+import threading
+import time
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import seaborn as sns
-import numpy as np
 
-# Configuración para gráficos
-plt.style.use('default')
-sns.set_palette("husl")
+from almacenamiento import (ARCHIVO_EXCEL, ARCHIVO_SQLITE, COLUMNAS_CLIENTES, FORMATO_FECHA, OPCIONES_CAMPOS,
+                            AlmacenamientoSQLite, abrir_almacenamiento, asignar_valor)
+from clientes import AlmacenClientes, periodos_agenda
+from concurrencia import ConflictoEdicion
+from esquema import concatenar, validar_cambios, validar_valor
+from estadisticas import informe_texto
+from exportacion import FORMATOS_EXPORTACION, exportar
+from importacion import preparar_importacion
+from instrumentacion import FASES, UMBRAL_LENTO, DialogosSinMedir, medido, medidor, texto_lenta
+from tabla_virtual import TablaVirtual
+from trabajador import TrabajadorAlmacenamiento
+
+# El tiempo que el usuario pasa en un diálogo no cuenta en la duración de las operaciones
+messagebox = DialogosSinMedir(messagebox)
+filedialog = DialogosSinMedir(filedialog)
+
+# matplotlib y seaborn se importan al abrir los gráficos por primera vez
+# (ver cargar_graficos), no al arrancar la aplicación
 
 class GestorClientesApp:
-    def __init__(self, root):
+    # Búsqueda rápida: espera tras la última tecla
+    RETARDO_BUSQUEDA_MS = 250
+    
+    # Pestañas de la ventana de gráficos: clave en graficos.FIGURAS (o el
+    # informe en texto) y título
+    PESTANAS_GRAFICOS = [
+        ('estados', "Gráficos Principales"),
+        ('propuestas', "Seguimiento Propuestas"),
+        ('localidades', "Localidades"),
+        ('estadisticas', "Estadísticas"),
+    ]
+    DPI_GRAFICOS = 100
+    
+    # Refresco del panel de diagnóstico mientras está abierto
+    INTERVALO_DIAGNOSTICO_MS = 2000
+
+    # Sondeo de los resultados del hilo de E/S y comprobación de cambios externos
+    INTERVALO_TRABAJADOR_MS = 100
+    INTERVALO_CAMBIOS_MS = 2000
+
+    def __init__(self, root, ruta_diagnostico=None):
         self.root = root
         self.root.title("Sistema de Gestión de Clientes Potenciales")
         self.root.geometry("1300x800")
         self.root.configure(bg='#f0f0f0')
         
-        self.archivo_excel = "clientes_potenciales.xlsx"
-        self.columnas = [
-            'ID', 'Nombre_Empresa', 'Sector', 'Localidad', 'Telefono', 
-            'Correo_Electronico', 'Estado_Contacto', 'Fecha_Contacto', 
-            'Observaciones', 'Sitio_Web_Actual', 'Interes', 'Fecha_Proximo_Contacto',
-            'Es_Cliente', 'Solicito_Propuesta', 'Se_Le_Envio_Propuesta', 'Fecha_Envio_Propuesta'
-        ]
-        
-        self.inicializar_archivo()
-        self.crear_interfaz()
-        self.actualizar_lista_clientes()
-    
-    def inicializar_archivo(self):
-        """Crea el archivo Excel si no existe"""
-        if not os.path.exists(self.archivo_excel):
-            df = pd.DataFrame(columns=self.columnas)
-            df.to_excel(self.archivo_excel, index=False)
-    
-    def leer_clientes(self):
-        """Lee todos los clientes del archivo Excel"""
-        try:
-            df = pd.read_excel(self.archivo_excel)
-            # Asegurar que las columnas existan
-            for col in self.columnas:
-                if col not in df.columns:
-                    df[col] = None
-            return df
-        except Exception as e:
-            print(f"Error al leer archivo: {e}")
-            return pd.DataFrame(columns=self.columnas)
+        self.archivo_excel = ARCHIVO_EXCEL
+        self.archivo_sqlite = ARCHIVO_SQLITE
+        self.columnas = list(COLUMNAS_CLIENTES)
+
+        # Versión de los datos mostrada en cada parte de la interfaz
+        self._version_estadisticas = None
+        self._version_tabla = None
+
+        # Ventanas de la agenda y del diagnóstico abiertas (ver mostrar_agenda y mostrar_diagnostico)
+        self.agenda = None
+        self.diagnostico = None
+        # Archivo JSON donde se guardan las mediciones al cerrar
+        self.ruta_diagnostico = ruta_diagnostico
+
+        # Módulo de gráficos, importado la primera vez que se usa
+        self._graficos = None
+        # Último PNG dibujado de cada gráfico: pestaña -> (versión, tamaño, bytes)
+        self._graficos_cache = {}
+
+        # Estado de la búsqueda rápida en segundo plano
+        self._busqueda_pendiente = None
+        self._generacion_busqueda = 0
+        self._busqueda_en_curso = None
+        self._sondeando_busqueda = False
+        self._ultima_busqueda = None
+        self._resultados_busqueda = queue.Queue()
+
+        # Duración de cada fase del arranque, en segundos
+        self.tiempos_inicio = {}
+        # Última comprobación de cambios externos (time.monotonic)
+        self._ultima_comprobacion = time.monotonic()
+
+        # La ventana se pinta enseguida; los datos llegan desde el hilo de E/S
+        self.clientes = self.medir_fase('almacenamiento', self.crear_almacen_clientes)
+        self.medir_fase('inicializar', self.clientes.inicializar)
+        self.medir_fase('interfaz', self.crear_interfaz_completa)
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar_aplicacion)
+        self.cargar_clientes()
+        self.root.after(self.INTERVALO_TRABAJADOR_MS, self.atender_trabajador)
     
+    def medir_fase(self, nombre, funcion):
+        """Ejecuta una fase del arranque y registra su duración"""
+        inicio = time.perf_counter()
+        resultado = funcion()
+        self.tiempos_inicio[nombre] = time.perf_counter() - inicio
+        return resultado
+
+    def reportar_tiempos_inicio(self):
+        """Muestra en consola cuánto tardó cada fase del arranque"""
+        fases = dict(self.tiempos_inicio)
+        almacenamiento = self.clientes.almacenamiento
+        for fase, segundos in almacenamiento.tiempos_lectura.items():
+            fases[f'carga_datos.{fase}'] = segundos
+        detalle = ', '.join(f"{fase}={segundos * 1000:.0f} ms" for fase, segundos in fases.items())
+        total = sum(self.tiempos_inicio.values())
+        print(f"Arranque en {total * 1000:.0f} ms ({almacenamiento.nombre}): {detalle}")
+        memoria, por_cliente = self.clientes.memoria
+        print(f"Datos en memoria: {memoria / 2**20:.1f} MB ({por_cliente:.0f} B por cliente)")
+
+    def cargar_clientes(self):
+        """Pide al hilo de E/S la carga inicial de los clientes"""
+        trabajador = self.clientes.trabajador
+        self.mostrar_estado("Cargando clientes...")
+
+        def cargar():
+            return self.clientes.cargar(lambda filas: trabajador.avisar('progreso', filas=filas))
+
+        trabajador.tarea('carga', cargar,
+                         contexto={'version': self.clientes.version, 'inicial': True})
+
+    def comprobar_cambios_externos(self):
+        """Pide al hilo de E/S que relea los datos si otro proceso los modificó"""
+        self._ultima_comprobacion = time.monotonic()
+        self.clientes.trabajador.tarea('carga', self.clientes.comprobar_cambios,
+                                       contexto={'version': self.clientes.version, 'inicial': False})
+
+    def atender_trabajador(self):
+        """Recoge en el hilo de Tk los resultados del hilo de E/S"""
+        trabajador = self.clientes.trabajador
+        while True:
+            try:
+                aviso = trabajador.resultados.get_nowait()
+            except queue.Empty:
+                break
+            if aviso['tipo'] in ('escritura', 'tarea'):
+                # Lo que tardó el hilo de E/S, como operación propia
+                fase = 'escritura' if aviso['tipo'] == 'escritura' else 'lectura'
+                medidor.registrar(f"disco.{aviso.get('nombre', 'escritura')}", aviso['segundos'],
+                                  {fase: aviso['segundos']})
+            if aviso['tipo'] == 'progreso':
+                self.mostrar_estado(f"Cargando clientes... {aviso['filas']:,} leídos")
+            elif aviso['tipo'] == 'progreso_importacion':
+                self.mostrar_estado(f"Importando... {aviso['filas']:,} filas leídas")
+            elif aviso['tipo'] == 'escritura':
+                self.recibir_escritura(aviso)
+            elif aviso['tipo'] == 'tarea' and aviso['nombre'] == 'carga':
+                self.recibir_carga(aviso)
+            elif aviso['tipo'] == 'tarea' and aviso['nombre'] == 'importacion':
+                self.recibir_importacion(aviso)
+
+        pendientes = trabajador.escrituras_pendientes()
+        if pendientes:
+            self.mostrar_estado(f"Guardando {pendientes} cambio(s)...")
+        elif (self.clientes.cargado() and not trabajador.ocupado()
+              and time.monotonic() - self._ultima_comprobacion >= self.INTERVALO_CAMBIOS_MS / 1000):
+            self.comprobar_cambios_externos()
+        self.root.after(self.INTERVALO_TRABAJADOR_MS, self.atender_trabajador)
+
+    @medido()
+    def recibir_carga(self, aviso):
+        """Pasa a la memoria y a la tabla los datos leídos por el hilo de E/S"""
+        contexto = aviso['contexto']
+        if aviso['error'] is not None:
+            print(f"Error al leer archivo: {aviso['error']}")
+            if contexto['inicial']:
+                # Seguir con un conjunto vacío, como antes de leer en segundo plano
+                self.clientes.establecer(pd.DataFrame(columns=self.columnas), None)
+                self.actualizar_lista_clientes()
+            self.mostrar_estado("Error al leer los clientes")
+            return
+        if aviso['resultado'] is None:
+            return
+        if contexto['version'] != self.clientes.version and not contexto['inicial']:
+            # Hubo ediciones mientras se releía: la próxima comprobación lo repite
+            return
+
+        df, firma = aviso['resultado']
+        self.clientes.establecer(df, firma)
+        inicio = time.perf_counter()
+        self.actualizar_lista_clientes()
+        if contexto['inicial']:
+            self.mostrar_estado(f"{len(df):,} clientes cargados en {aviso['segundos'] * 1000:.0f} ms")
+        else:
+            self.mostrar_estado(f"Datos modificados externamente: {len(df):,} clientes recargados")
+        if contexto['inicial']:
+            self.tiempos_inicio['carga_datos'] = aviso['segundos']
+            self.tiempos_inicio['tabla'] = time.perf_counter() - inicio
+            self.reportar_tiempos_inicio()
+            self.clientes.preparar_indices()
+
+    def recibir_escritura(self, aviso):
+        """Informa del resultado de una tanda de escrituras en segundo plano"""
+        if isinstance(aviso['error'], ConflictoEdicion):
+            messagebox.showwarning("Conflicto de edición",
+                                   f"{aviso['error']}\n\nSe recargan los datos con los cambios del otro usuario.")
+            self.clientes.descartar_firma()
+            self.comprobar_cambios_externos()
+            return
+        if aviso['error'] is not None:
+            messagebox.showerror("Error", f"Error al guardar: {aviso['error']}")
+            # Volver a lo que realmente quedó en disco
+            self.clientes.descartar_firma()
+            self.comprobar_cambios_externos()
+            return
+        self.mostrar_estado(
+            f"Guardado: {aviso['operaciones']} cambio(s) en {aviso['escrituras']} escritura(s), "
+            f"{aviso['segundos'] * 1000:.0f} ms"
+        )
+
+    def mostrar_estado(self, texto):
+        """Muestra el estado de la carga o del guardado junto a la tabla"""
+        self.estado_label.config(text=texto)
+
+    def crear_interfaz_completa(self):
+        """Crea la barra de menú y la interfaz principal"""
+        self.crear_menu()
+        self.crear_interfaz()
+
+
+    def crear_almacen_clientes(self):
+        """Usa la base SQLite si ya fue migrada; si no, el archivo Excel"""
+        almacenamiento = abrir_almacenamiento(self.archivo_excel, self.archivo_sqlite, self.columnas)
+        return AlmacenClientes(almacenamiento, self.columnas, TrabajadorAlmacenamiento())
+
     def guardar_clientes(self, df):
-        """Guarda el DataFrame en el archivo Excel"""
+        """Guarda el DataFrame completo"""
+        return self.persistir(self.clientes.guardar, df)
+
+    def insertar_clientes(self, df, filas):
+        """Persiste filas nuevas; df es el conjunto completo ya actualizado"""
+        return self.persistir(self.clientes.insertar, df, filas)
+
+    def actualizar_clientes(self, df, ids, cambios, versiones=None):
+        """Persiste los cambios de los IDs dados; df ya los contiene.
+
+        `versiones` es la que tenían las filas al abrir el formulario.
+        """
+        return self.persistir(self.clientes.actualizar, df, ids, cambios, versiones)
+
+    def eliminar_clientes(self, df, ids, versiones=None):
+        """Persiste la eliminación de los IDs dados; df ya no los contiene"""
+        return self.persistir(self.clientes.eliminar, df, ids, versiones)
+
+    def persistir(self, operacion, *args):
+        """Ejecuta una escritura del almacén de clientes, avisando si falla.
+
+        La escritura en disco sigue en el hilo de E/S; sus errores llegan
+        después por recibir_escritura.
+        """
+        if not self.clientes.cargado():
+            messagebox.showwarning("Cargando", "Espera a que terminen de cargarse los clientes.")
+            return False
         try:
-            df.to_excel(self.archivo_excel, index=False)
-            return True
+            with medidor.fase('escritura'):
+                operacion(*args)
+        except ConflictoEdicion as e:
+            # El cambio del otro usuario ya está en memoria y en la tabla
+            messagebox.showwarning("Conflicto de edición",
+                                   f"{e}\n\nVuelve a abrir el cliente para ver sus datos actuales.")
+            return False
         except Exception as e:
             messagebox.showerror("Error", f"Error al guardar: {e}")
             return False
+        return True
+
+    def crear_menu(self):
+        """Crea la barra de menú con las opciones de archivo"""
+        menubar = tk.Menu(self.root)
+        menu_archivo = tk.Menu(menubar, tearoff=0)
+        menu_archivo.add_command(label="Migrar a SQLite", command=self.migrar_a_sqlite)
+        menu_archivo.add_command(label="Importar clientes...", command=self.importar_clientes)
+        menu_archivo.add_command(label="Exportar a Excel...", command=self.exportar_excel)
+        menu_archivo.add_command(label="Exportar vista actual...", command=self.exportar_vista)
+        menu_archivo.add_separator()
+        menu_archivo.add_command(label="Salir", command=self.cerrar_aplicacion)
+        menubar.add_cascade(label="Archivo", menu=menu_archivo)
+        menu_herramientas = tk.Menu(menubar, tearoff=0)
+        menu_herramientas.add_command(label="Agenda de seguimiento...", command=self.mostrar_agenda)
+        menu_herramientas.add_command(label="Buscar duplicados...", command=self.mostrar_duplicados)
+        menu_herramientas.add_separator()
+        menu_herramientas.add_command(label="Diagnóstico de rendimiento...", command=self.mostrar_diagnostico)
+        menubar.add_cascade(label="Herramientas", menu=menu_herramientas)
+        self.root.config(menu=menubar)
+
+    @medido()
+    def migrar_a_sqlite(self):
+        """Copia el archivo Excel a una base SQLite y pasa a usarla como almacenamiento"""
+        if isinstance(self.clientes.almacenamiento, AlmacenamientoSQLite):
+            messagebox.showinfo("Migración", "Los datos ya se guardan en SQLite.")
+            return
+
+        try:
+            total = self.clientes.migrar_a_sqlite(self.archivo_sqlite)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al migrar: {e}")
+            return
+
+        self.comprobar_cambios_externos()
+        messagebox.showinfo("Migración", f"Se migraron {total} clientes a {self.archivo_sqlite}.")
+
+    def cerrar_aplicacion(self):
+        """Espera las escrituras en curso, compacta los cambios pendientes y cierra la ventana"""
+        self.mostrar_estado("Guardando cambios pendientes...")
+        self.root.update_idletasks()
+        self.clientes.cerrar()
+        if self.ruta_diagnostico:
+            try:
+                medidor.volcar(self.ruta_diagnostico)
+            except OSError as e:
+                print(f"Error al guardar el diagnóstico: {e}")
+        self.root.destroy()
+
+    @medido()
+    def importar_clientes(self):
+        """Importa clientes desde un CSV o XLSX; la lectura y validación van en el hilo de E/S"""
+        if not self.clientes.cargado():
+            messagebox.showwarning("Cargando", "Espera a que terminen de cargarse los clientes.")
+            return
+        ruta = filedialog.askopenfilename(
+            title="Importar clientes",
+            filetypes=[("CSV o Excel", "*.csv *.txt *.xlsx *.xlsm"), ("Todos los archivos", "*.*")]
+        )
+        if not ruta:
+            return
+
+        trabajador = self.clientes.trabajador
+        self.mostrar_estado("Importando...")
+
+        def preparar():
+            return preparar_importacion(
+                ruta, self.columnas,
+                progreso=lambda filas: trabajador.avisar('progreso_importacion', filas=filas)
+            )
+
+        trabajador.tarea('importacion', preparar)
+
+    @medido()
+    def recibir_importacion(self, aviso):
+        """Da de alta en un solo bloque las filas válidas y muestra el informe de la importación"""
+        if aviso['error'] is not None:
+            self.mostrar_estado("")
+            messagebox.showerror("Error", f"Error al importar: {aviso['error']}")
+            return
+
+        lote = aviso['resultado']
+        version = self.clientes.version
+        inicio = time.perf_counter()
+        try:
+            ids = self.clientes.importar(lote.clientes)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al guardar: {e}")
+            return
+        if ids:
+            self.refrescar_tabla(self.tabla.insertar_filas, ids, version)
+        segundos = time.perf_counter() - inicio
+        self.mostrar_estado(f"Importados {len(ids):,} clientes")
+
+        informe = lote.informe(segundos)
+        if not len(lote.rechazadas):
+            messagebox.showinfo("Importación", informe)
+            return
+        if messagebox.askyesno("Importación", informe + "\n\n¿Guardar las filas rechazadas en un CSV?"):
+            ruta = filedialog.asksaveasfilename(
+                title="Guardar filas rechazadas", defaultextension=".csv",
+                initialfile="rechazadas.csv", filetypes=[("CSV", "*.csv")]
+            )
+            if ruta:
+                try:
+                    lote.guardar_rechazadas(ruta)
+                except Exception as e:
+                    messagebox.showerror("Error", f"Error al guardar las filas rechazadas: {e}")
+
+    @medido()
+    def exportar_excel(self):
+        """Exporta todos los clientes a un libro .xlsx elegido por el usuario"""
+        if not self.clientes.cargado():
+            messagebox.showwarning("Cargando", "Espera a que terminen de cargarse los clientes.")
+            return
+        ruta = filedialog.asksaveasfilename(
+            title="Exportar a Excel", defaultextension=".xlsx",
+            filetypes=[("Libro de Excel", "*.xlsx")]
+        )
+        if not ruta:
+            return
+
+        self.lanzar_exportacion(ruta, self.clientes.arreglos_columnas())
+
+    @medido()
+    def exportar_vista(self):
+        """Exporta lo que muestra la tabla (búsqueda o filtro actual) a CSV, JSONL o XLSX"""
+        datos, posiciones = self.tabla.vista_actual()
+        if not len(posiciones):
+            messagebox.showwarning("Advertencia", "La tabla no muestra ningún cliente.")
+            return
+        ruta = filedialog.asksaveasfilename(
+            title="Exportar vista actual", defaultextension=".csv",
+            filetypes=[(nombre, f"*{extension}") for extension, nombre in FORMATOS_EXPORTACION.items()]
+        )
+        if not ruta:
+            return
+
+        self.lanzar_exportacion(ruta, datos, posiciones)
+
+    def lanzar_exportacion(self, ruta, datos, posiciones=None):
+        """Escribe el archivo por bloques en un hilo aparte, mostrando el avance junto a la tabla"""
+        cola = queue.Queue()
+        inicio = time.perf_counter()
+
+        def escribir():
+            try:
+                progreso = lambda escritas, total: cola.put(('progreso', (escritas, total)))
+                cola.put(('fin', exportar(ruta, datos, self.columnas, posiciones, progreso)))
+            except Exception as e:
+                cola.put(('error', e))
+
+        self.mostrar_estado("Exportando...")
+        threading.Thread(target=escribir, daemon=True).start()
+        self.root.after(100, lambda: self.recibir_exportacion(cola, ruta, inicio))
+
+    def recibir_exportacion(self, cola, ruta, inicio):
+        """Muestra, desde el hilo de Tk, el avance y el final de una exportación"""
+        tipo = dato = None
+        try:
+            while True:
+                tipo, dato = cola.get_nowait()
+                if tipo != 'progreso':
+                    break
+        except queue.Empty:
+            pass
+        if tipo == 'error':
+            self.mostrar_estado("")
+            messagebox.showerror("Error", f"Error al exportar: {dato}")
+            return
+        if tipo == 'fin':
+            self.mostrar_estado(f"Exportados {dato:,} clientes en {time.perf_counter() - inicio:.1f} s")
+            messagebox.showinfo("Exportar", f"{dato:,} clientes exportados a {ruta}")
+            return
+        if tipo == 'progreso':
+            self.mostrar_estado(f"Exportando... {dato[0]:,} de {dato[1]:,}")
+        self.root.after(200, lambda: self.recibir_exportacion(cola, ruta, inicio))
     
     def crear_interfaz(self):
         """Crea la interfaz gráfica principal"""
@@ -102,7 +488,8 @@ class GestorClientesApp:
             ('Sin Web:', 'sin_web'),
             ('Interés Alto:', 'interes_alto'),
             ('Clientes:', 'es_cliente'),
-            ('Propuestas Env:', 'propuestas_env')
+            ('Propuestas Env:', 'propuestas_env'),
+            ('Vencidos:', 'vencidos')
         ]
         
         for text, key in stats_info:
@@ -120,6 +507,7 @@ class GestorClientesApp:
             ("➕ Agregar Cliente", self.mostrar_formulario_agregar),
             ("✏️ Modificar Seleccionado", self.mostrar_formulario_modificar),
             ("🗑️ Eliminar Seleccionado", self.eliminar_cliente),
+            ("📅 Agenda", self.mostrar_agenda),
             ("📊 Ver Gráficos", self.mostrar_graficos),
             ("🔄 Actualizar Lista", self.actualizar_lista_clientes)
         ]
@@ -144,6 +532,7 @@ class GestorClientesApp:
                                             state='readonly')
         self.criterio_busqueda.set('Nombre_Empresa')
         self.criterio_busqueda.pack(fill=tk.X, pady=5)
+        self.criterio_busqueda.bind('<<ComboboxSelected>>', self.buscar_cliente)
         
         # Botón búsqueda avanzada
         ttk.Button(frame_busqueda, text="🔍 Búsqueda Avanzada", 
@@ -177,19 +566,14 @@ class GestorClientesApp:
         frame_tabla = ttk.Frame(parent)
         frame_tabla.pack(fill=tk.BOTH, expand=True, pady=10)
         
-        # Label de información
-        self.info_label = ttk.Label(frame_tabla, text="Total de clientes: 0", 
+        # Label de información y estado de la carga / guardado
+        frame_info = ttk.Frame(frame_tabla)
+        frame_info.pack(fill=tk.X, pady=5)
+        self.info_label = ttk.Label(frame_info, text="Total de clientes: 0", 
                                    font=('Arial', 10))
-        self.info_label.pack(anchor=tk.W, pady=5)
-        
-        # Scrollbars
-        v_scroll = ttk.Scrollbar(frame_tabla, orient=tk.VERTICAL)
-        h_scroll = ttk.Scrollbar(frame_tabla, orient=tk.HORIZONTAL)
-        
-        # Treeview
-        self.tree = ttk.Treeview(frame_tabla, columns=self.columnas, show='headings',
-                                yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set,
-                                height=20)
+        self.info_label.pack(side=tk.LEFT)
+        self.estado_label = ttk.Label(frame_info, text="", font=('Arial', 9), foreground='#555555')
+        self.estado_label.pack(side=tk.RIGHT)
         
         # Configurar columnas
         anchos_columnas = {
@@ -211,93 +595,148 @@ class GestorClientesApp:
             'Fecha_Envio_Propuesta': 120
         }
         
-        for col in self.columnas:
-            ancho = anchos_columnas.get(col, 100)
-            self.tree.heading(col, text=col.replace('_', ' ').title())
-            self.tree.column(col, width=ancho, minwidth=50)
-        
-        v_scroll.config(command=self.tree.yview)
-        h_scroll.config(command=self.tree.xview)
-        
-        # Empaquetar treeview y scrollbars
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        # Navegación por páginas, debajo de la tabla
+        frame_paginas = ttk.Frame(frame_tabla)
+        frame_paginas.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+        for texto, paso in (("⏮", 'primera'), ("◀", -1)):
+            ttk.Button(frame_paginas, text=texto, width=3,
+                      command=lambda p=paso: self.cambiar_pagina(p)).pack(side=tk.LEFT, padx=2)
+        self.paginas_label = ttk.Label(frame_paginas, text="", width=40, anchor='center')
+        self.paginas_label.pack(side=tk.LEFT, padx=5)
+        for texto, paso in (("▶", 1), ("⏭", 'ultima')):
+            ttk.Button(frame_paginas, text=texto, width=3,
+                      command=lambda p=paso: self.cambiar_pagina(p)).pack(side=tk.LEFT, padx=2)
+        ttk.Label(frame_paginas, text="Click en un encabezado para ordenar (Mayús: orden secundario)",
+                 font=('Arial', 9), foreground='#555555').pack(side=tk.RIGHT)
+        
+        # Tabla virtual: solo las filas visibles existen como ítems del Treeview
+        self.tabla = TablaVirtual(frame_tabla, self.columnas, anchos_columnas, self.color_fila)
+        self.tree = self.tabla.tree
         
         # Bind events
-        self.tree.bind('<Double-1>', self.editar_doble_click)
-        self.tree.bind('<<TreeviewSelect>>', self.actualizar_info_seleccion)
+        self.tabla.al_doble_click = self.editar_doble_click
+        self.tabla.al_seleccionar = self.actualizar_info_seleccion
+        self.tabla.al_desplazar = self.actualizar_paginas
+        # Orden por encabezados con las permutaciones guardadas por versión de datos
+        self.tabla.ordenar = self.ordenar_vista
+    
+    def ordenar_vista(self, posiciones, claves):
+        """Ordena las posiciones de una tabla (ver AlmacenClientes.ordenar_posiciones)"""
+        with medidor.fase('consulta'):
+            return self.clientes.ordenar_posiciones(posiciones, claves)
+    
+    @medido()
+    def cambiar_pagina(self, paso):
+        """Va a la primera, la última, la anterior (-1) o la siguiente (1) página de la tabla"""
+        actual, paginas = self.tabla.pagina()
+        destino = {'primera': 1, 'ultima': paginas}.get(paso)
+        self.tabla.ir_a_pagina(destino if destino is not None else actual + paso)
+    
+    def actualizar_paginas(self):
+        """Muestra la página y las filas a la vista"""
+        total = self.tabla.total()
+        actual, paginas = self.tabla.pagina()
+        desde = min(self.tabla.inicio + 1, total)
+        hasta = min(self.tabla.inicio + self.tabla.filas_visibles, total)
+        self.paginas_label.config(text=f"Página {actual:,} de {paginas:,} · filas {desde:,}–{hasta:,} de {total:,}")
     
     def actualizar_estadisticas_rapidas(self):
         """Actualiza las estadísticas rápidas en el panel izquierdo"""
-        df = self.leer_clientes()
-        total = len(df)
-        
-        stats = {
-            'total_clientes': total,
-            'sin_web': len(df[df['Sitio_Web_Actual'] == 'No tiene']),
-            'interes_alto': len(df[df['Interes'] == 'Alto']),
-            'es_cliente': len(df[df['Es_Cliente'] == 'SI']),
-            'propuestas_env': len(df[df['Se_Le_Envio_Propuesta'] == 'SI'])
-        }
-        
-        for key, value in stats.items():
-            self.stats_labels[key].config(text=str(value))
+        # Los vencidos cambian también al cambiar el día
+        version = (self.clientes.version, datetime.now().date())
+        if self._version_estadisticas == version:
+            return
+        self._version_estadisticas = version
+
+        with medidor.fase('consulta'):
+            resumen = self.clientes.resumen()
+            stats = {
+                'total_clientes': resumen.total,
+                'sin_web': resumen.conteo('Sitio_Web_Actual', 'No tiene'),
+                'interes_alto': resumen.conteo('Interes', 'Alto'),
+                'es_cliente': resumen.conteo('Es_Cliente', 'SI'),
+                'propuestas_env': resumen.conteo('Se_Le_Envio_Propuesta', 'SI'),
+                'vencidos': self.clientes.contar_agenda(*periodos_agenda()['vencidos'])
+            }
+        
+        with medidor.fase('tk'):
+            for key, value in stats.items():
+                self.stats_labels[key].config(text=str(value))
+        self.refrescar_agenda()
     
     def actualizar_info_seleccion(self, event=None):
         """Actualiza la información de la selección actual"""
-        seleccion = self.tree.selection()
+        seleccion = self.tabla.ids_seleccionados()
         if seleccion:
             texto = f"Clientes seleccionados: {len(seleccion)}"
         else:
-            texto = f"Total de clientes: {len(self.tree.get_children())}"
+            texto = f"Total de clientes: {self.tabla.total()}"
         self.info_label.config(text=texto)
     
+    @medido()
     def aplicar_filtro_rapido(self, filtro):
         """Aplica filtros rápidos desde el panel izquierdo"""
-        df = self.leer_clientes()
-        
         if filtro in ['Por contactar', 'Contactado', 'En seguimiento', 'No interesado', 'Cliente']:
-            resultados = df[df['Estado_Contacto'] == filtro]
+            criterios = {'Estado_Contacto': filtro}
         elif filtro == 'Alto':
-            resultados = df[df['Interes'] == 'Alto']
+            criterios = {'Interes': 'Alto'}
         elif filtro == 'SI':
-            resultados = df[df['Se_Le_Envio_Propuesta'] == 'SI']
+            criterios = {'Se_Le_Envio_Propuesta': 'SI'}
         else:
-            resultados = df
+            criterios = {}
         
-        self.actualizar_lista_clientes(resultados)
+        with medidor.fase('consulta'):
+            resultados = self.clientes.filtrar(criterios)
+        self.mostrar_posiciones(resultados)
         messagebox.showinfo("Filtro", f"Mostrando {len(resultados)} clientes con filtro: {filtro}")
     
+    @medido()
     def limpiar_filtros(self):
         """Limpia todos los filtros aplicados"""
         self.busqueda_var.set("")
+        self.cancelar_busqueda()
         self.actualizar_lista_clientes()
         messagebox.showinfo("Filtros", "Todos los filtros han sido limpiados")
     
     def actualizar_lista_clientes(self, df=None):
         """Actualiza la lista de clientes en el Treeview"""
         if df is None:
-            df = self.leer_clientes()
+            df = self.clientes.leer()
         
-        # Limpiar treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # df es la caché o un filtro sobre ella: su índice son posiciones en la caché
+        self.mostrar_posiciones(df.index.to_numpy())
+    
+    def mostrar_posiciones(self, posiciones):
+        """Muestra en la tabla las filas de la caché en esas posiciones"""
+        with medidor.fase('consulta'):
+            datos = self.clientes.arreglos_columnas()
+        self.tabla.mostrar(datos, posiciones)
+        self._version_tabla = self.clientes.version
         
-        # Insertar datos
-        for _, row in df.iterrows():
-            valores = [row[col] if pd.notna(row[col]) else '' for col in self.columnas]
-            item = self.tree.insert('', tk.END, values=valores)
-            
-            # Aplicar colores según estado
-            estado = row['Estado_Contacto'] if pd.notna(row['Estado_Contacto']) else 'Por contactar'
-            self.aplicar_color_fila(item, estado, row)
+        self.actualizar_estadisticas_rapidas()
+        self.actualizar_info_seleccion()
+    
+    def refrescar_tabla(self, aplicar_cambio, ids, version_previa, *args):
+        """Aplica en la tabla solo el cambio de los IDs dados, sin reconstruirla.
+
+        `args` se pasan a `aplicar_cambio` (las columnas cambiadas, para
+        `actualizar_filas`, que reordena si alguna es clave del orden).
+        """
+        if self._version_tabla != version_previa:
+            # La tabla muestra otra versión de los datos (p. ej. recargada desde disco)
+            self.actualizar_lista_clientes()
+            return
         
+        with medidor.fase('consulta'):
+            datos = self.clientes.arreglos_columnas()
+        aplicar_cambio(datos, ids, *args)
+        self._version_tabla = self.clientes.version
         self.actualizar_estadisticas_rapidas()
         self.actualizar_info_seleccion()
     
-    def aplicar_color_fila(self, item, estado, row):
-        """Aplica colores a las filas según diferentes criterios"""
+    @staticmethod
+    def color_fila(row):
+        """Devuelve el color de fondo de una fila según diferentes criterios"""
         # Colores base por estado
         colores_estado = {
             'Por contactar': '#fff3cd',
@@ -307,6 +746,7 @@ class GestorClientesApp:
             'Cliente': '#c3e6cb'
         }
         
+        estado = row.get('Estado_Contacto') or 'Por contactar'
         color = colores_estado.get(estado, 'white')
         
         # Resaltar clientes actuales
@@ -317,42 +757,116 @@ class GestorClientesApp:
         if row.get('Interes') == 'Alto':
             color = '#fff3cd'  # Amarillo
         
-        self.tree.item(item, tags=(estado,))
-        self.tree.tag_configure(estado, background=color)
+        return color
     
     def buscar_cliente(self, event=None):
-        """Busca clientes según el criterio"""
+        """Programa la búsqueda para cuando el usuario deje de teclear"""
+        if self._busqueda_pendiente is not None:
+            self.root.after_cancel(self._busqueda_pendiente)
+        self._busqueda_pendiente = self.root.after(self.RETARDO_BUSQUEDA_MS, self.lanzar_busqueda)
+    
+    def cancelar_busqueda(self):
+        """Descarta la búsqueda programada y la que esté en curso"""
+        if self._busqueda_pendiente is not None:
+            self.root.after_cancel(self._busqueda_pendiente)
+            self._busqueda_pendiente = None
+        self._generacion_busqueda += 1
+        self._busqueda_en_curso = None
+        self._ultima_busqueda = None
+    
+    def lanzar_busqueda(self):
+        """Busca clientes según el criterio en un hilo, sin bloquear la interfaz"""
+        self._busqueda_pendiente = None
+        self._generacion_busqueda += 1
         criterio = self.criterio_busqueda.get()
         valor = self.busqueda_var.get().lower()
         
+        self._busqueda_en_curso = None
+        
+        df = self.clientes.leer()
+        version = self.clientes.version
         if not valor:
+            self._ultima_busqueda = None
             self.actualizar_lista_clientes()
             return
+        if criterio not in df.columns:
+            return
         
-        df = self.leer_clientes()
-        if criterio in df.columns:
-            resultados = df[df[criterio].astype(str).str.lower().str.contains(valor, na=False)]
-            self.actualizar_lista_clientes(resultados)
+        # Si la consulta amplía la anterior, sus resultados contienen a los nuevos
+        base = None
+        anterior = self._ultima_busqueda
+        if (anterior is not None and anterior['criterio'] == criterio
+                and anterior['version'] == version and anterior['valor'] in valor):
+            base = anterior['posiciones']
+        
+        consulta = {'generacion': self._generacion_busqueda, 'criterio': criterio,
+                    'valor': valor, 'version': version, 'inicio': time.perf_counter()}
+        self._busqueda_en_curso = consulta['generacion']
+        threading.Thread(target=self.ejecutar_busqueda, args=(consulta, df, base),
+                         daemon=True).start()
+        if not self._sondeando_busqueda:
+            self._sondeando_busqueda = True
+            self.root.after(20, self.recibir_resultados_busqueda)
+    
+    def ejecutar_busqueda(self, consulta, df, base):
+        """Filtra en segundo plano; abandona si llega una consulta más nueva"""
+        inicio = time.perf_counter()
+        posiciones = self.clientes.buscar(
+            consulta['criterio'], consulta['valor'], df, consulta['version'], base,
+            vigente=lambda: consulta['generacion'] == self._generacion_busqueda)
+        if posiciones is None:
+            return
+        consulta['posiciones'] = posiciones
+        consulta['segundos_consulta'] = time.perf_counter() - inicio
+        self._resultados_busqueda.put(consulta)
+    
+    def recibir_resultados_busqueda(self):
+        """Muestra, desde el hilo de Tk, el resultado de la búsqueda vigente"""
+        while True:
+            try:
+                consulta = self._resultados_busqueda.get_nowait()
+            except queue.Empty:
+                break
+            # Los resultados de consultas ya reemplazadas se descartan
+            if consulta['generacion'] != self._busqueda_en_curso:
+                continue
+            self._busqueda_en_curso = None
+            if consulta['version'] != self.clientes.version:
+                # Los datos cambiaron mientras se buscaba
+                self.lanzar_busqueda()
+            else:
+                self._ultima_busqueda = consulta
+                inicio = time.perf_counter()
+                self.mostrar_posiciones(consulta['posiciones'])
+                # Desde que se lanzó: consulta en su hilo, espera a ser recogida y pintado
+                medidor.registrar('buscar_cliente', time.perf_counter() - consulta['inicio'],
+                                  {'consulta': consulta['segundos_consulta'], 'tk': time.perf_counter() - inicio})
+        
+        if self._busqueda_en_curso is not None:
+            self.root.after(20, self.recibir_resultados_busqueda)
+        else:
+            self._sondeando_busqueda = False
     
+    @medido()
     def mostrar_formulario_agregar(self):
         """Muestra formulario para agregar cliente"""
         self.formulario_cliente("Agregar Cliente")
     
-    def mostrar_formulario_modificar(self):
-        """Muestra formulario para modificar cliente seleccionado"""
-        seleccion = self.tree.selection()
+    @medido()
+    def mostrar_formulario_modificar(self, seleccion=None):
+        """Muestra formulario para modificar el cliente seleccionado (o los IDs dados), o varios a la vez"""
+        if seleccion is None:
+            seleccion = self.tabla.ids_seleccionados()
         if not seleccion:
             messagebox.showwarning("Advertencia", "Por favor selecciona un cliente para modificar.")
             return
-        
-        item = seleccion[0]
-        valores = self.tree.item(item)['values']
-        if not valores:
+        if len(seleccion) > 1:
+            self.formulario_masivo(seleccion)
             return
-            
-        cliente_id = valores[0]
         
-        df = self.leer_clientes()
+        cliente_id = seleccion[0]
+        
+        df = self.clientes.leer()
         cliente_data = df[df['ID'] == cliente_id]
         
         if cliente_data.empty:
@@ -416,13 +930,13 @@ class GestorClientesApp:
             ('Localidad', 'Localidad', 'text', None, 'left'),
             ('Telefono', 'Teléfono', 'text', None, 'left'),
             ('Correo_Electronico', 'Correo electrónico', 'text', None, 'left'),
-            ('Estado_Contacto', 'Estado de contacto', 'combo', 
-             ['Por contactar', 'Contactado', 'En seguimiento', 'No interesado', 'Cliente'], 'left'),
-            ('Interes', 'Nivel de interés', 'combo', ['No evaluado', 'Bajo', 'Medio', 'Alto'], 'left'),
-            ('Sitio_Web_Actual', 'Sitio web actual', 'combo', ['No tiene', 'Tiene'], 'right'),
-            ('Es_Cliente', '¿Es cliente actual?', 'combo', ['NO', 'SI'], 'right'),
-            ('Solicito_Propuesta', '¿Solicitó propuesta?', 'combo', ['NO', 'SI'], 'right'),
-            ('Se_Le_Envio_Propuesta', '¿Se le envió propuesta?', 'combo', ['NO', 'SI'], 'right'),
+            ('Estado_Contacto', 'Estado de contacto', 'combo', OPCIONES_CAMPOS['Estado_Contacto'], 'left'),
+            ('Interes', 'Nivel de interés', 'combo', OPCIONES_CAMPOS['Interes'], 'left'),
+            ('Sitio_Web_Actual', 'Sitio web actual', 'combo', OPCIONES_CAMPOS['Sitio_Web_Actual'], 'right'),
+            ('Es_Cliente', '¿Es cliente actual?', 'combo', OPCIONES_CAMPOS['Es_Cliente'], 'right'),
+            ('Solicito_Propuesta', '¿Solicitó propuesta?', 'combo', OPCIONES_CAMPOS['Solicito_Propuesta'], 'right'),
+            ('Se_Le_Envio_Propuesta', '¿Se le envió propuesta?', 'combo',
+             OPCIONES_CAMPOS['Se_Le_Envio_Propuesta'], 'right'),
             ('Fecha_Proximo_Contacto', 'Fecha próximo contacto', 'text', None, 'right'),
             ('Fecha_Envio_Propuesta', 'Fecha envío propuesta', 'text', None, 'right'),
             ('Observaciones', 'Observaciones', 'text', None, 'full')  # Campo completo
@@ -456,6 +970,8 @@ class GestorClientesApp:
             if cliente is not None and campo in cliente:
                 valor = cliente[campo]
                 if pd.notna(valor):
+                    if isinstance(valor, pd.Timestamp):
+                        valor = valor.strftime(FORMATO_FECHA)
                     if tipo == 'combo':
                         entry.set(str(valor))
                     else:
@@ -471,7 +987,8 @@ class GestorClientesApp:
                       command=lambda: self.guardar_nuevo_cliente(formulario)).pack(side=tk.LEFT, padx=10)
         else:
             ttk.Button(botones_frame, text="Actualizar Cliente", 
-                      command=lambda: self.actualizar_cliente_existente(cliente['ID'], formulario)).pack(side=tk.LEFT, padx=10)
+                      command=lambda: self.actualizar_cliente_existente(cliente['ID'], formulario,
+                                                                        cliente.get('Version'))).pack(side=tk.LEFT, padx=10)
         
         ttk.Button(botones_frame, text="Cancelar", 
                   command=formulario.destroy).pack(side=tk.LEFT, padx=10)
@@ -480,48 +997,165 @@ class GestorClientesApp:
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
+    @medido()
     def guardar_nuevo_cliente(self, formulario):
         """Guarda un nuevo cliente"""
         datos = self.obtener_datos_formulario()
         if datos is None:
             return
         
-        df = self.leer_clientes()
-        nuevo_id = df['ID'].max() + 1 if not df.empty else 1
+        try:
+            nuevo_id = self.clientes.nuevos_ids()[0]
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al reservar el ID del cliente: {e}")
+            return
+        df = self.clientes.leer()
+        version = self.clientes.version
         datos['ID'] = nuevo_id
         datos['Fecha_Contacto'] = datetime.now().strftime('%Y-%m-%d')
         
+        with medidor.fase('consulta'):
+            coincidencias = self.clientes.posibles_duplicados(datos)
+        if coincidencias and not self.confirmar_posible_duplicado(coincidencias):
+            return
+        
         # Si se envió propuesta pero no hay fecha, usar fecha actual
         if datos.get('Se_Le_Envio_Propuesta') == 'SI' and not datos.get('Fecha_Envio_Propuesta'):
             datos['Fecha_Envio_Propuesta'] = datetime.now().strftime('%Y-%m-%d')
         
-        df = pd.concat([df, pd.DataFrame([datos])], ignore_index=True)
+        df = concatenar(df, pd.DataFrame([datos]))
         
-        if self.guardar_clientes(df):
+        if self.insertar_clientes(df, [datos]):
             messagebox.showinfo("Éxito", "Cliente agregado correctamente.")
             formulario.destroy()
-            self.actualizar_lista_clientes()
+            self.refrescar_tabla(self.tabla.insertar_filas, [nuevo_id], version)
+    
+    def confirmar_posible_duplicado(self, coincidencias):
+        """Pregunta si guardar un cliente que se parece a otros ya registrados"""
+        lineas = [
+            f"• {cliente['Nombre_Empresa']} (ID: {cliente['ID']}, {puntuacion:.0%})"
+            for puntuacion, cliente in coincidencias
+        ]
+        return messagebox.askyesno(
+            "Posible duplicado",
+            "Este cliente se parece a:\n\n" + "\n".join(lineas) + "\n\n¿Guardarlo de todos modos?"
+        )
     
-    def actualizar_cliente_existente(self, cliente_id, formulario):
-        """Actualiza un cliente existente"""
+    @medido()
+    def actualizar_cliente_existente(self, cliente_id, formulario, version_inicial=None):
+        """Actualiza un cliente existente; `version_inicial` es la de la fila al abrir el formulario"""
         datos = self.obtener_datos_formulario()
         if datos is None:
             return
         
-        df = self.leer_clientes()
-        
+        df = self.clientes.leer().copy()
+        version = self.clientes.version
+
         # Si se envió propuesta pero no hay fecha, usar fecha actual
         if datos.get('Se_Le_Envio_Propuesta') == 'SI' and not datos.get('Fecha_Envio_Propuesta'):
             datos['Fecha_Envio_Propuesta'] = datetime.now().strftime('%Y-%m-%d')
         
         for campo, valor in datos.items():
             if campo in df.columns and campo != 'ID':
-                df.loc[df['ID'] == cliente_id, campo] = valor
+                asignar_valor(df, df['ID'] == cliente_id, campo, valor)
         
-        if self.guardar_clientes(df):
+        versiones = None if version_inicial is None else [version_inicial]
+        if self.actualizar_clientes(df, [cliente_id], datos, versiones):
             messagebox.showinfo("Éxito", "Cliente actualizado correctamente.")
             formulario.destroy()
-            self.actualizar_lista_clientes()
+            self.refrescar_tabla(self.tabla.actualizar_filas, [cliente_id], version, list(datos))
+    
+    def formulario_masivo(self, ids):
+        """Formulario para cambiar los mismos campos en varios clientes seleccionados"""
+        formulario = tk.Toplevel(self.root)
+        formulario.title("Modificar clientes seleccionados")
+        formulario.geometry("500x420")
+        formulario.transient(self.root)
+        formulario.grab_set()
+        
+        form_frame = ttk.Frame(formulario, padding=20)
+        form_frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(form_frame, text=f"Modificar {len(ids)} clientes",
+                 font=('Arial', 16, 'bold')).pack(pady=10)
+        ttk.Label(form_frame, text="Solo se cambian los campos que se completen.").pack(pady=5)
+        
+        campos = [
+            ('Estado_Contacto', 'Estado de contacto'),
+            ('Interes', 'Nivel de interés'),
+            ('Sitio_Web_Actual', 'Sitio web actual'),
+            ('Es_Cliente', '¿Es cliente actual?'),
+            ('Solicito_Propuesta', '¿Solicitó propuesta?'),
+            ('Se_Le_Envio_Propuesta', '¿Se le envió propuesta?'),
+            ('Fecha_Proximo_Contacto', 'Fecha próximo contacto'),
+            ('Fecha_Envio_Propuesta', 'Fecha envío propuesta'),
+        ]
+        entradas = {}
+        for campo, label in campos:
+            frame_campo = ttk.Frame(form_frame)
+            frame_campo.pack(fill=tk.X, pady=3)
+            ttk.Label(frame_campo, text=label, width=25, anchor='w').pack(side=tk.LEFT)
+            if campo in OPCIONES_CAMPOS:
+                # La opción vacía deja el campo como está
+                entry = ttk.Combobox(frame_campo, values=[''] + OPCIONES_CAMPOS[campo], width=28, state='readonly')
+            else:
+                entry = ttk.Entry(frame_campo, width=30)
+            entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+            entradas[campo] = entry
+        
+        # Versión de cada fila al abrir el formulario, para detectar cambios de otro usuario
+        versiones = self.clientes.versiones(ids)
+        botones_frame = ttk.Frame(form_frame)
+        botones_frame.pack(fill=tk.X, pady=20)
+        ttk.Button(botones_frame, text="Aplicar a todos",
+                  command=lambda: self.actualizar_clientes_seleccionados(ids, entradas, formulario, versiones)
+                  ).pack(side=tk.LEFT, padx=10)
+        ttk.Button(botones_frame, text="Cancelar",
+                  command=formulario.destroy).pack(side=tk.LEFT, padx=10)
+    
+    @medido()
+    def actualizar_clientes_seleccionados(self, ids, entradas, formulario, versiones=None):
+        """Aplica los campos completados a todos los IDs: una asignación por columna y una escritura"""
+        cambios = {campo: entry.get().strip() for campo, entry in entradas.items() if entry.get().strip()}
+        if not cambios:
+            messagebox.showwarning("Advertencia", "Completa al menos un campo.", parent=formulario)
+            return
+        try:
+            cambios = validar_cambios(cambios)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=formulario)
+            return
+        
+        df = self.clientes.leer().copy()
+        version = self.clientes.version
+        mascara = df['ID'].isin(ids)
+        
+        # Si se envió propuesta pero no hay fecha, usar fecha actual en los que no la tengan.
+        # Es otro cambio (sobre menos filas), confirmado en la misma escritura que el primero;
+        # la tabla se repinta una sola vez al final.
+        sin_fecha = []
+        fecha = {}
+        if cambios.get('Se_Le_Envio_Propuesta') == 'SI' and 'Fecha_Envio_Propuesta' not in cambios:
+            sin_fecha = df.loc[mascara & df['Fecha_Envio_Propuesta'].isna(), 'ID'].tolist()
+        
+        for campo, valor in cambios.items():
+            asignar_valor(df, mascara, campo, valor)
+        completo = True
+        with self.clientes.agrupar_escrituras():
+            if not self.actualizar_clientes(df, ids, cambios, versiones):
+                return
+            if sin_fecha:
+                df = df.copy()
+                fecha = {'Fecha_Envio_Propuesta': datetime.now().strftime('%Y-%m-%d')}
+                asignar_valor(df, df['ID'].isin(sin_fecha), 'Fecha_Envio_Propuesta', fecha['Fecha_Envio_Propuesta'])
+                completo = self.actualizar_clientes(df, sin_fecha, fecha)
+        # El primer cambio ya está guardado aunque falle el de la fecha
+        self.refrescar_tabla(self.tabla.actualizar_filas, ids, version, list(cambios) + list(fecha))
+        if not completo:
+            return
+        
+        messagebox.showinfo("Éxito", f"{len(ids)} clientes actualizados correctamente.")
+        formulario.destroy()
     
     def obtener_datos_formulario(self):
         """Obtiene y valida los datos del formulario"""
@@ -538,36 +1172,47 @@ class GestorClientesApp:
             else:
                 datos[campo] = entry.get().strip()
         
+        # Listas con valores admitidos y fechas legibles, en la forma en que se guardan
+        try:
+            datos = validar_cambios(datos, self.clientes.leer())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return None
+        
         return datos
     
+    @medido()
     def eliminar_cliente(self):
-        """Elimina el cliente seleccionado"""
-        seleccion = self.tree.selection()
+        """Elimina los clientes seleccionados, todos en una sola escritura"""
+        seleccion = self.tabla.ids_seleccionados()
         if not seleccion:
             messagebox.showwarning("Advertencia", "Por favor selecciona un cliente para eliminar.")
             return
         
-        item = seleccion[0]
-        valores = self.tree.item(item)['values']
-        if not valores:
-            return
-            
-        cliente_id = valores[0]
-        nombre_empresa = valores[1]
+        if len(seleccion) == 1:
+            cliente_id = seleccion[0]
+            df = self.clientes.leer()
+            nombre_empresa = df.loc[df['ID'] == cliente_id, 'Nombre_Empresa'].iloc[0]
+            pregunta = f"¿Estás seguro de eliminar a '{nombre_empresa}' (ID: {cliente_id})?"
+            exito = "Cliente eliminado correctamente."
+        else:
+            pregunta = f"¿Estás seguro de eliminar los {len(seleccion)} clientes seleccionados?"
+            exito = f"{len(seleccion)} clientes eliminados correctamente."
+        # Las filas tal como se ven al preguntar: si otro usuario las cambia mientras tanto, no se eliminan
+        versiones = self.clientes.versiones(seleccion)
         
-        respuesta = messagebox.askyesno(
-            "Confirmar eliminación", 
-            f"¿Estás seguro de eliminar a '{nombre_empresa}' (ID: {cliente_id})?"
-        )
+        respuesta = messagebox.askyesno("Confirmar eliminación", pregunta)
         
         if respuesta:
-            df = self.leer_clientes()
-            df = df[df['ID'] != cliente_id]
+            df = self.clientes.leer()
+            version = self.clientes.version
+            df = df[~df['ID'].isin(seleccion)]
             
-            if self.guardar_clientes(df):
-                messagebox.showinfo("Éxito", "Cliente eliminado correctamente.")
-                self.actualizar_lista_clientes()
+            if self.eliminar_clientes(df, seleccion, versiones):
+                messagebox.showinfo("Éxito", exito)
+                self.refrescar_tabla(self.tabla.eliminar_filas, seleccion, version)
     
+    @medido()
     def mostrar_busqueda(self):
         """Muestra ventana de búsqueda avanzada"""
         busqueda_win = tk.Toplevel(self.root)
@@ -624,25 +1269,20 @@ class GestorClientesApp:
         ttk.Button(frame_botones, text="Cerrar", 
                   command=busqueda_win.destroy).pack(side=tk.LEFT, padx=5)
     
+    @medido()
     def ejecutar_busqueda_avanzada(self, ventana):
         """Ejecuta búsqueda avanzada"""
-        df = self.leer_clientes()
+        valores = {campo: entry.get().strip() for campo, entry in self.entries_busqueda.items()}
+        with medidor.fase('consulta'):
+            posiciones = self.clientes.buscar_avanzada(valores)
         
-        for campo, entry in self.entries_busqueda.items():
-            valor = entry.get().strip()
-            if valor:
-                if campo in ['Es_Cliente', 'Solicito_Propuesta', 'Se_Le_Envio_Propuesta', 'Estado_Contacto', 'Interes']:
-                    df = df[df[campo] == valor]
-                else:
-                    df = df[df[campo].astype(str).str.lower().str.contains(valor.lower(), na=False)]
-        
-        self.actualizar_lista_clientes(df)
+        self.mostrar_posiciones(posiciones)
         ventana.destroy()
         
-        if df.empty:
+        if not len(posiciones):
             messagebox.showinfo("Búsqueda", "No se encontraron resultados.")
         else:
-            messagebox.showinfo("Búsqueda", f"Se encontraron {len(df)} resultados.")
+            messagebox.showinfo("Búsqueda", f"Se encontraron {len(posiciones)} resultados.")
     
     def limpiar_busqueda(self):
         """Limpia los campos de búsqueda"""
@@ -652,8 +1292,252 @@ class GestorClientesApp:
             else:
                 entry.delete(0, tk.END)
     
+    @medido()
+    def mostrar_agenda(self):
+        """Ventana con los próximos contactos vencidos, de hoy, de la semana o entre dos fechas"""
+        if not self.clientes.cargado():
+            messagebox.showwarning("Cargando", "Espera a que terminen de cargarse los clientes.")
+            return
+        if self.agenda is not None and self.agenda['win'].winfo_exists():
+            self.agenda['win'].lift()
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Agenda de seguimiento")
+        win.geometry("1000x550")
+        
+        frame = ttk.Frame(win, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        periodos = ttk.Frame(frame)
+        periodos.pack(fill=tk.X, pady=5)
+        botones = {}
+        for periodo in ('vencidos', 'hoy', 'semana'):
+            botones[periodo] = ttk.Button(periodos, command=lambda p=periodo: self.consultar_agenda(p))
+            botones[periodo].pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(periodos, text="Desde:").pack(side=tk.LEFT, padx=(20, 5))
+        desde = ttk.Entry(periodos, width=12)
+        desde.pack(side=tk.LEFT)
+        ttk.Label(periodos, text="Hasta:").pack(side=tk.LEFT, padx=5)
+        hasta = ttk.Entry(periodos, width=12)
+        hasta.pack(side=tk.LEFT)
+        ttk.Button(periodos, text="🔍 Buscar",
+                  command=lambda: self.consultar_agenda('rango')).pack(side=tk.LEFT, padx=5)
+        
+        estado = ttk.Label(frame, text="")
+        estado.pack(anchor=tk.W, pady=5)
+        
+        frame_tabla = ttk.Frame(frame)
+        frame_tabla.pack(fill=tk.BOTH, expand=True)
+        columnas = ['Fecha_Proximo_Contacto', 'Nombre_Empresa', 'Telefono', 'Correo_Electronico',
+                    'Estado_Contacto', 'Interes', 'Observaciones', 'ID']
+        anchos = {'Fecha_Proximo_Contacto': 120, 'Nombre_Empresa': 180, 'Telefono': 100,
+                  'Correo_Electronico': 160, 'Estado_Contacto': 110, 'Interes': 80,
+                  'Observaciones': 200, 'ID': 50}
+        tabla = TablaVirtual(frame_tabla, columnas, anchos, self.color_fila)
+        tabla.al_doble_click = lambda event: self.mostrar_formulario_modificar(tabla.ids_seleccionados())
+        tabla.ordenar = self.ordenar_vista
+        
+        self.agenda = {'win': win, 'tabla': tabla, 'estado': estado, 'botones': botones,
+                       'desde': desde, 'hasta': hasta, 'consulta': None}
+        self.consultar_agenda('vencidos')
+    
+    @medido()
+    def consultar_agenda(self, periodo):
+        """Muestra en la agenda un periodo ('vencidos', 'hoy', 'semana') o el rango de fechas escrito"""
+        agenda = self.agenda
+        if periodo == 'rango':
+            try:
+                desde = validar_valor('Fecha_Proximo_Contacto', agenda['desde'].get())
+                hasta = validar_valor('Fecha_Proximo_Contacto', agenda['hasta'].get())
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=agenda['win'])
+                return
+            agenda['consulta'] = (periodo, desde, hasta)
+        else:
+            agenda['consulta'] = (periodo, None, None)
+        self.refrescar_agenda()
+    
+    def refrescar_agenda(self):
+        """Vuelve a hacer la consulta de la agenda abierta con los datos y el día actuales"""
+        agenda = self.agenda
+        if agenda is None or agenda['consulta'] is None or not agenda['win'].winfo_exists():
+            return
+        periodos = periodos_agenda()
+        titulos = {'vencidos': "⏰ Vencidos", 'hoy': "📞 Hoy", 'semana': "📅 Esta semana"}
+        with medidor.fase('consulta'):
+            conteos = {clave: self.clientes.contar_agenda(*periodos[clave]) for clave in agenda['botones']}
+        for clave, boton in agenda['botones'].items():
+            boton.config(text=f"{titulos[clave]} ({conteos[clave]:,})")
+        
+        periodo, desde, hasta = agenda['consulta']
+        if periodo == 'rango':
+            texto = f"Próximo contacto entre {desde or 'el inicio'} y {hasta or 'el final'}"
+        else:
+            desde, hasta = periodos[periodo]
+            texto = titulos[periodo][2:]
+        with medidor.fase('consulta'):
+            posiciones = self.clientes.agenda(desde, hasta)
+            datos = self.clientes.arreglos_columnas()
+        agenda['tabla'].mostrar(datos, posiciones)
+        agenda['estado'].config(text=f"{texto}: {len(posiciones):,} clientes, por fecha de próximo contacto")
+    
+    @medido()
+    def mostrar_duplicados(self):
+        """Ventana con los grupos de posibles duplicados, buscados en segundo plano"""
+        if not self.clientes.cargado():
+            messagebox.showwarning("Cargando", "Espera a que terminen de cargarse los clientes.")
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Clientes duplicados")
+        win.geometry("1000x550")
+        
+        frame = ttk.Frame(win, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        estado = ttk.Label(frame, text="Buscando duplicados...")
+        estado.pack(anchor=tk.W, pady=5)
+        
+        columnas = ['ID', 'Nombre_Empresa', 'Telefono', 'Correo_Electronico', 'Localidad']
+        tree = ttk.Treeview(frame, columns=columnas, show='tree headings', selectmode='browse')
+        tree.heading('#0', text='Grupo')
+        tree.column('#0', width=180)
+        for col in columnas:
+            tree.heading(col, text=col.replace('_', ' ').title())
+            tree.column(col, width=60 if col == 'ID' else 180)
+        scroll = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        
+        botones = ttk.Frame(frame)
+        botones.pack(side=tk.BOTTOM, fill=tk.X, pady=10)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        ventana = {'win': win, 'tree': tree, 'estado': estado, 'grupos': {}, 'cola': queue.Queue()}
+        ttk.Button(botones, text="🔗 Fusionar grupo",
+                  command=lambda: self.decidir_duplicados(ventana, fusionar=True)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botones, text="✋ Mantener separados",
+                  command=lambda: self.decidir_duplicados(ventana, fusionar=False)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botones, text="🔗 Fusionar todos",
+                  command=lambda: self.fusionar_todos_duplicados(ventana)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botones, text="Cerrar", command=win.destroy).pack(side=tk.RIGHT, padx=5)
+        
+        df = self.clientes.leer()
+        cola = ventana['cola']
+        
+        def buscar():
+            try:
+                progreso = lambda fase, hechas, total: cola.put(('progreso', (hechas, total)))
+                cola.put(('fin', self.clientes.buscar_duplicados(df, progreso=progreso)))
+            except Exception as e:
+                cola.put(('error', e))
+        
+        threading.Thread(target=buscar, daemon=True).start()
+        self.root.after(100, lambda: self.recibir_duplicados(ventana, df))
+    
+    def recibir_duplicados(self, ventana, df):
+        """Muestra, desde el hilo de Tk, el avance y el resultado de la búsqueda de duplicados"""
+        if not ventana['win'].winfo_exists():
+            return
+        try:
+            tipo, dato = ventana['cola'].get_nowait()
+        except queue.Empty:
+            self.root.after(100, lambda: self.recibir_duplicados(ventana, df))
+            return
+        if tipo == 'progreso':
+            ventana['estado'].config(text=f"Comparando candidatos... {dato[0]} de {dato[1]}")
+            self.root.after(100, lambda: self.recibir_duplicados(ventana, df))
+            return
+        if tipo == 'error':
+            ventana['estado'].config(text=f"Error al buscar duplicados: {dato}")
+            return
+        
+        grupos, estadisticas = dato
+        tree = ventana['tree']
+        filas = df.set_index('ID', drop=False)
+        for numero, grupo in enumerate(grupos, 1):
+            padre = tree.insert('', tk.END, text=f"Grupo {numero} ({grupo.puntuacion:.0%})", open=True)
+            ventana['grupos'][padre] = grupo.ids
+            for cliente_id in grupo.ids:
+                fila = filas.loc[cliente_id]
+                valores = [fila[col] if pd.notna(fila[col]) else '' for col in tree['columns']]
+                tree.insert(padre, tk.END, iid=f"{padre}-{cliente_id}", values=valores)
+        ventana['estado'].config(
+            text=f"{len(grupos)} grupos de posibles duplicados entre {len(df):,} clientes "
+                 f"({estadisticas['pares']:,} pares comparados). "
+                 "El primero de cada grupo es el que se conserva al fusionar; "
+                 "seleccione otro cliente del grupo para conservarlo a él."
+        )
+    
+    @medido()
+    def decidir_duplicados(self, ventana, fusionar):
+        """Fusiona el grupo seleccionado en un cliente o lo marca como clientes distintos"""
+        tree = ventana['tree']
+        seleccion = tree.selection()
+        if not seleccion:
+            messagebox.showwarning("Advertencia", "Selecciona un grupo o un cliente de un grupo.", parent=ventana['win'])
+            return
+        item = seleccion[0]
+        padre = tree.parent(item) or item
+        ids = list(ventana['grupos'][padre])
+        if item != padre:
+            # El cliente seleccionado pasa a ser el que se conserva
+            principal = tree.item(item, 'values')
+            principal_id = next(i for i in ids if str(i) == str(principal[0]))
+            ids.remove(principal_id)
+            ids.insert(0, principal_id)
+        
+        if fusionar:
+            if not self.clientes.cargado():
+                return
+            try:
+                self.clientes.fusionar([ids])
+            except Exception as e:
+                messagebox.showerror("Error", f"Error al guardar: {e}", parent=ventana['win'])
+                return
+            self.actualizar_lista_clientes()
+        else:
+            try:
+                self.clientes.marcar_distintos(ids)
+            except Exception as e:
+                messagebox.showerror("Error", f"Error al guardar la decisión: {e}", parent=ventana['win'])
+                return
+        del ventana['grupos'][padre]
+        tree.delete(padre)
+    
+    @medido()
+    def fusionar_todos_duplicados(self, ventana):
+        """Fusiona todos los grupos que quedan en la lista, en una sola escritura"""
+        grupos = list(ventana['grupos'].values())
+        if not grupos:
+            return
+        if not messagebox.askyesno("Fusionar todos",
+                                   f"¿Fusionar los {len(grupos)} grupos? Se eliminarán "
+                                   f"{sum(len(g) - 1 for g in grupos)} clientes duplicados.",
+                                   parent=ventana['win']):
+            return
+        try:
+            eliminados = self.clientes.fusionar(grupos)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al guardar: {e}", parent=ventana['win'])
+            return
+        ventana['tree'].delete(*ventana['grupos'])
+        ventana['grupos'].clear()
+        self.actualizar_lista_clientes()
+        messagebox.showinfo("Fusionar todos", f"Se fusionaron {eliminados} clientes duplicados.",
+                            parent=ventana['win'])
+    
+    def cargar_graficos(self):
+        """Importa matplotlib y seaborn (a través de graficos) la primera vez que se necesitan"""
+        if self._graficos is None:
+            import graficos
+            graficos.aplicar_estilo()
+            self._graficos = graficos
+        return self._graficos
+    
+    @medido()
     def mostrar_graficos(self):
-        """Muestra ventana con gráficos"""
+        """Muestra ventana con gráficos; cada pestaña se dibuja al seleccionarla por primera vez"""
+        graficos = self.cargar_graficos()
         graficos_win = tk.Toplevel(self.root)
         graficos_win.title("Análisis Visual de Clientes")
         graficos_win.geometry("1000x800")
@@ -662,179 +1546,109 @@ class GestorClientesApp:
         notebook = ttk.Notebook(graficos_win)
         notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Pestaña de gráficos principales
-        frame_principales = ttk.Frame(notebook)
-        notebook.add(frame_principales, text="Gráficos Principales")
-        
-        self.crear_grafico_estados(frame_principales)
+        # Todas las pestañas usan los mismos agregados
+        ventana = {'win': graficos_win, 'resumen': self.clientes.resumen(), 'pestanas': {},
+                   'pintadas': set(), 'imagenes': [], 'cola': queue.Queue(),
+                   'pendientes': 0, 'cerrada': False}
         
-        # Pestaña de nuevos campos
-        frame_nuevos = ttk.Frame(notebook)
-        notebook.add(frame_nuevos, text="Seguimiento Propuestas")
-        
-        self.crear_grafico_propuestas(frame_nuevos)
-        
-        # Pestaña de localidades
-        frame_localidades = ttk.Frame(notebook)
-        notebook.add(frame_localidades, text="Localidades")
-        
-        self.crear_grafico_localidades(frame_localidades)
-        
-        # Pestaña de estadísticas
-        frame_stats = ttk.Frame(notebook)
-        notebook.add(frame_stats, text="Estadísticas")
-        
-        self.mostrar_estadisticas(frame_stats)
-    
-    def crear_grafico_estados(self, parent):
-        """Crea gráfico de estados en el frame padre"""
-        df = self.leer_clientes()
-        
-        if df.empty:
-            ttk.Label(parent, text="No hay datos para generar gráficos.").pack(pady=50)
-            return
-        
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 10))
-        fig.suptitle('ANÁLISIS VISUAL DE CLIENTES POTENCIALES', fontsize=16, fontweight='bold')
-        
-        # Gráfico 1: Estados de contacto
-        estados_count = df['Estado_Contacto'].value_counts()
-        colors1 = plt.cm.Set3(np.linspace(0, 1, len(estados_count)))
-        ax1.pie(estados_count.values, labels=estados_count.index, autopct='%1.1f%%',
-                colors=colors1, startangle=90)
-        ax1.set_title('DISTRIBUCIÓN POR ESTADO DE CONTACTO')
-        
-        # Gráfico 2: Niveles de interés
-        interes_count = df['Interes'].value_counts()
-        colors2 = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4']
-        bars = ax2.bar(interes_count.index, interes_count.values, 
-                      color=colors2[:len(interes_count)])
-        ax2.set_title('CLIENTES POR NIVEL DE INTERÉS')
-        ax2.set_ylabel('Cantidad de Clientes')
-        ax2.tick_params(axis='x', rotation=45)
-        
-        for bar in bars:
-            height = bar.get_height()
-            ax2.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{int(height)}', ha='center', va='bottom', fontweight='bold')
-        
-        # Gráfico 3: Top sectores
-        sectores_count = df['Sector'].value_counts().head(8)
-        colors3 = plt.cm.viridis(np.linspace(0, 1, len(sectores_count)))
-        bars = ax3.barh(range(len(sectores_count)), sectores_count.values, color=colors3)
-        ax3.set_title('TOP 8 SECTORES MÁS COMUNES')
-        ax3.set_yticks(range(len(sectores_count)))
-        ax3.set_yticklabels(sectores_count.index)
-        ax3.set_xlabel('Cantidad de Clientes')
-        
-        for i, bar in enumerate(bars):
-            width = bar.get_width()
-            ax3.text(width, bar.get_y() + bar.get_height()/2.,
-                    f'{int(width)}', ha='left', va='center', fontweight='bold')
-        
-        # Gráfico 4: Presencia web
-        web_count = df['Sitio_Web_Actual'].value_counts()
-        colors4 = ['#FF9999', '#66B3FF']
-        ax4.pie(web_count.values, labels=web_count.index, autopct='%1.1f%%',
-                colors=colors4, startangle=90)
-        ax4.set_title('PRESENCIA WEB ACTUAL')
-        
-        canvas = FigureCanvasTkAgg(fig, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-    
-    def crear_grafico_propuestas(self, parent):
-        """Crea gráficos para los nuevos campos de propuestas"""
-        df = self.leer_clientes()
-        
-        if df.empty:
-            ttk.Label(parent, text="No hay datos para generar gráficos.").pack(pady=50)
-            return
-        
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 10))
-        fig.suptitle('SEGUIMIENTO DE PROPUESTAS Y CLIENTES', fontsize=16, fontweight='bold')
-        
-        # Gráfico 1: Es cliente
-        cliente_count = df['Es_Cliente'].fillna('NO').value_counts()
-        colors1 = ['#FF9999', '#66B3FF']
-        ax1.pie(cliente_count.values, labels=cliente_count.index, autopct='%1.1f%%',
-                colors=colors1, startangle=90)
-        ax1.set_title('CLIENTES ACTUALES')
-        
-        # Gráfico 2: Solicitud de propuestas
-        solicitud_count = df['Solicito_Propuesta'].fillna('NO').value_counts()
-        colors2 = ['#FF9999', '#66B3FF']
-        bars2 = ax2.bar(solicitud_count.index, solicitud_count.values, color=colors2)
-        ax2.set_title('SOLICITUD DE PROPUESTAS')
-        ax2.set_ylabel('Cantidad')
-        
-        for bar in bars2:
-            height = bar.get_height()
-            ax2.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{int(height)}', ha='center', va='bottom', fontweight='bold')
-        
-        # Gráfico 3: Envío de propuestas
-        envio_count = df['Se_Le_Envio_Propuesta'].fillna('NO').value_counts()
-        colors3 = ['#FF9999', '#66B3FF']
-        bars3 = ax3.bar(envio_count.index, envio_count.values, color=colors3)
-        ax3.set_title('ENVÍO DE PROPUESTAS')
-        ax3.set_ylabel('Cantidad')
-        
-        for bar in bars3:
-            height = bar.get_height()
-            ax3.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{int(height)}', ha='center', va='bottom', fontweight='bold')
-        
-        # Gráfico 4: Relación solicitud vs envío
-        cross_data = df[df['Solicito_Propuesta'].notna() & df['Se_Le_Envio_Propuesta'].notna()]
-        if not cross_data.empty:
-            cross_tab = pd.crosstab(cross_data['Solicito_Propuesta'], cross_data['Se_Le_Envio_Propuesta'])
-            cross_tab.plot(kind='bar', ax=ax4, color=['#FF9999', '#66B3FF'])
-            ax4.set_title('SOLICITUD VS ENVÍO DE PROPUESTAS')
-            ax4.set_ylabel('Cantidad')
-            ax4.legend(title='Se envió propuesta')
-            ax4.tick_params(axis='x', rotation=45)
-        else:
-            ax4.text(0.5, 0.5, 'No hay datos suficientes', ha='center', va='center', transform=ax4.transAxes)
-            ax4.set_title('SOLICITUD VS ENVÍO DE PROPUESTAS')
+        for clave, titulo in self.PESTANAS_GRAFICOS:
+            frame = ttk.Frame(notebook)
+            notebook.add(frame, text=titulo)
+            ventana['pestanas'][str(frame)] = (clave, frame, graficos.FIGURAS.get(clave))
         
-        canvas = FigureCanvasTkAgg(fig, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        notebook.bind('<<NotebookTabChanged>>',
+                      lambda e: self.pintar_pestana_grafico(ventana, notebook.select()))
+        graficos_win.protocol("WM_DELETE_WINDOW", lambda: self.cerrar_graficos(ventana))
+        graficos_win.after_idle(lambda: self.pintar_pestana_grafico(ventana, notebook.select()))
     
-    def crear_grafico_localidades(self, parent):
-        """Crea gráfico de localidades"""
-        df = self.leer_clientes()
-        
-        if df.empty:
-            ttk.Label(parent, text="No hay datos para generar gráficos.").pack(pady=50)
+    @medido('pestana_grafico')
+    def pintar_pestana_grafico(self, ventana, pestana):
+        """Dibuja una pestaña la primera vez que se muestra, desde la caché o en segundo plano"""
+        if ventana['cerrada'] or pestana in ventana['pintadas']:
             return
+        ventana['pintadas'].add(pestana)
+        clave, frame, funcion = ventana['pestanas'][pestana]
+        resumen = ventana['resumen']
         
-        localidades_count = df['Localidad'].value_counts().head(10)
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        colors = plt.cm.plasma(np.linspace(0, 1, len(localidades_count)))
+        if funcion is None:
+            self.mostrar_estadisticas(resumen, frame)
+            return
+        if not resumen.total:
+            ttk.Label(frame, text="No hay datos para generar gráficos.").pack(pady=50)
+            return
         
-        bars = ax.bar(localidades_count.index, localidades_count.values, color=colors)
-        ax.set_title('TOP 10 LOCALIDADES CON MÁS CLIENTES POTENCIALES', fontweight='bold')
-        ax.set_xlabel('Localidad')
-        ax.set_ylabel('Cantidad de Clientes')
-        plt.xticks(rotation=45, ha='right')
+        # La imagen ocupa la pestaña entera, como lo hacía el lienzo de matplotlib
+        frame.update_idletasks()
+        tamano = (max(frame.winfo_width(), 400), max(frame.winfo_height(), 300))
+        clave_cache = (clave, resumen.version, tamano)
+        guardado = self._graficos_cache.get(clave)
+        if guardado is not None and guardado[:2] == clave_cache[1:]:
+            self.mostrar_imagen_grafico(ventana, frame, guardado[2])
+            return
         
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{int(height)}', ha='center', va='bottom', fontweight='bold')
+        aviso = ttk.Label(frame, text="Generando gráfico...")
+        aviso.pack(pady=50)
+        ventana['pendientes'] += 1
+        threading.Thread(target=self.renderizar_grafico,
+                         args=(ventana['cola'], funcion, resumen, clave_cache, frame, aviso),
+                         daemon=True).start()
+        if ventana['pendientes'] == 1:
+            self.root.after(50, lambda: self.recibir_graficos(ventana))
+    
+    def renderizar_grafico(self, cola, funcion, resumen, clave_cache, *destino):
+        """Construye y dibuja una figura con Agg fuera del hilo de Tk"""
+        ancho, alto = clave_cache[2]
+        inicio = time.perf_counter()
+        try:
+            figura = funcion(resumen, figsize=(ancho / self.DPI_GRAFICOS, alto / self.DPI_GRAFICOS))
+            png = self._graficos.renderizar_png(figura, dpi=self.DPI_GRAFICOS)
+            segundos = time.perf_counter() - inicio
+            medidor.registrar(f'grafico.{clave_cache[0]}', segundos, {'graficos': segundos})
+            cola.put((clave_cache, png, None, destino))
+        except Exception as e:
+            cola.put((clave_cache, None, e, destino))
+    
+    def recibir_graficos(self, ventana):
+        """Coloca, desde el hilo de Tk, los gráficos que terminaron de dibujarse"""
+        while True:
+            try:
+                clave_cache, png, error, (frame, aviso) = ventana['cola'].get_nowait()
+            except queue.Empty:
+                break
+            ventana['pendientes'] -= 1
+            if png is not None:
+                self.guardar_grafico_cache(clave_cache, png)
+            if ventana['cerrada']:
+                continue
+            aviso.destroy()
+            if error is not None:
+                ttk.Label(frame, text=f"Error al generar gráfico: {error}").pack(pady=50)
+            else:
+                self.mostrar_imagen_grafico(ventana, frame, png)
         
-        canvas = FigureCanvasTkAgg(fig, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        if ventana['pendientes']:
+            self.root.after(50, lambda: self.recibir_graficos(ventana))
     
-    def mostrar_estadisticas(self, parent):
+    def guardar_grafico_cache(self, clave_cache, png):
+        """Guarda un gráfico dibujado en lugar del anterior de su pestaña (de otro tamaño o versión)"""
+        clave, version, tamano = clave_cache
+        self._graficos_cache[clave] = (version, tamano, png)
+    
+    def mostrar_imagen_grafico(self, ventana, frame, png):
+        with medidor.fase('tk'):
+            imagen = tk.PhotoImage(master=ventana['win'], data=base64.b64encode(png))
+            ventana['imagenes'].append(imagen)
+            ttk.Label(frame, image=imagen).pack(fill=tk.BOTH, expand=True)
+    
+    def cerrar_graficos(self, ventana):
+        """Cierra la ventana de gráficos y libera sus imágenes"""
+        ventana['cerrada'] = True
+        ventana['win'].destroy()
+        ventana['imagenes'].clear()
+    
+    def mostrar_estadisticas(self, resumen, parent):
         """Muestra estadísticas en formato texto"""
-        df = self.leer_clientes()
-        
-        if df.empty:
+        if not resumen.total:
             ttk.Label(parent, text="No hay datos para mostrar estadísticas.").pack(pady=50)
             return
         
@@ -851,54 +1665,138 @@ class GestorClientesApp:
         
         scrollbar.config(command=text_stats.yview)
         
-        # Generar estadísticas
-        total_clientes = len(df)
-        sin_web = len(df[df['Sitio_Web_Actual'] == 'No tiene'])
-        interes_alto = len(df[df['Interes'] == 'Alto'])
-        es_cliente = len(df[df['Es_Cliente'] == 'SI'])
-        solicito_propuesta = len(df[df['Solicito_Propuesta'] == 'SI'])
-        envio_propuesta = len(df[df['Se_Le_Envio_Propuesta'] == 'SI'])
-        
-        stats_text = f"""
-{'='*60}
-        INFORME ESTADÍSTICO DE CLIENTES POTENCIALES
-{'='*60}
-
-📊 ESTADÍSTICAS PRINCIPALES:
-   • Total de clientes: {total_clientes}
-   • Clientes sin sitio web: {sin_web} ({sin_web/total_clientes*100:.1f}%)
-   • Clientes con interés alto: {interes_alto}
-   • Clientes actuales: {es_cliente} ({es_cliente/total_clientes*100:.1f}%)
-   • Solicitaron propuesta: {solicito_propuesta} ({solicito_propuesta/total_clientes*100:.1f}%)
-   • Se envió propuesta: {envio_propuesta} ({envio_propuesta/total_clientes*100:.1f}%)
-   • Sectores únicos: {df['Sector'].nunique()}
-   • Localidades únicas: {df['Localidad'].nunique()}
-
-🎯 ESTADOS DE CONTACTO:
-"""
-        for estado, count in df['Estado_Contacto'].value_counts().items():
-            porcentaje = (count / total_clientes) * 100
-            stats_text += f"   • {estado}: {count} ({porcentaje:.1f}%)\n"
-
-        stats_text += f"""
-🏢 TOP SECTORES:
-"""
-        for sector, count in df['Sector'].value_counts().head(10).items():
-            stats_text += f"   • {sector}: {count}\n"
-
-        stats_text += f"""
-📈 SEGUIMIENTO DE PROPUESTAS:
-   • Clientes que solicitaron propuesta: {solicito_propuesta}
-   • Propuestas enviadas: {envio_propuesta}
-   • Tasa de conversión a cliente: {(es_cliente/max(envio_propuesta, 1))*100:.1f}%
-"""
-
-        text_stats.insert(tk.END, stats_text)
+        text_stats.insert(tk.END, informe_texto(resumen))
         text_stats.config(state=tk.DISABLED)
+    
+    def mostrar_diagnostico(self):
+        """Ventana con la duración de cada operación (percentiles y fases) y las operaciones lentas"""
+        if self.diagnostico is not None and self.diagnostico['win'].winfo_exists():
+            self.diagnostico['win'].lift()
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Diagnóstico de rendimiento")
+        win.geometry("1150x650")
+        
+        frame = ttk.Frame(win, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        opciones = ttk.Frame(frame)
+        opciones.pack(fill=tk.X, pady=5)
+        ttk.Label(opciones, text="Informar operaciones de más de (ms):").pack(side=tk.LEFT)
+        umbral = tk.StringVar(value=f"{medidor.umbral * 1000:.0f}")
+        entrada_umbral = ttk.Entry(opciones, textvariable=umbral, width=8)
+        entrada_umbral.pack(side=tk.LEFT, padx=5)
+        entrada_umbral.bind('<Return>', lambda e: self.cambiar_umbral(umbral.get()))
+        ttk.Button(opciones, text="Aplicar",
+                  command=lambda: self.cambiar_umbral(umbral.get())).pack(side=tk.LEFT)
+        perfilar = tk.BooleanVar(value=medidor.perfilar)
+        ttk.Checkbutton(opciones, text="Perfil de las lentas (cProfile)", variable=perfilar,
+                        command=lambda: setattr(medidor, 'perfilar', perfilar.get())).pack(side=tk.LEFT, padx=(20, 5))
+        memoria = tk.BooleanVar(value=medidor.memoria)
+        ttk.Checkbutton(opciones, text="Pico de memoria (tracemalloc)", variable=memoria,
+                        command=lambda: setattr(medidor, 'memoria', memoria.get())).pack(side=tk.LEFT, padx=5)
+        
+        columnas = ('operacion', 'veces', 'p50', 'p95', 'p99', 'maximo') + FASES + ('otros',)
+        titulos = {'operacion': "Operación", 'veces': "Veces", 'p50': "p50 ms", 'p95': "p95 ms",
+                   'p99': "p99 ms", 'maximo': "Máx. ms"}
+        tree = ttk.Treeview(frame, columns=columnas, show='headings', height=12)
+        for col in columnas:
+            tree.heading(col, text=titulos.get(col, f"{col.capitalize()} ms"))
+            tree.column(col, width=200 if col == 'operacion' else 80,
+                        anchor=tk.W if col == 'operacion' else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(frame, text="Fases: tiempo medio por operación. Operaciones lentas, la más reciente primero:",
+                 font=('Arial', 9), foreground='#555555').pack(anchor=tk.W, pady=(10, 2))
+        lentas = tk.Text(frame, height=12, wrap=tk.NONE, font=('Consolas', 9))
+        lentas.pack(fill=tk.BOTH, expand=True)
+        
+        botones = ttk.Frame(frame)
+        botones.pack(pady=10)
+        ttk.Button(botones, text="🔄 Actualizar", command=self.refrescar_diagnostico).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botones, text="💾 Guardar JSON...", command=self.guardar_diagnostico).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botones, text="Reiniciar", command=self.reiniciar_diagnostico).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botones, text="Cerrar", command=win.destroy).pack(side=tk.LEFT, padx=5)
+        
+        self.diagnostico = {'win': win, 'tree': tree, 'lentas': lentas}
+        self.sondear_diagnostico()
+    
+    def sondear_diagnostico(self):
+        """Refresca el panel de diagnóstico cada pocos segundos mientras está abierto"""
+        if self.diagnostico is None or not self.diagnostico['win'].winfo_exists():
+            return
+        self.refrescar_diagnostico()
+        self.diagnostico['win'].after(self.INTERVALO_DIAGNOSTICO_MS, self.sondear_diagnostico)
+    
+    def refrescar_diagnostico(self):
+        """Vuelca en el panel el resumen del medidor, las operaciones con mayor p95 primero"""
+        diagnostico = self.diagnostico
+        if diagnostico is None or not diagnostico['win'].winfo_exists():
+            return
+        tree = diagnostico['tree']
+        tree.delete(*tree.get_children())
+        resumen = medidor.resumen()
+        for nombre, datos in sorted(resumen.items(), key=lambda o: -o[1]['p95']):
+            fases = [datos['fases'][fase]['media'] * 1000 if fase in datos['fases'] else 0.0
+                     for fase in FASES + ('otros',)]
+            tree.insert('', tk.END, values=[nombre, datos['cantidad']]
+                        + [f"{datos[clave] * 1000:.1f}" for clave in ('p50', 'p95', 'p99', 'maximo')]
+                        + [f"{ms:.1f}" for ms in fases])
+        
+        texto = diagnostico['lentas']
+        texto.config(state=tk.NORMAL)
+        texto.delete('1.0', tk.END)
+        for lenta in reversed(medidor.lentas):
+            texto.insert(tk.END, f"{lenta['hora'][11:]}  {texto_lenta(lenta)}\n")
+            if 'perfil' in lenta:
+                texto.insert(tk.END, lenta['perfil'] + '\n')
+        texto.config(state=tk.DISABLED)
+    
+    def cambiar_umbral(self, valor):
+        """Cambia desde cuántos milisegundos se informa una operación como lenta"""
+        try:
+            umbral = float(valor)
+            if umbral < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", f"Umbral no válido: {valor!r} (milisegundos)",
+                                 parent=self.diagnostico['win'])
+            return
+        medidor.umbral = umbral / 1000
+    
+    def reiniciar_diagnostico(self):
+        medidor.reiniciar()
+        self.refrescar_diagnostico()
+    
+    def guardar_diagnostico(self):
+        """Guarda las mediciones en un archivo JSON"""
+        ruta = filedialog.asksaveasfilename(
+            title="Guardar diagnóstico", defaultextension=".json", initialfile="diagnostico.json",
+            filetypes=[("JSON", "*.json")], parent=self.diagnostico['win'])
+        if not ruta:
+            return
+        try:
+            medidor.volcar(ruta)
+        except OSError as e:
+            messagebox.showerror("Error", f"Error al guardar el diagnóstico: {e}", parent=self.diagnostico['win'])
+            return
+        self.mostrar_estado(f"Diagnóstico guardado en {ruta}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gestor de clientes potenciales")
+    parser.add_argument('--umbral-lento', type=float, default=UMBRAL_LENTO * 1000,
+                        help=f"Informar en la consola las operaciones de más de estos ms (por defecto: {UMBRAL_LENTO * 1000:.0f})")
+    parser.add_argument('--perfil', action='store_true',
+                        help="Guardar un perfil de cProfile de cada operación lenta")
+    parser.add_argument('--memoria', action='store_true',
+                        help="Medir el pico de memoria de cada operación con tracemalloc (más lento)")
+    parser.add_argument('--diagnostico', help="Al cerrar, guardar las mediciones en este archivo JSON")
+    args = parser.parse_args(argv)
+    medidor.umbral = args.umbral_lento / 1000
+    medidor.perfilar = args.perfil
+    medidor.memoria = args.memoria
 
-def main():
     root = tk.Tk()
-    app = GestorClientesApp(root)
+    app = GestorClientesApp(root, ruta_diagnostico=args.diagnostico)
     root.mainloop()
 
 if __name__ == "__main__":
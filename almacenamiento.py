@@ -0,0 +1,935 @@
+"""Motores de almacenamiento para el gestor de clientes potenciales"""
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+import instantanea
+from concurrencia import (ELIMINADA, ArchivoBloqueado, BloqueoArchivo, ConflictoEdicion, ContadorIds,
+                          comprobar_versiones, escribir_atomico, identificador_proceso)
+
+ARCHIVO_EXCEL = "clientes_potenciales.xlsx"
+ARCHIVO_SQLITE = "clientes_potenciales.db"
+COLUMNAS_CLIENTES = [
+    'ID', 'Nombre_Empresa', 'Sector', 'Localidad', 'Telefono', 
+    'Correo_Electronico', 'Estado_Contacto', 'Fecha_Contacto', 
+    'Observaciones', 'Sitio_Web_Actual', 'Interes', 'Fecha_Proximo_Contacto',
+    'Es_Cliente', 'Solicito_Propuesta', 'Se_Le_Envio_Propuesta', 'Fecha_Envio_Propuesta'
+]
+# Columnas que agregan los motores a las de los datos para el uso entre varios
+# procesos (ver concurrencia.py); no se muestran
+COLUMNAS_CONTROL = ['Version', 'Actualizado']
+# Valores admitidos en los campos de lista; el primero es el valor por defecto
+OPCIONES_CAMPOS = {
+    'Estado_Contacto': ['Por contactar', 'Contactado', 'En seguimiento', 'No interesado', 'Cliente'],
+    'Interes': ['No evaluado', 'Bajo', 'Medio', 'Alto'],
+    'Sitio_Web_Actual': ['No tiene', 'Tiene'],
+    'Es_Cliente': ['NO', 'SI'],
+    'Solicito_Propuesta': ['NO', 'SI'],
+    'Se_Le_Envio_Propuesta': ['NO', 'SI'],
+}
+# Formato de las fechas en los archivos (en memoria son datetime64, ver esquema.py)
+FORMATO_FECHA = '%Y-%m-%d'
+
+
+def fecha_de_valor(valor):
+    """Timestamp de un texto AAAA-MM-DD o DD/MM/AAAA, de una fecha o de un Timestamp; NaT si no se entiende"""
+    if isinstance(valor, (datetime.date, pd.Timestamp)):
+        return pd.Timestamp(valor).normalize()
+    texto = str(valor).strip()
+    fecha = pd.to_datetime(texto, format='ISO8601', errors='coerce')
+    if pd.isna(fecha):
+        fecha = pd.to_datetime(texto, dayfirst=True, errors='coerce')
+    return fecha
+
+
+def texto_fechas(serie):
+    """Columna de fechas como texto AAAA-MM-DD (NaN en las vacías), formateando cada fecha distinta una vez"""
+    codigos, unicas = pd.factorize(serie)
+    textos = np.append(np.array([fecha.strftime(FORMATO_FECHA) for fecha in unicas], dtype=object), np.nan)
+    return pd.Series(textos[codigos], index=serie.index, name=serie.name, dtype=object)
+
+
+def valor_sql(valor):
+    """Convierte un valor de pandas/numpy a un tipo nativo de Python (sqlite3, JSON)"""
+    if valor is None:
+        return None
+    try:
+        if pd.isna(valor):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(valor, (datetime.date, pd.Timestamp)):
+        return valor.strftime(FORMATO_FECHA)
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return valor
+
+
+def asignar_valor(df, mascara, campo, valor):
+    """Asigna un valor a las filas de la máscara, ampliando el tipo de la columna si hace falta"""
+    columna = df[campo]
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        if valor is None or (isinstance(valor, str) and not valor.strip()):
+            valor = None
+        elif valor not in columna.cat.categories:
+            df[campo] = columna.cat.add_categories([valor])
+    elif pd.api.types.is_datetime64_any_dtype(columna.dtype):
+        valor = pd.NaT if valor is None or valor == '' else fecha_de_valor(valor)
+    try:
+        df.loc[mascara, campo] = valor
+    except (TypeError, ValueError):
+        # Columna numérica (p. ej. toda vacía al leer el Excel) que recibe texto
+        df[campo] = df[campo].astype(object)
+        df.loc[mascara, campo] = valor
+
+
+def asignar_ids_faltantes(df):
+    """Da un ID nuevo (a partir del máximo) a los registros que no lo tienen"""
+    sin_id = df['ID'].isna()
+    if sin_id.any():
+        df = df.copy()
+        siguiente = int(df['ID'].max()) + 1 if not sin_id.all() else 1
+        df.loc[sin_id, 'ID'] = range(siguiente, siguiente + int(sin_id.sum()))
+    if len(df) and df['ID'].dtype != 'int64':
+        df['ID'] = df['ID'].astype('int64')
+    return df
+
+
+def descartar_superadas(operaciones):
+    """Quita de una tanda (nombre, argumentos) lo anterior al último guardado completo"""
+    for i in range(len(operaciones) - 1, -1, -1):
+        if operaciones[i][0] == 'guardar':
+            return operaciones[i:]
+    return operaciones
+
+
+class Almacenamiento:
+    """Interfaz común de los motores de almacenamiento"""
+
+    nombre = ""
+
+    def __init__(self, ruta, columnas):
+        self.ruta = ruta
+        self.columnas = list(columnas) + [col for col in COLUMNAS_CONTROL if col not in columnas]
+        # Duración de cada fase de la última lectura, en segundos
+        self.tiempos_lectura = {}
+
+    def completar_columnas(self, df):
+        """Asegura que todas las columnas esperadas existan"""
+        for col in self.columnas:
+            if col not in df.columns:
+                df[col] = None
+        return df
+
+    def inicializar(self):
+        """Crea el almacenamiento si no existe"""
+        raise NotImplementedError
+
+    def firma(self):
+        """Valor que cambia cuando otro proceso modifica los datos"""
+        raise NotImplementedError
+
+    def leer(self, progreso=None):
+        """Lee todos los clientes. `progreso(filas)`, si se da, recibe las filas leídas hasta el momento"""
+        raise NotImplementedError
+
+    def guardar(self, df):
+        """Escribe el conjunto completo de clientes"""
+        raise NotImplementedError
+
+    # Operaciones por fila. `df` es el conjunto completo ya modificado en
+    # memoria; los motores sin escritura por fila simplemente lo guardan.
+    # `versiones`, si se da, es la versión que tenía cada fila al editarla:
+    # las filas que ya no la tienen no se cambian (ConflictoEdicion).
+
+    def insertar(self, df, filas):
+        """Persiste filas nuevas (lista de diccionarios)"""
+        self.guardar(df)
+
+    def actualizar(self, df, ids, cambios, versiones=None):
+        """Persiste los cambios (diccionario campo -> valor) de los IDs dados"""
+        self.guardar(df)
+
+    def eliminar(self, df, ids, versiones=None):
+        """Persiste la eliminación de los IDs dados"""
+        self.guardar(df)
+
+    def reservar_ids(self, cantidad, minimo=1):
+        """Reserva `cantidad` IDs contiguos, ninguno menor que `minimo`, que no usará otro proceso; devuelve el primero"""
+        raise NotImplementedError
+
+    def aplicar_lote(self, operaciones):
+        """Aplica en orden una tanda de operaciones (nombre del método, argumentos).
+
+        Devuelve cuántas escrituras hizo. Sin escritura por fila basta con
+        guardar el conjunto completo de la última operación.
+        """
+        if not operaciones:
+            return 0
+        self.guardar(operaciones[-1][1][0])
+        return 1
+
+    def exportar_excel(self, ruta):
+        """Exporta todos los clientes a un libro .xlsx"""
+        self.leer().to_excel(ruta, index=False)
+
+    def cerrar(self):
+        """Libera los recursos del motor"""
+
+
+class AlmacenamientoExcel(Almacenamiento):
+    """Guarda los clientes en un libro .xlsx con un diario de cambios.
+
+    Cada alta, modificación o baja se añade como una línea JSON al diario
+    (`<ruta>.diario`), sin reescribir el libro. Un hilo en segundo plano
+    compacta periódicamente el diario sobre el libro, y también al cerrar.
+    Al leer, las entradas pendientes del diario se reaplican sobre el libro.
+
+    Junto al libro se mantiene una instantánea binaria (`<ruta>.instantanea`,
+    arreglos de NumPy sin pickle con las columnas tal como se leyeron, ver
+    instantanea.py). Si es más reciente que el libro se carga en lugar de
+    interpretar el XML del .xlsx.
+
+    Varias copias de la aplicación pueden usar el mismo libro (ver
+    concurrencia.py). Las entradas del diario llevan un número de secuencia
+    y el proceso que las escribió, y se añaden con el bloqueo de
+    `<ruta>.bloqueo` tomado. Antes de añadir, cada proceso lee solo lo que se
+    agregó al diario desde su última lectura, y con eso sabe la versión
+    vigente de las filas que cambiaron: las modificaciones y bajas de filas
+    que otro proceso cambió después no se anotan (ConflictoEdicion). La
+    compactación reconstruye el libro desde la instantánea y el diario, no
+    desde la memoria del proceso, y deja al principio del diario una línea
+    'base' con la última secuencia volcada.
+    """
+
+    nombre = "Excel"
+
+    # Lecturas del libro sin bloqueo antes de leerlo con el bloqueo tomado,
+    # si otro proceso lo compacta mientras tanto
+    INTENTOS_LECTURA = 3
+    # Comienzo de la línea 'base' del diario, para reconocerla sin interpretarla
+    PREFIJO_BASE = b'{"op": "base"'
+
+    def __init__(self, ruta, columnas, intervalo_compactacion=30):
+        super().__init__(ruta, columnas)
+        self.ruta_diario = ruta + '.diario'
+        self.ruta_instantanea = ruta + '.instantanea'
+        self.intervalo_compactacion = intervalo_compactacion
+        self._bloqueo = threading.RLock()
+        # Una sola escritura del libro a la vez en el proceso (usan los mismos temporales)
+        self._escritura_libro = threading.Lock()
+        self.bloqueo_archivos = BloqueoArchivo(ruta + '.bloqueo', 'diario')
+        self.contador_ids = ContadorIds(ruta + '.ids', self.bloqueo_archivos)
+        self.origen = identificador_proceso()
+        self._temporizador = None
+        # Firma de los archivos tras la última escritura propia y generación
+        # de datos; la generación solo avanza con cambios externos.
+        self._firma_esperada = None
+        self._generacion = 0
+        # Durante una compactación el libro cambia sin que sea un cambio externo
+        self._compactando = False
+        # Lectura incremental del diario: (generación del diario, bytes leídos)
+        # y última secuencia vista
+        self._cursor = (None, 0)
+        self._secuencia = 0
+        # Versión vigente de las filas: la del libro en la última lectura y,
+        # encima, la de las filas cambiadas después (ELIMINADA si se borraron,
+        # None si no se sabe). Tras un volcado de otro proceso con entradas que
+        # este no leyó, la del libro se vuelve a tomar de la instantánea.
+        self._versiones_libro = None
+        self._versiones = {}
+        self._desfasado = False
+        # IDs que otros procesos cambiaron desde la última lectura
+        self._ajenos = set()
+
+    def inicializar(self):
+        """Crea el archivo si no existe"""
+        if not os.path.exists(self.ruta):
+            with self.bloqueo_archivos:
+                if not os.path.exists(self.ruta):
+                    pd.DataFrame(columns=self.columnas).to_excel(self.ruta, index=False)
+
+    def firma_libro(self):
+        """(mtime, tamaño) del libro, o None si no existe"""
+        try:
+            stat = os.stat(self.ruta)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def firma_archivos(self):
+        """(mtime, tamaño) del libro y del diario"""
+        firma = []
+        for ruta in (self.ruta, self.ruta_diario):
+            try:
+                stat = os.stat(ruta)
+                firma.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                firma.append(None)
+        return tuple(firma)
+
+    def firma(self):
+        """Cambia solo si el libro o el diario fueron modificados por otro proceso"""
+        with self._bloqueo:
+            if self._compactando:
+                return self._generacion
+            actual = self.firma_archivos()
+            if actual != self._firma_esperada:
+                self._firma_esperada = actual
+                self._generacion += 1
+            return self._generacion
+
+    # --- Lectura ---------------------------------------------------------
+
+    def leer(self, progreso=None):
+        """Lee el libro (o su instantánea) y reaplica las entradas pendientes del diario.
+
+        El libro se lee sin bloquear a los demás procesos; si otro lo
+        compacta mientras tanto se vuelve a leer. El libro se lee de una vez,
+        así que no informa progreso.
+        """
+        with self._bloqueo:
+            for intento in range(self.INTENTOS_LECTURA):
+                # El último intento, con el bloqueo tomado durante toda la lectura
+                ultimo = intento == self.INTENTOS_LECTURA - 1
+                with self.bloqueo_archivos if ultimo else nullcontext():
+                    self.tiempos_lectura = {}
+                    libro = self.firma_libro()
+                    df = self.leer_libro(libro)
+                    inicio = time.perf_counter()
+                    with self.bloqueo_archivos:
+                        if self.firma_libro() != libro:
+                            continue
+                        entradas, _ = self.leer_diario(completo=True)
+                break
+            else:
+                raise ArchivoBloqueado(f"{self.ruta} cambió mientras se leía")
+
+            df = self.reaplicar(df, entradas)
+            self.tiempos_lectura['diario'] = time.perf_counter() - inicio
+            self._secuencia = max([self._secuencia] + [e.get('secuencia') or 0 for e in entradas])
+            self.tomar_versiones(df)
+            return df
+
+    def leer_libro(self, libro=None):
+        """El libro tal como está en disco: la instantánea si está al día, si no el .xlsx"""
+        inicio = time.perf_counter()
+        df = self.leer_instantanea()
+        if df is not None:
+            self.tiempos_lectura['instantanea'] = time.perf_counter() - inicio
+            return df
+        df = self.completar_columnas(pd.read_excel(self.ruta))
+        self.tiempos_lectura['excel'] = time.perf_counter() - inicio
+        self.escribir_instantanea(df, libro)
+        return df
+
+    def leer_instantanea(self):
+        """Carga la instantánea binaria si existe y es más reciente que el libro"""
+        try:
+            if os.path.getmtime(self.ruta_instantanea) < os.path.getmtime(self.ruta):
+                return None
+        except OSError:
+            return None
+        try:
+            return self.completar_columnas(instantanea.leer(self.ruta_instantanea))
+        except Exception as e:
+            # Se lee el .xlsx y la instantánea se vuelve a escribir
+            print(f"Instantánea no válida ({self.ruta_instantanea}), se lee el libro: {e}")
+            return None
+
+    def escribir_instantanea(self, df, libro):
+        """Regenera la instantánea a partir del libro leído, si sigue siendo el mismo (firma `libro`)"""
+        temporal = f"{self.ruta_instantanea}.{os.getpid()}.tmp"
+        try:
+            instantanea.escribir(df.reset_index(drop=True), temporal)
+            with self.bloqueo_archivos:
+                if libro is not None and self.firma_libro() == libro:
+                    os.replace(temporal, self.ruta_instantanea)
+                    return
+            os.remove(temporal)
+        except Exception as e:
+            print(f"Error al escribir la instantánea: {e}")
+
+    def leer_diario(self, completo=False):
+        """Entradas del diario que este proceso aún no leyó (todas con `completo` o si otro lo reescribió).
+
+        Se llama con el bloqueo de archivos tomado. Devuelve también si el
+        diario termina en una línea incompleta (un corte durante una
+        escritura), que no se lee.
+        """
+        generacion, posicion = (None, 0) if completo else self._cursor
+        try:
+            f = open(self.ruta_diario, 'rb')
+        except FileNotFoundError:
+            self._cursor = (None, 0)
+            return [], False
+        with f:
+            primera = f.readline()
+            actual = None
+            if primera.startswith(self.PREFIJO_BASE):
+                actual = json.loads(primera).get('generacion')
+            if completo or actual != generacion or os.fstat(f.fileno()).st_size < posicion:
+                posicion = 0
+            f.seek(posicion)
+            datos = f.read()
+        fin = datos.rfind(b'\n') + 1
+        self._cursor = (actual, posicion + fin)
+        return self.interpretar(datos[:fin]), fin < len(datos)
+
+    @staticmethod
+    def interpretar(datos):
+        """Entradas de las líneas JSON de `datos`; las ilegibles se informan y se saltan"""
+        entradas = []
+        for linea in datos.splitlines():
+            if not linea.strip():
+                continue
+            try:
+                entradas.append(json.loads(linea))
+            except ValueError:
+                # Línea incompleta por un corte durante la escritura
+                print("Entrada del diario ilegible, se ignora")
+        return entradas
+
+    def reaplicar(self, df, entradas):
+        """Aplica en orden las entradas del diario sobre el DataFrame"""
+        for entrada in entradas:
+            df = self.aplicar_entrada(df, entrada)
+        return df.reset_index(drop=True)
+
+    def aplicar_entrada(self, df, entrada):
+        """Aplica una entrada del diario. Es idempotente: reaplicarla no cambia el resultado"""
+        operacion = entrada['op']
+        if operacion == 'insertar':
+            filas = pd.DataFrame(entrada['filas'])
+            df = df[~df['ID'].isin(filas['ID'])]
+            return pd.concat([df, filas], ignore_index=True)
+        if operacion == 'actualizar':
+            mascara = df['ID'].isin(entrada['ids'])
+            for campo, valor in entrada['cambios'].items():
+                if campo in df.columns and campo != 'ID':
+                    asignar_valor(df, mascara, campo, valor)
+            if entrada.get('versiones') is not None and 'Version' in df.columns:
+                nuevas = pd.Series(np.asarray(entrada['versiones'], dtype=np.int64) + 1, index=entrada['ids'])
+                df.loc[mascara, 'Version'] = df.loc[mascara, 'ID'].map(nuevas).to_numpy()
+            return df
+        if operacion == 'eliminar':
+            return df[~df['ID'].isin(entrada['ids'])]
+        return df
+
+    # --- Versiones de las filas -------------------------------------------
+
+    def tomar_versiones(self, df):
+        """Parte de las versiones de las filas recién leídas"""
+        self._versiones = {}
+        self._ajenos = set()
+        self._desfasado = False
+        if 'Version' not in df.columns:
+            self._versiones_libro = None
+            return
+        versiones = pd.to_numeric(df['Version'], errors='coerce').fillna(0).astype('int64')
+        serie = pd.Series(versiones.to_numpy(), index=df['ID'].to_numpy())
+        self._versiones_libro = serie[~serie.index.duplicated(keep='last')]
+
+    def registrar(self, entradas):
+        """Toma la versión de las filas que cambian las entradas aún no vistas; indica si alguna es ajena"""
+        ajenas = False
+        for entrada in entradas:
+            secuencia = entrada.get('secuencia')
+            if secuencia is None or secuencia <= self._secuencia:
+                continue
+            self._secuencia = secuencia
+            if entrada['op'] == 'base':
+                # Otro proceso volcó al libro entradas que este no llegó a leer
+                self._versiones = {}
+                self._versiones_libro = None
+                self._desfasado = True
+                ajenas = True
+                continue
+            if entrada.get('origen') != self.origen:
+                ajenas = True
+                if entrada['op'] in ('actualizar', 'eliminar'):
+                    self._ajenos.update(entrada['ids'])
+            self.anotar_versiones(entrada)
+        return ajenas
+
+    def anotar_versiones(self, entrada):
+        operacion = entrada['op']
+        if operacion == 'insertar':
+            for fila in entrada['filas']:
+                self._versiones[fila['ID']] = fila.get('Version') or 0
+        elif operacion == 'actualizar':
+            versiones = entrada.get('versiones') or [None] * len(entrada['ids'])
+            for cliente_id, version in zip(entrada['ids'], versiones):
+                if self._versiones.get(cliente_id) != ELIMINADA:
+                    self._versiones[cliente_id] = None if version is None else version + 1
+        elif operacion == 'eliminar':
+            for cliente_id in entrada['ids']:
+                self._versiones[cliente_id] = ELIMINADA
+
+    def version_vigente(self, cliente_id):
+        """Versión actual en disco de la fila (ELIMINADA si se borró, None si no se sabe)"""
+        if cliente_id in self._versiones:
+            return self._versiones[cliente_id]
+        if self._desfasado:
+            # Caso raro: hay que volver a mirar el libro
+            self._desfasado = False
+            self.tomar_versiones_libro()
+        if self._versiones_libro is None:
+            return None
+        # Lo que no está en el libro ni cambió después ya no existe
+        version = self._versiones_libro.get(cliente_id)
+        return ELIMINADA if version is None else int(version)
+
+    def tomar_versiones_libro(self):
+        """Versiones de la instantánea (o del libro) actual, sin tocar las de las filas ya cambiadas"""
+        versiones, ajenos = self._versiones, self._ajenos
+        self.tomar_versiones(self.reaplicar(self.leer_libro(self.firma_libro()), []))
+        self._versiones, self._ajenos = versiones, ajenos
+
+    def comprobar(self, entrada):
+        """La entrada sin las filas que otro proceso cambió desde que se leyeron, y esos pares (ID, motivo)"""
+        versiones = entrada.get('versiones')
+        if entrada['op'] not in ('actualizar', 'eliminar') or versiones is None:
+            return entrada, []
+        actuales = [self.version_vigente(cliente_id) for cliente_id in entrada['ids']]
+        conflictos = comprobar_versiones(entrada['ids'], versiones, actuales)
+        if entrada['op'] == 'eliminar':
+            # Eliminar lo que otro ya eliminó no es un conflicto
+            conflictos = [c for c in conflictos if c[1] != 'eliminado']
+        if not conflictos:
+            return entrada, []
+        rechazados = {cliente_id for cliente_id, _ in conflictos}
+        quedan = [(i, v) for i, v in zip(entrada['ids'], versiones) if i not in rechazados]
+        if not quedan:
+            return None, conflictos
+        ids, versiones = zip(*quedan)
+        return dict(entrada, ids=list(ids), versiones=list(versiones)), conflictos
+
+    # --- Escritura -------------------------------------------------------
+
+    def anotar(self, entradas):
+        """Añade entradas al diario y las sincroniza a disco (un solo fsync) antes de volver.
+
+        Las modificaciones y bajas de filas que otro proceso cambió no se
+        añaden; se informan al final con ConflictoEdicion.
+        """
+        conflictos = []
+        with self._bloqueo, self.bloqueo_archivos:
+            nuevas, cortada = self.leer_diario()
+            ajenas = self.registrar(nuevas)
+            anotadas = []
+            for entrada in entradas:
+                entrada, rechazadas = self.comprobar(entrada)
+                conflictos.extend(rechazadas)
+                if entrada is None:
+                    continue
+                self._secuencia += 1
+                entrada = dict(entrada, secuencia=self._secuencia, origen=self.origen)
+                self.anotar_versiones(entrada)
+                anotadas.append(entrada)
+            if anotadas:
+                lineas = ''.join(json.dumps(entrada, default=valor_sql, ensure_ascii=False) + '\n'
+                                 for entrada in anotadas)
+                # Tras una línea cortada, la primera entrada nueva empieza en otra línea
+                datos = (b'\n' if cortada else b'') + lineas.encode('utf-8')
+                with open(self.ruta_diario, 'ab') as f:
+                    f.write(datos)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._cursor = (self._cursor[0], f.tell())
+                self.programar_compactacion()
+            # Con cambios ajenos, que la próxima comprobación de la firma relea
+            self._firma_esperada = None if ajenas else self.firma_archivos()
+        if conflictos:
+            raise ConflictoEdicion.de_pares(conflictos)
+
+    def entrada(self, operacion, df, *args):
+        """Entrada del diario para una operación por fila"""
+        if operacion == 'insertar':
+            return {'op': 'insertar', 'filas': args[0]}
+        if operacion == 'actualizar':
+            entrada = {'op': 'actualizar', 'ids': list(args[0]), 'cambios': args[1]}
+        else:
+            entrada = {'op': 'eliminar', 'ids': list(args[0])}
+        versiones = args[-1] if len(args) > (2 if operacion == 'actualizar' else 1) else None
+        if versiones is not None:
+            entrada['versiones'] = [int(v) for v in versiones]
+        return entrada
+
+    def insertar(self, df, filas):
+        self.anotar([self.entrada('insertar', df, filas)])
+
+    def actualizar(self, df, ids, cambios, versiones=None):
+        self.anotar([self.entrada('actualizar', df, ids, cambios, versiones)])
+
+    def eliminar(self, df, ids, versiones=None):
+        self.anotar([self.entrada('eliminar', df, ids, versiones)])
+
+    def aplicar_lote(self, operaciones):
+        """Un guardado completo como mucho y las operaciones por fila siguientes en un solo añadido al diario"""
+        operaciones = descartar_superadas(operaciones)
+        escrituras = 0
+        if operaciones and operaciones[0][0] == 'guardar':
+            self.guardar(*operaciones[0][1])
+            operaciones = operaciones[1:]
+            escrituras += 1
+        if operaciones:
+            self.anotar([self.entrada(nombre, *args) for nombre, args in operaciones])
+            escrituras += 1
+        return escrituras
+
+    def reservar_ids(self, cantidad, minimo=1):
+        """IDs contiguos que ningún otro proceso va a usar; devuelve el primero"""
+        return self.contador_ids.reservar(cantidad, minimo)
+
+    def escribir_temporales(self, df):
+        """Escribe el libro y la instantánea en temporales propios del proceso; devuelve sus rutas"""
+        raiz, extension = os.path.splitext(self.ruta)
+        libro = f"{raiz}.{os.getpid()}.tmp{extension}"
+        temporal = f"{self.ruta_instantanea}.{os.getpid()}.tmp"
+        # Las fechas, como texto AAAA-MM-DD igual que en el resto de archivos
+        fechas = {col: texto_fechas(df[col]) for col in df.columns
+                  if pd.api.types.is_datetime64_any_dtype(df[col].dtype)}
+        df.assign(**fechas).to_excel(libro, index=False)
+        instantanea.escribir(df.reset_index(drop=True), temporal)
+        return libro, temporal
+
+    def reemplazar(self, temporales, resto=b'', secuencia=None):
+        """Pone los temporales en lugar del libro y la instantánea y rehace el diario.
+
+        El diario queda con una línea 'base' nueva y `resto` (lo añadido
+        después de lo volcado). Se llama con el bloqueo de archivos tomado.
+        """
+        libro, temporal = temporales
+        os.replace(libro, self.ruta)
+        os.replace(temporal, self.ruta_instantanea)
+        generacion = identificador_proceso()
+        base = json.dumps({'op': 'base', 'generacion': generacion,
+                           'secuencia': self._secuencia if secuencia is None else secuencia}) + '\n'
+        escribir_atomico(self.ruta_diario, base.encode('utf-8') + resto)
+        self._cursor = (generacion, len(base.encode('utf-8')) + len(resto))
+
+    @staticmethod
+    def descartar(temporales):
+        for ruta in temporales:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    def guardar(self, df):
+        """Reescribe el libro completo y vacía el diario.
+
+        No se guarda (ConflictoEdicion) si otro proceso cambió filas desde
+        la última lectura, porque se perderían sus cambios.
+        """
+        with self._escritura_libro:
+            temporales = self.escribir_temporales(df)
+            with self._bloqueo, self.bloqueo_archivos:
+                nuevas, _ = self.leer_diario()
+                self.registrar(nuevas)
+                if self._ajenos or self._desfasado:
+                    self.descartar(temporales)
+                    raise ConflictoEdicion(self._ajenos)
+                self._secuencia += 1
+                self.reemplazar(temporales)
+                self.tomar_versiones(df)
+                self._firma_esperada = self.firma_archivos()
+
+    def hay_pendientes(self):
+        """Indica si el diario tiene entradas sin compactar (además de la línea 'base')"""
+        try:
+            with open(self.ruta_diario, 'rb') as f:
+                primera = f.readline()
+                return bool(f.read(1)) or (bool(primera) and not primera.startswith(self.PREFIJO_BASE))
+        except FileNotFoundError:
+            return False
+
+    def programar_compactacion(self):
+        """Programa una compactación en segundo plano si no hay una pendiente"""
+        if self._temporizador is None and self.intervalo_compactacion:
+            self._temporizador = threading.Timer(self.intervalo_compactacion, self.compactar)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def compactar(self):
+        """Vuelca al libro lo anotado en el diario y quita del diario lo ya volcado"""
+        with self._escritura_libro:
+            with self._bloqueo:
+                self._temporizador = None
+                if not self.hay_pendientes():
+                    return
+                self._compactando = True
+            try:
+                self.volcar_diario()
+            except Exception as e:
+                print(f"Error al compactar el diario: {e}")
+            finally:
+                with self._bloqueo:
+                    self._compactando = False
+
+    def volcar_diario(self):
+        """Reconstruye el libro desde la instantánea y el diario hasta el punto actual.
+
+        Solo se toma el bloqueo para ver hasta dónde llega el diario y, al
+        final, para reemplazar los archivos; la escritura del libro se hace
+        sin él, de modo que los demás procesos siguen anotando. Si entretanto
+        otro proceso compactó, no se reemplaza nada.
+        """
+        with self._bloqueo, self.bloqueo_archivos:
+            ajenas = self.registrar(self.leer_diario()[0])
+            libro = self.firma_libro()
+            volcado = self._cursor[1]
+            with open(self.ruta_diario, 'rb') as f:
+                entradas = self.interpretar(f.read(volcado))
+        secuencia = max([0] + [e.get('secuencia') or 0 for e in entradas])
+
+        temporales = self.escribir_temporales(self.reaplicar(self.leer_libro(libro), entradas))
+
+        with self._bloqueo, self.bloqueo_archivos:
+            if self.firma_libro() != libro:
+                self.descartar(temporales)
+                return
+            ajenas = self.registrar(self.leer_diario()[0]) or ajenas
+            with open(self.ruta_diario, 'rb') as f:
+                f.seek(volcado)
+                resto = f.read(self._cursor[1] - volcado)
+            self.reemplazar(temporales, resto, secuencia)
+            self._firma_esperada = None if ajenas else self.firma_archivos()
+            if resto:
+                self.programar_compactacion()
+
+    def cerrar(self):
+        """Cancela la compactación programada y compacta lo pendiente"""
+        with self._bloqueo:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+        self.compactar()
+
+
+class AlmacenamientoSQLite(Almacenamiento):
+    """Guarda los clientes en una base SQLite local con escrituras por fila"""
+
+    nombre = "SQLite"
+
+    # Columnas usadas por filtros y búsquedas
+    columnas_indexadas = [
+        'Nombre_Empresa', 'Sector', 'Localidad', 'Estado_Contacto', 'Interes',
+        'Sitio_Web_Actual', 'Es_Cliente', 'Solicito_Propuesta', 'Se_Le_Envio_Propuesta'
+    ]
+
+    # Filas por bloque en las lecturas que informan su progreso
+    FILAS_POR_BLOQUE = 50000
+
+    def __init__(self, ruta, columnas):
+        super().__init__(ruta, columnas)
+        self.conexion = None
+        # La conexión es compartida por el hilo de E/S y la reserva de IDs
+        self._bloqueo = threading.RLock()
+
+    def conectar(self):
+        """Abre la conexión (una sola por instancia)"""
+        if self.conexion is None:
+            self.conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute("PRAGMA synchronous=NORMAL")
+        return self.conexion
+
+    def inicializar(self):
+        """Crea la tabla e índices si no existen y agrega las columnas que falten"""
+        definiciones = ', '.join(
+            '"ID" INTEGER PRIMARY KEY' if col == 'ID' else f'"{col}"'
+            for col in self.columnas
+        )
+        conexion = self.conectar()
+        with conexion:
+            conexion.execute(f'CREATE TABLE IF NOT EXISTS clientes ({definiciones})')
+            existentes = {fila[1] for fila in conexion.execute('PRAGMA table_info(clientes)')}
+            for col in self.columnas:
+                if col not in existentes:
+                    conexion.execute(f'ALTER TABLE clientes ADD COLUMN "{col}"')
+            conexion.execute('CREATE TABLE IF NOT EXISTS contadores (nombre TEXT PRIMARY KEY, valor INTEGER NOT NULL)')
+            for col in self.columnas_indexadas:
+                if col in self.columnas:
+                    conexion.execute(
+                        f'CREATE INDEX IF NOT EXISTS idx_clientes_{col.lower()} ON clientes ("{col}")'
+                    )
+
+    def firma(self):
+        """Cambia cuando otra conexión confirma escrituras en la base"""
+        if not os.path.exists(self.ruta):
+            return None
+        return self.conectar().execute("PRAGMA data_version").fetchone()[0]
+
+    def leer(self, progreso=None):
+        """Lee todos los clientes ordenados por ID (por bloques si se sigue el progreso)"""
+        inicio = time.perf_counter()
+        columnas = ', '.join(f'"{col}"' for col in self.columnas)
+        consulta = f'SELECT {columnas} FROM clientes ORDER BY "ID"'
+        if progreso is None:
+            df = pd.read_sql_query(consulta, self.conectar())
+        else:
+            bloques = []
+            filas = 0
+            for bloque in pd.read_sql_query(consulta, self.conectar(), chunksize=self.FILAS_POR_BLOQUE):
+                bloques.append(bloque)
+                filas += len(bloque)
+                progreso(filas)
+            df = pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame(columns=self.columnas)
+        self.tiempos_lectura = {'sqlite': time.perf_counter() - inicio}
+        return self.completar_columnas(df)
+
+    def sql_insertar(self):
+        """Sentencia INSERT con todas las columnas"""
+        columnas = ', '.join(f'"{col}"' for col in self.columnas)
+        marcadores = ', '.join('?' for _ in self.columnas)
+        return f'INSERT INTO clientes ({columnas}) VALUES ({marcadores})'
+
+    # Sentencias de cada operación, sin confirmar: quien las llama abre la transacción
+
+    def ejecutar_guardar(self, conexion, df):
+        filas = df.reindex(columns=self.columnas).itertuples(index=False, name=None)
+        conexion.execute('DELETE FROM clientes')
+        conexion.executemany(
+            self.sql_insertar(),
+            ([valor_sql(v) for v in fila] for fila in filas)
+        )
+
+    def ejecutar_insertar(self, conexion, df, filas):
+        conexion.executemany(
+            self.sql_insertar(),
+            ([valor_sql(fila.get(col)) for col in self.columnas] for fila in filas)
+        )
+
+    # Con `versiones`, cada fila se cambia solo si sigue en esa versión (y
+    # pasa a la siguiente); devuelven los pares (ID, motivo) de las demás
+
+    def ejecutar_actualizar(self, conexion, df, ids, cambios, versiones=None):
+        campos = [campo for campo in cambios if campo != 'ID' and campo in self.columnas]
+        asignaciones = [f'"{campo}" = ?' for campo in campos]
+        valores = [valor_sql(cambios[campo]) for campo in campos]
+        if versiones is None:
+            if campos:
+                conexion.executemany(
+                    f'UPDATE clientes SET {", ".join(asignaciones)} WHERE "ID" = ?',
+                    (valores + [valor_sql(cliente_id)] for cliente_id in ids)
+                )
+            return []
+        asignaciones.append('"Version" = ?')
+        sentencia = f'UPDATE clientes SET {", ".join(asignaciones)} WHERE "ID" = ? AND COALESCE("Version", 0) = ?'
+        conflictos = []
+        for cliente_id, version in zip(ids, versiones):
+            cursor = conexion.execute(sentencia, valores + [int(version) + 1, valor_sql(cliente_id), int(version)])
+            if cursor.rowcount == 0:
+                conflictos.append((cliente_id, self.motivo_conflicto(conexion, cliente_id)))
+        return conflictos
+
+    def ejecutar_eliminar(self, conexion, df, ids, versiones=None):
+        if versiones is None:
+            conexion.executemany(
+                'DELETE FROM clientes WHERE "ID" = ?',
+                ((valor_sql(cliente_id),) for cliente_id in ids)
+            )
+            return []
+        conflictos = []
+        for cliente_id, version in zip(ids, versiones):
+            cursor = conexion.execute('DELETE FROM clientes WHERE "ID" = ? AND COALESCE("Version", 0) = ?',
+                                      (valor_sql(cliente_id), int(version)))
+            # Eliminar lo que otro ya eliminó no es un conflicto
+            if cursor.rowcount == 0 and self.motivo_conflicto(conexion, cliente_id) == 'modificado':
+                conflictos.append((cliente_id, 'modificado'))
+        return conflictos
+
+    @staticmethod
+    def motivo_conflicto(conexion, cliente_id):
+        """'modificado' si la fila sigue en la base, 'eliminado' si no"""
+        fila = conexion.execute('SELECT 1 FROM clientes WHERE "ID" = ?', (valor_sql(cliente_id),)).fetchone()
+        return 'modificado' if fila else 'eliminado'
+
+    def guardar(self, df):
+        """Reemplaza todo el contenido de la tabla en una transacción"""
+        self.aplicar_lote([('guardar', (df,))])
+
+    def insertar(self, df, filas):
+        self.aplicar_lote([('insertar', (df, filas))])
+
+    def actualizar(self, df, ids, cambios, versiones=None):
+        self.aplicar_lote([('actualizar', (df, ids, cambios, versiones))])
+
+    def eliminar(self, df, ids, versiones=None):
+        self.aplicar_lote([('eliminar', (df, ids, versiones))])
+
+    def aplicar_lote(self, operaciones):
+        """Toda la tanda en una sola transacción.
+
+        Las filas que otro proceso cambió no se tocan; el resto se confirma
+        y después se informa el conflicto.
+        """
+        operaciones = descartar_superadas(operaciones)
+        if not operaciones:
+            return 0
+        conflictos = []
+        with self._bloqueo:
+            conexion = self.conectar()
+            with conexion:
+                for nombre, args in operaciones:
+                    conflictos.extend(getattr(self, 'ejecutar_' + nombre)(conexion, *args) or [])
+        if conflictos:
+            raise ConflictoEdicion.de_pares(conflictos)
+        return 1
+
+    def reservar_ids(self, cantidad, minimo=1):
+        """IDs contiguos que ningún otro proceso va a usar, con un contador en la base; devuelve el primero"""
+        with self._bloqueo:
+            conexion = self.conectar()
+            with conexion:
+                # Bloqueo de escritura desde el principio: leer y avanzar el contador es atómico
+                conexion.execute('BEGIN IMMEDIATE')
+                fila = conexion.execute("SELECT valor FROM contadores WHERE nombre = 'ID'").fetchone()
+                maximo = conexion.execute('SELECT COALESCE(MAX("ID"), 0) FROM clientes').fetchone()[0]
+                inicio = max(int(minimo), maximo + 1, fila[0] if fila else 1)
+                conexion.execute("INSERT OR REPLACE INTO contadores (nombre, valor) VALUES ('ID', ?)",
+                                 (inicio + cantidad,))
+        return inicio
+
+    def migrar_desde_excel(self, ruta_excel):
+        """Carga en la base todos los clientes de un libro .xlsx existente"""
+        df = self.completar_columnas(pd.read_excel(ruta_excel))
+
+        # Los registros sin ID reciben uno nuevo para poder usarlo como clave
+        df = asignar_ids_faltantes(df)
+
+        self.inicializar()
+        self.guardar(df)
+        return len(df)
+
+    def cerrar(self):
+        if self.conexion is not None:
+            self.conexion.close()
+            self.conexion = None
+
+
+def abrir_almacenamiento(archivo_excel=ARCHIVO_EXCEL, archivo_sqlite=ARCHIVO_SQLITE,
+                         columnas=COLUMNAS_CLIENTES):
+    """Usa la base SQLite si ya fue migrada; si no, el archivo Excel"""
+    if os.path.exists(archivo_sqlite):
+        return AlmacenamientoSQLite(archivo_sqlite, columnas)
+    return AlmacenamientoExcel(archivo_excel, columnas)
+
+
+def abrir_origen(archivo):
+    """Motor de almacenamiento para el archivo dado, o el de la aplicación si no se indica"""
+    if archivo is None:
+        return abrir_almacenamiento()
+    if not os.path.exists(archivo):
+        raise FileNotFoundError(f"No existe el archivo {archivo}")
+    if archivo.endswith('.db'):
+        return AlmacenamientoSQLite(archivo, COLUMNAS_CLIENTES)
+    return AlmacenamientoExcel(archivo, COLUMNAS_CLIENTES)
@@ -0,0 +1,753 @@
+"""Núcleo de datos de clientes: lectura, escritura, búsqueda, filtros y agregados.
+
+No depende de tkinter ni de matplotlib, así que lo pueden usar la
+aplicación de escritorio, los scripts de línea de comandos y las pruebas.
+"""
+
+import datetime
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import (ARCHIVO_SQLITE, COLUMNAS_CLIENTES, COLUMNAS_CONTROL, AlmacenamientoSQLite,
+                            abrir_almacenamiento, asignar_ids_faltantes, asignar_valor, texto_fechas)
+from concurrencia import ELIMINADA, ConflictoEdicion, comprobar_versiones, sello_actualizacion
+from duplicados import (UMBRAL, DetectorDuplicados, ParesDistintos, Puntuador, buscar_duplicados,
+                        combinar, normalizar_fila)
+from esquema import (TIPOS_COLUMNAS, InformeTipos, concatenar, memoria_por_cliente, tipar, validar_cambios,
+                     validar_filas)
+from estadisticas import AgregadosClientes
+from indices import IndicesClientes, dia_de_valor, extender_rangos, orden_como_texto, rangos_orden
+
+
+def periodos_agenda(hoy=None):
+    """Rangos de fechas (desde, hasta; ambas incluidas, None sin límite) de la agenda"""
+    hoy = hoy or datetime.date.today()
+    return {
+        'vencidos': (None, hoy - datetime.timedelta(days=1)),
+        'hoy': (hoy, hoy),
+        # De hoy al domingo
+        'semana': (hoy, hoy + datetime.timedelta(days=6 - hoy.weekday())),
+    }
+
+
+class AlmacenClientes:
+    """Conjunto de clientes en memoria sobre un motor de almacenamiento.
+
+    Guarda en caché lo último leído o escrito y lo identifica con una
+    versión que aumenta con cada cambio; los índices y los agregados se
+    mantienen sincronizados con esa versión. El DataFrame devuelto por
+    `leer` es compartido: no debe modificarse en sitio (usar .copy()).
+
+    Las escrituras reciben el conjunto completo ya modificado en memoria y
+    propagan las excepciones del motor; quien las llama decide cómo
+    mostrarlas.
+
+    En memoria las columnas tienen los tipos de esquema.py (categóricas,
+    fechas datetime64, ID entero); las filas como diccionarios
+    (`filas_de_ids`, `arreglos_columnas`) y lo que llega al motor llevan las
+    fechas como texto AAAA-MM-DD.
+
+    Con un `trabajador` (ver trabajador.py) nada toca el disco desde el hilo
+    que llama: las escrituras actualizan la memoria y se encolan, `leer`
+    devuelve siempre lo que hay en memoria, y la carga inicial y la
+    detección de cambios externos se hacen con `cargar` y
+    `comprobar_cambios` en el hilo del trabajador. La excepción es la
+    reserva de IDs de `nuevos_ids`, una escritura mínima cada BLOQUE_IDS altas.
+
+    Cada escritura lleva la versión de las filas que cambia (ver
+    concurrencia.py): si otro usuario ya las cambió, la escritura no se hace
+    y se informa con ConflictoEdicion, aquí si el cambio ya está en memoria
+    o al llegar al disco si no.
+    """
+
+    # Filas por bloque entre comprobaciones de cancelación en las búsquedas
+    # sobre columnas sin índice
+    BLOQUE_BUSQUEDA = 20000
+
+    # Vistas con más de 1/N del conjunto se ordenan filtrando la permutación
+    # completa (O(N)); las más chicas, ordenando solo sus filas (O(k log k))
+    FRACCION_PERMUTACION = 16
+
+    # IDs que se reservan de una vez en el almacenamiento para las altas
+    BLOQUE_IDS = 100
+
+    # Altas hasta las que los rangos de orden de texto se extienden fila por
+    # fila (ver indices.extender_rangos); con más se recalculan
+    ALTAS_RANGOS = 50
+
+    def __init__(self, almacenamiento=None, columnas=COLUMNAS_CLIENTES, trabajador=None):
+        self.columnas = list(columnas)
+        self.almacenamiento = almacenamiento or abrir_almacenamiento(columnas=self.columnas)
+        self.trabajador = trabajador
+
+        # Caché en memoria del conjunto de datos
+        self.version = 0
+        self._cache = None
+        self._firma = None
+        self._ids_cache = None
+        self._columnas_cache = None
+        self._version_columnas = None
+        self._columnas_minusculas = {}
+        # Rangos de orden por columna y permutaciones por claves de orden, con su versión
+        self._rangos = {}
+        self._permutaciones = {}
+        # (bytes, bytes por cliente) del conjunto tipado en la última lectura
+        self.memoria = (0, 0.0)
+
+        # Índices y agregados, mantenidos con cada alta, modificación o baja
+        self.indices = IndicesClientes()
+        self.agregados = AgregadosClientes()
+        self.duplicados = DetectorDuplicados()
+        self._distintos = None
+        # IDs reservados para este proceso y aún sin usar
+        self._ids_libres = range(0)
+
+    # --- Lectura ---------------------------------------------------------
+
+    def inicializar(self):
+        """Crea el archivo de datos si no existe"""
+        self.almacenamiento.inicializar()
+
+    def firma(self):
+        """Devuelve la firma del almacenamiento, que cambia si otro proceso lo modifica"""
+        return self.almacenamiento.firma()
+
+    def establecer(self, df, firma):
+        """Reemplaza el conjunto de datos en memoria e incrementa la versión de datos"""
+        # Las vistas referencian filas por posición, así que el índice debe ser 0..n-1
+        df = df.reset_index(drop=True)
+        faltantes = {col: None for col in COLUMNAS_CONTROL if col not in df.columns}
+        self._cache = tipar(df.assign(**faltantes) if faltantes else df)
+        self._firma = firma
+        self.version += 1
+
+    def invalidar(self):
+        """Fuerza que la próxima lectura vuelva a cargar el archivo desde disco"""
+        self._cache = None
+        self._firma = None
+
+    def cargado(self):
+        """Indica si ya hay un conjunto de datos en memoria"""
+        return self._cache is not None
+
+    def descartar_firma(self):
+        """Hace que la próxima comprobación de cambios relea el almacenamiento"""
+        self._firma = None
+
+    def leer(self):
+        """Lee todos los clientes, desde la caché en memoria si el archivo no cambió"""
+        if self.trabajador is not None:
+            # Las lecturas del disco llegan por el trabajador (cargar / comprobar_cambios)
+            return self._cache if self._cache is not None else self.vacio()
+
+        firma = self.firma()
+        if self._cache is not None and firma == self._firma:
+            return self._cache
+
+        try:
+            df = self.tipar_lectura(self.almacenamiento.leer())
+        except Exception as e:
+            print(f"Error al leer archivo: {e}")
+            return self.vacio()
+
+        self.establecer(df, firma)
+        return self._cache
+
+    def cargar(self, progreso=None):
+        """Lee el almacenamiento sin tocar la caché; devuelve (df, firma) para `establecer`"""
+        firma = self.firma()
+        return self.tipar_lectura(self.almacenamiento.leer(progreso)), firma
+
+    def vacio(self):
+        """Conjunto sin clientes, con los tipos del esquema"""
+        return tipar(pd.DataFrame(columns=self.columnas + [col for col in COLUMNAS_CONTROL
+                                                           if col not in self.columnas]))
+
+    def tipar_lectura(self, df):
+        """Pasa lo leído a los tipos del esquema, avisando de los valores que no encajan"""
+        inicio = time.perf_counter()
+        informe = InformeTipos()
+        df = tipar(asignar_ids_faltantes(df), informe)
+        self.almacenamiento.tiempos_lectura['tipos'] = time.perf_counter() - inicio
+        self.memoria = memoria_por_cliente(df)
+        if informe.no_reconocidos:
+            print(f"Valores que no corresponden a su campo:\n{informe.texto()}")
+        return df
+
+    def comprobar_cambios(self):
+        """Relee el almacenamiento si otro proceso lo modificó; devuelve (df, firma) o None"""
+        if self.firma() == self._firma:
+            return None
+        return self.cargar()
+
+    def preparar_indices(self):
+        """Construye los índices en segundo plano para que la primera búsqueda no espere"""
+        df, version = self.leer(), self.version
+
+        def preparar():
+            self.indices.asegurar(df, version)
+            self.duplicados.asegurar(df, version)
+
+        threading.Thread(target=preparar, daemon=True).start()
+
+    def posiciones_de_ids(self, df, version, ids):
+        """Posiciones en la caché (en orden) de los clientes con esos IDs"""
+        return np.sort(self.indexar_ids(df, version, ids))
+
+    def indice_ids(self, df, version):
+        """Índice de los IDs de la caché, construido una vez por versión"""
+        guardado = self._ids_cache
+        if guardado is None or guardado[0] != version:
+            guardado = (version, pd.Index(df['ID']))
+            self._ids_cache = guardado
+        return guardado[1]
+
+    def indexar_ids(self, df, version, ids):
+        """Posiciones en la caché de los clientes con esos IDs, en el orden de los IDs"""
+        indice = self.indice_ids(df, version)
+        if indice.is_unique:
+            posiciones = indice.get_indexer(ids)
+        else:
+            posiciones = indice.get_indexer_non_unique(ids)[0]
+        return posiciones[posiciones >= 0]
+
+    def filas_de_ids(self, ids):
+        """Filas actuales en caché de esos IDs, como diccionarios (antes de modificarlas)"""
+        df = self._cache
+        if df is None:
+            return []
+        posiciones = self.posiciones_de_ids(df, self.version, ids)
+        if len(posiciones) <= 1000 and self._version_columnas != self.version:
+            filas = df.iloc[posiciones]
+            return filas.assign(**self.fechas_como_texto(filas)).to_dict('records')
+        # Desde los arreglos por columna (los mismos que pinta la tabla): con
+        # miles de filas seleccionadas, to_dict('records') tarda segundos
+        arreglos = self.arreglos_columnas()
+        columnas = list(arreglos)
+        return [dict(zip(columnas, valores))
+                for valores in zip(*(arreglos[col][posiciones] for col in columnas))]
+
+    def versiones(self, ids):
+        """Versión en caché de cada ID, en el orden de los IDs (ELIMINADA si no está)"""
+        df = self.leer()
+        ids = list(ids)
+        indice = self.indice_ids(df, self.version)
+        if not indice.is_unique:
+            serie = pd.Series(df['Version'].to_numpy(), index=indice)
+            return serie[~serie.index.duplicated(keep='last')].reindex(ids, fill_value=ELIMINADA).tolist()
+        posiciones = indice.get_indexer(ids)
+        versiones = df['Version'].to_numpy()[posiciones]
+        return np.where(posiciones >= 0, versiones, ELIMINADA).tolist()
+
+    def arreglos_columnas(self):
+        """Arreglos por columna del conjunto en caché, reconstruidos solo al cambiar la versión"""
+        df = self._cache
+        if df is None:
+            df = self.leer()
+        if self._version_columnas != self.version:
+            self._columnas_cache = self.arreglos_de(df, self.columnas)
+            self._version_columnas = self.version
+        return self._columnas_cache
+
+    def arreglos_de(self, df, columnas):
+        """Arreglos de objetos de esas columnas, con las fechas como texto"""
+        fechas = self.fechas_como_texto(df[columnas])
+        return {col: (fechas[col] if col in fechas else df[col]).to_numpy(dtype=object) for col in columnas}
+
+    @staticmethod
+    def fechas_como_texto(df):
+        """Columnas de fecha del DataFrame como texto AAAA-MM-DD"""
+        return {col: texto_fechas(df[col]) for col in df.columns
+                if pd.api.types.is_datetime64_any_dtype(df[col].dtype)}
+
+    # --- Escritura -------------------------------------------------------
+
+    def guardar(self, df):
+        """Guarda el DataFrame completo"""
+        self.persistir(df, 'guardar', df)
+
+    def nuevos_ids(self, cantidad=1):
+        """IDs contiguos para altas, reservados en el almacenamiento para que otro proceso no los repita.
+
+        Se reservan de a BLOQUE_IDS (o los que se pidan, si son más), así
+        que solo una de cada tantas altas toca el disco.
+        """
+        if len(self._ids_libres) < cantidad:
+            df = self.leer()
+            minimo = int(df['ID'].max()) + 1 if not df.empty else 1
+            reserva = max(cantidad, self.BLOQUE_IDS)
+            inicio = self.almacenamiento.reservar_ids(reserva, minimo)
+            self._ids_libres = range(inicio, inicio + reserva)
+        ids, self._ids_libres = self._ids_libres[:cantidad], self._ids_libres[cantidad:]
+        return list(ids)
+
+    def versiones_esperadas(self, ids, versiones=None, eliminar=False):
+        """Versiones con que se editaron los IDs (por defecto, las de la caché).
+
+        ConflictoEdicion si la caché ya tiene un cambio de otro usuario
+        posterior (o, salvo al eliminar, si la fila ya no está).
+        """
+        actuales = self.versiones(ids)
+        if versiones is None:
+            return actuales
+        conflictos = comprobar_versiones(ids, versiones, actuales)
+        if eliminar:
+            conflictos = [c for c in conflictos if c[1] != 'eliminado']
+        if conflictos:
+            raise ConflictoEdicion.de_pares(conflictos)
+        return [int(v) for v in versiones]
+
+    @staticmethod
+    def sellar(df, ids, versiones, sello):
+        """Pone en las filas de esos IDs la versión siguiente a `versiones` y la hora del cambio"""
+        mascara = df['ID'].isin(ids)
+        siguientes = pd.Series(np.asarray(versiones, dtype=np.int64) + 1, index=list(ids))
+        siguientes = siguientes[~siguientes.index.duplicated()]
+        df.loc[mascara, 'Version'] = df.loc[mascara, 'ID'].map(siguientes).to_numpy()
+        asignar_valor(df, mascara, 'Actualizado', sello)
+
+    def insertar(self, df, filas):
+        """Persiste filas nuevas; df es el conjunto completo ya actualizado.
+
+        Las filas se validan contra el esquema (ValueError si un valor no
+        corresponde a su campo) y se guardan en su forma canónica. Sus IDs
+        deben venir de `nuevos_ids`.
+        """
+        filas = validar_filas(filas, df)
+        sello = sello_actualizacion()
+        for fila in filas:
+            fila.update(Version=1, Actualizado=sello)
+        ids = [fila['ID'] for fila in filas]
+        self.sellar(df, ids, [0] * len(ids), sello)
+        version, previas = self.version, self.filas_en_cache()
+        self.persistir(df, 'insertar', df, filas)
+        self.arrastrar_caches(version, previas, agregadas=len(filas))
+        self.indices.insertar(version, self.version, filas)
+        self.agregados.insertar(version, self.version, filas)
+        self.duplicados.insertar(version, self.version, filas)
+
+    def actualizar(self, df, ids, cambios, versiones=None):
+        """Persiste los cambios de los IDs dados; df ya los contiene. Se validan como en `insertar`.
+
+        `versiones` es la versión que tenían las filas al empezar a
+        editarlas (por defecto, la de la caché); ver `versiones_esperadas`.
+        """
+        cambios = validar_cambios(cambios, df)
+        versiones = self.versiones_esperadas(ids, versiones)
+        sello = sello_actualizacion()
+        self.sellar(df, ids, versiones, sello)
+        version, previas = self.version, self.filas_en_cache()
+        anteriores = self.filas_de_ids(ids)
+        self.persistir(df, 'actualizar', df, ids, dict(cambios, Actualizado=sello), versiones)
+        self.arrastrar_caches(version, previas, cambiadas=list(cambios) + COLUMNAS_CONTROL)
+        self.indices.actualizar(version, self.version, ids, cambios)
+        self.agregados.actualizar(version, self.version, anteriores, cambios)
+        self.duplicados.actualizar(version, self.version, anteriores, cambios)
+
+    def eliminar(self, df, ids, versiones=None):
+        """Persiste la eliminación de los IDs dados; df ya no los contiene. `versiones` como en `actualizar`"""
+        versiones = self.versiones_esperadas(ids, versiones, eliminar=True)
+        version, previas = self.version, self.filas_en_cache()
+        anteriores = self.filas_de_ids(ids)
+        quitadas = None if self._cache is None else self._cache['ID'].isin(ids).to_numpy()
+        self.persistir(df, 'eliminar', df, ids, versiones)
+        self.arrastrar_caches(version, previas, quitadas=quitadas)
+        self.indices.eliminar(version, self.version, ids)
+        self.agregados.eliminar(version, self.version, anteriores)
+        self.duplicados.eliminar(version, self.version, anteriores)
+
+    def importar(self, nuevas):
+        """Da de alta un bloque de clientes con IDs contiguos recién reservados; devuelve los IDs.
+
+        `nuevas` tiene las columnas del conjunto (el ID se ignora). Es una
+        sola inserción: una escritura del motor y una versión de datos.
+        """
+        if not len(nuevas):
+            return []
+        df = self.leer()
+        ids = np.array(self.nuevos_ids(len(nuevas)), dtype=np.int64)
+        nuevas = nuevas.reindex(columns=self.columnas).reset_index(drop=True)
+        nuevas['ID'] = ids
+        filas = nuevas.astype(object).where(nuevas.notna(), None).to_dict('records')
+        self.insertar(concatenar(df, nuevas), filas)
+        return ids.tolist()
+
+    def persistir(self, df, operacion, *args):
+        """Ejecuta (o encola) una escritura del almacenamiento y actualiza la caché"""
+        if self.trabajador is None:
+            getattr(self.almacenamiento, operacion)(*args)
+            firma = self.firma()
+        else:
+            # Las escrituras propias no cambian la firma, así que se conserva
+            self.trabajador.escribir(self.almacenamiento, operacion, *args)
+            firma = self._firma
+        # Lo recién escrito pasa a ser la caché, sin volver a leer el archivo
+        self.establecer(df, firma)
+
+    def persistir_lote(self, df, operaciones):
+        """Como `persistir`, para varias operaciones (nombre, argumentos) en una sola escritura"""
+        if self.trabajador is None:
+            self.almacenamiento.aplicar_lote(operaciones)
+            firma = self.firma()
+        else:
+            for operacion, args in operaciones:
+                self.trabajador.escribir(self.almacenamiento, operacion, *args)
+            firma = self._firma
+        self.establecer(df, firma)
+
+    @contextmanager
+    def agrupar_escrituras(self):
+        """Las escrituras hechas dentro del bloque llegan al disco juntas, en una sola escritura del motor"""
+        if self.trabajador is None:
+            yield
+            return
+        with self.trabajador.agrupar():
+            yield
+
+    def esperar_escrituras(self):
+        """Bloquea hasta que las escrituras encoladas lleguen al disco"""
+        if self.trabajador is not None:
+            self.trabajador.esperar()
+
+    def migrar_a_sqlite(self, archivo_sqlite=ARCHIVO_SQLITE):
+        """Copia el libro Excel a una base SQLite y pasa a usarla; devuelve cuántos clientes copió"""
+        almacenamiento = AlmacenamientoSQLite(archivo_sqlite, self.columnas)
+        self.esperar_escrituras()
+        try:
+            # Volcar al libro los cambios pendientes del diario antes de copiarlo
+            self.almacenamiento.cerrar()
+            total = almacenamiento.migrar_desde_excel(self.almacenamiento.ruta)
+        except Exception:
+            almacenamiento.cerrar()
+            if os.path.exists(archivo_sqlite):
+                os.remove(archivo_sqlite)
+            raise
+
+        self.almacenamiento = almacenamiento
+        # Los IDs reservados en el libro no cuentan en la base
+        self._ids_libres = range(0)
+        if self.trabajador is None:
+            self.invalidar()
+        else:
+            # La memoria ya tiene esos datos; la próxima comprobación relee la base
+            self.descartar_firma()
+        return total
+
+    def cerrar(self):
+        """Termina las escrituras encoladas, compacta lo pendiente y libera el almacenamiento"""
+        self.esperar_escrituras()
+        self.almacenamiento.cerrar()
+
+    # --- Cachés por versión ----------------------------------------------
+
+    def filas_en_cache(self):
+        """Número de filas en memoria (0 si aún no hay datos)"""
+        return 0 if self._cache is None else len(self._cache)
+
+    def arrastrar_caches(self, version_previa, previas, cambiadas=(), quitadas=None, agregadas=0):
+        """Pasa a la versión actual lo calculado en `version_previa` que sigue valiendo tras una escritura.
+
+        Como en los índices, las altas quedan al final de la caché y las
+        bajas (`quitadas`, máscara sobre las `previas` filas) corren las
+        posteriores. Tras una modificación siguen valiendo los arreglos, los
+        rangos de orden, las permutaciones y las columnas en minúsculas de
+        las columnas no `cambiadas`; tras una baja, filtrados; tras un alta
+        se extienden los arreglos, las minúsculas y los rangos de las
+        columnas de texto. Lo que no se arrastra se rehace al pedirlo.
+        """
+        df = self._cache
+        esperadas = previas + agregadas - (0 if quitadas is None else int(quitadas.sum()))
+        if df is None or self.version != version_previa + 1 or len(df) != esperadas:
+            return
+        cambiadas = set(cambiadas)
+        quedan = None if quitadas is None else ~quitadas
+        nuevas = df.iloc[previas:] if agregadas else None
+
+        def arrastrar(arreglo, agregado):
+            if quedan is not None:
+                arreglo = arreglo[quedan]
+            if agregado is not None:
+                arreglo = np.concatenate([arreglo, agregado])
+            return arreglo
+
+        if self._version_columnas == version_previa:
+            agregados = self.arreglos_de(nuevas, self.columnas) if agregadas else {}
+            arreglos = {col: arrastrar(arreglo, agregados.get(col)) for col, arreglo in self._columnas_cache.items()}
+            arreglos.update(self.arreglos_de(df, [col for col in arreglos if col in cambiadas]))
+            self._columnas_cache, self._version_columnas = arreglos, self.version
+
+        for criterio, (version, arreglo) in list(self._columnas_minusculas.items()):
+            if version == version_previa and criterio not in cambiadas:
+                arreglo = arrastrar(arreglo, None if nuevas is None else self.minusculas(nuevas[criterio]))
+                self._columnas_minusculas[criterio] = (self.version, arreglo)
+
+        if agregadas:
+            if agregadas > self.ALTAS_RANGOS:
+                return
+            for columna, (version, rangos, distintos) in list(self._rangos.items()):
+                orden_categorias = TIPOS_COLUMNAS.get(columna) == 'lista'
+                if version == version_previa and orden_como_texto(df[columna], orden_categorias):
+                    rangos, distintos = extender_rangos(df[columna].to_numpy(dtype=object), rangos, distintos)
+                    self._rangos[columna] = (self.version, rangos, distintos)
+            return
+        for columna, (version, rangos, distintos) in list(self._rangos.items()):
+            # Tras una baja quedan huecos entre los rangos, pero el orden es el mismo
+            if version == version_previa and columna not in cambiadas:
+                self._rangos[columna] = (self.version, rangos if quedan is None else rangos[quedan], distintos)
+        if quedan is not None:
+            # Posición nueva de cada fila que queda
+            nuevas_posiciones = np.cumsum(quedan) - 1
+        for claves, (version, orden) in list(self._permutaciones.items()):
+            if version == version_previa and not cambiadas.intersection(col for col, _ in claves):
+                if quedan is not None:
+                    orden = nuevas_posiciones[orden[quedan[orden]]]
+                self._permutaciones[claves] = (self.version, orden)
+        if quedan is None and self._ids_cache is not None and self._ids_cache[0] == version_previa:
+            self._ids_cache = (self.version, self._ids_cache[1])
+
+    # --- Consultas -------------------------------------------------------
+
+    def resumen(self):
+        """Agregados de la versión actual de los datos, compartidos por estadísticas y gráficos"""
+        df = self.leer()
+        self.agregados.asegurar(df, self.version)
+        return self.agregados.resumen()
+
+    def categorias_al_dia(self):
+        """Asegura el índice de mapas de bits para la versión actual de los datos"""
+        df = self.leer()
+        self.indices.asegurar(df, self.version, grupos=('categorias',))
+        return df
+
+    def filtrar(self, criterios):
+        """Posiciones de los clientes que cumplen los criterios categóricos (columna -> valor)"""
+        self.categorias_al_dia()
+        return self.indices.filtrar(criterios)
+
+    def buscar_avanzada(self, valores):
+        """Posiciones de los clientes que cumplen todos los campos no vacíos (campo -> valor)"""
+        df = self.categorias_al_dia()
+        version = self.version
+
+        # Los combos se resuelven juntos como un AND de mapas de bits
+        criterios = {campo: valor for campo, valor in valores.items()
+                     if valor and campo in IndicesClientes.COLUMNAS_CATEGORIAS}
+        posiciones = self.indices.filtrar(criterios)
+
+        for campo, valor in valores.items():
+            if valor and campo not in criterios:
+                self.indices.asegurar(df, version, grupos=('texto',))
+                ids = self.indices.buscar_texto(campo, valor)
+                posiciones = np.intersect1d(posiciones, self.posiciones_de_ids(df, version, ids),
+                                            assume_unique=True)
+        return posiciones
+
+    # --- Orden -----------------------------------------------------------
+
+    def rangos_columna(self, columna):
+        """Rangos de orden de la columna (ver indices.rangos_orden), calculados una vez por versión"""
+        guardado = self._rangos.get(columna)
+        if guardado is None or guardado[0] != self.version:
+            df = self.leer()
+            rangos, distintos = rangos_orden(df[columna], TIPOS_COLUMNAS.get(columna) == 'lista')
+            guardado = (self.version, rangos, distintos)
+            self._rangos[columna] = guardado
+        return guardado[1], guardado[2]
+
+    def clave_orden(self, columna, ascendente):
+        """Clave de orden de cada fila; en descendente los vacíos siguen al final"""
+        rangos, distintos = self.rangos_columna(columna)
+        if ascendente:
+            return rangos
+        return np.where(rangos >= distintos, distintos, distintos - 1 - rangos)
+
+    def permutacion(self, claves):
+        """Todas las posiciones en el orden de las claves [(columna, ascendente), ...], una vez por versión"""
+        claves = tuple(claves)
+        guardada = self._permutaciones.get(claves)
+        if guardada is None or guardada[0] != self.version:
+            # np.lexsort toma la última clave como principal y es estable: los
+            # empates quedan en el orden del archivo
+            orden = np.lexsort([self.clave_orden(columna, ascendente) for columna, ascendente in reversed(claves)])
+            self._permutaciones = {k: v for k, v in self._permutaciones.items() if v[0] == self.version}
+            guardada = (self.version, orden)
+            self._permutaciones[claves] = guardada
+        return guardada[1]
+
+    def ordenar_posiciones(self, posiciones, claves):
+        """Las posiciones dadas en el orden de las claves [(columna, ascendente), ...]"""
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        if not claves or not len(posiciones):
+            return posiciones
+        total = len(self.leer())
+        if len(posiciones) > total // self.FRACCION_PERMUTACION:
+            permutacion = self.permutacion(claves)
+            if len(posiciones) == total:
+                return permutacion
+            mascara = np.zeros(total, dtype=bool)
+            mascara[posiciones] = True
+            return permutacion[mascara[permutacion]]
+        claves_filas = [self.clave_orden(columna, ascendente)[posiciones] for columna, ascendente in reversed(claves)]
+        return posiciones[np.lexsort([posiciones] + claves_filas)]
+
+    # --- Agenda ----------------------------------------------------------
+
+    COLUMNA_AGENDA = 'Fecha_Proximo_Contacto'
+
+    def fechas_al_dia(self):
+        """Asegura el índice de fechas para la versión actual de los datos"""
+        df = self.leer()
+        self.indices.asegurar(df, self.version, grupos=('fechas',))
+        return df
+
+    @staticmethod
+    def limites_dias(desde, hasta):
+        """Rango de días [desde, hasta + 1) a partir de fechas incluidas (None: sin límite)"""
+        inicio = None if desde is None else dia_de_valor(desde)
+        fin = None if hasta is None else dia_de_valor(hasta) + 1
+        return inicio, fin
+
+    def agenda(self, desde=None, hasta=None):
+        """Posiciones de los clientes con próximo contacto entre esas fechas (incluidas), por fecha"""
+        df = self.fechas_al_dia()
+        ids, _ = self.indices.rango_fechas(self.COLUMNA_AGENDA, *self.limites_dias(desde, hasta))
+        return self.indexar_ids(df, self.version, ids)
+
+    def contar_agenda(self, desde=None, hasta=None):
+        """Número de clientes con próximo contacto entre esas fechas (incluidas)"""
+        self.fechas_al_dia()
+        return self.indices.contar_fechas(self.COLUMNA_AGENDA, *self.limites_dias(desde, hasta))
+
+    # --- Duplicados ------------------------------------------------------
+
+    def pares_distintos(self):
+        """Pares de IDs marcados como clientes distintos, junto al archivo de datos"""
+        ruta = self.almacenamiento.ruta + '.distintos.json'
+        if self._distintos is None or self._distintos.ruta != ruta:
+            self._distintos = ParesDistintos(ruta)
+        return self._distintos
+
+    def buscar_duplicados(self, df=None, procesos=None, progreso=None):
+        """Grupos de posibles duplicados (ver duplicados.buscar_duplicados); admite otro hilo con `df`"""
+        if df is None:
+            df = self.leer()
+        return buscar_duplicados(df, self.pares_distintos().pares, procesos=procesos, progreso=progreso)
+
+    def posibles_duplicados(self, fila, limite=5):
+        """Clientes existentes que parecen el mismo que `fila`: lista de (puntuación, cliente)"""
+        df = self.leer()
+        self.duplicados.asegurar(df, self.version)
+        ids = self.duplicados.candidatos(fila)
+        if not ids:
+            return []
+        nueva = normalizar_fila(fila)
+        puntuador = Puntuador({})
+        coincidencias = []
+        for cliente in df.iloc[self.posiciones_de_ids(df, self.version, list(ids))].to_dict('records'):
+            puntuacion = puntuador.puntuar(nueva, normalizar_fila(cliente))
+            if puntuacion >= UMBRAL:
+                coincidencias.append((puntuacion, cliente))
+        coincidencias.sort(key=lambda c: -c[0])
+        return coincidencias[:limite]
+
+    def fusionar(self, grupos):
+        """Fusiona cada grupo de IDs en su primer ID y elimina los demás, en una sola escritura.
+
+        Los índices y agregados se reconstruyen después, como tras una recarga.
+        """
+        df = self.leer()
+        operaciones, eliminar = [], []
+        valores = {}
+        for ids in grupos:
+            filas = self.filas_de_ids(ids)
+            por_id = {fila['ID']: fila for fila in filas}
+            if len(por_id) < 2 or ids[0] not in por_id:
+                continue
+            filas = [por_id[i] for i in ids if i in por_id]
+            cambios = validar_cambios(combinar(filas), df)
+            if cambios:
+                operaciones.append(('actualizar', [ids[0]], cambios))
+                for campo, valor in cambios.items():
+                    valores.setdefault(campo, {})[ids[0]] = valor
+            eliminar.extend(i for i in ids[1:] if i in por_id)
+        if not eliminar:
+            return 0
+
+        # Cambios aplicados columna por columna sobre una copia
+        df = df.copy()
+        for campo, por_id in valores.items():
+            posiciones = self.posiciones_de_ids(df, self.version, list(por_id))
+            columna = df[campo].to_numpy(dtype=object, copy=True)
+            columna[posiciones] = [por_id[i] for i in df['ID'].to_numpy()[posiciones].tolist()]
+            df[campo] = columna
+        # Las columnas reescritas como objetos vuelven a su tipo
+        df = tipar(df[~df['ID'].isin(eliminar)].reset_index(drop=True))
+
+        # Cada fila, en la versión que tenía al buscar los duplicados
+        conservados = [ids[0] for _, ids, _ in operaciones]
+        versiones = dict(zip(conservados + eliminar, self.versiones(conservados + eliminar)))
+        sello = sello_actualizacion()
+        self.sellar(df, conservados, [versiones[i] for i in conservados], sello)
+        self.persistir_lote(df, [('actualizar', (df, ids, dict(cambios, Actualizado=sello), [versiones[ids[0]]]))
+                                 for _, ids, cambios in operaciones]
+                            + [('eliminar', (df, eliminar, [versiones[i] for i in eliminar]))])
+        return len(eliminar)
+
+    def marcar_distintos(self, ids):
+        """Recuerda que esos clientes no son duplicados para no volver a proponerlos"""
+        self.pares_distintos().marcar(ids)
+
+    def columna_minusculas(self, df, criterio, version):
+        """Columna convertida a texto en minúsculas, calculada una vez por versión de datos"""
+        guardada = self._columnas_minusculas.get(criterio)
+        if guardada is None or guardada[0] != version:
+            guardada = (version, self.minusculas(df[criterio]))
+            self._columnas_minusculas[criterio] = guardada
+        return guardada[1]
+
+    @staticmethod
+    def minusculas(serie):
+        """La columna como texto en minúsculas, para buscar por 'contiene'"""
+        if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            serie = texto_fechas(serie)
+        return serie.astype(str).str.lower().fillna('').to_numpy(dtype=object)
+
+    def buscar(self, criterio, valor, df, version, base=None, vigente=None):
+        """Posiciones de los clientes cuya columna contiene el valor (en minúsculas).
+
+        Puede llamarse desde otro hilo con el `df` y la `version` del momento
+        de la consulta. `base` restringe la búsqueda a esas posiciones y
+        `vigente` es una función que, si devuelve False, hace abandonar la
+        búsqueda (el resultado es entonces None).
+        """
+        if criterio in IndicesClientes.COLUMNAS_TEXTO:
+            # Columnas de texto libre: índice de trigramas
+            self.indices.asegurar(df, version, grupos=('texto',))
+            ids = self.indices.buscar_texto(criterio, valor)
+            posiciones = self.posiciones_de_ids(df, version, ids)
+        elif criterio in IndicesClientes.COLUMNAS_CATEGORIAS:
+            # Columnas de pocos valores: OR de los mapas de bits de los valores que coinciden
+            self.indices.asegurar(df, version, grupos=('categorias',))
+            posiciones = self.indices.buscar_categoria(criterio, valor)
+        else:
+            # Resto de columnas: recorrido por bloques
+            valores = self.columna_minusculas(df, criterio, version)
+            posiciones = np.arange(len(valores)) if base is None else base
+            encontradas = []
+            for desde in range(0, len(posiciones), self.BLOQUE_BUSQUEDA):
+                if vigente is not None and not vigente():
+                    return None
+                bloque = posiciones[desde:desde + self.BLOQUE_BUSQUEDA]
+                coincide = np.fromiter((valor in texto for texto in valores[bloque]),
+                                       dtype=bool, count=len(bloque))
+                encontradas.append(bloque[coincide])
+            return np.concatenate(encontradas) if encontradas else posiciones[:0]
+
+        if base is not None:
+            posiciones = np.intersect1d(posiciones, base, assume_unique=True)
+        return posiciones
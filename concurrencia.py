@@ -0,0 +1,204 @@
+"""Uso compartido de los datos entre varios procesos (varios usuarios sobre el mismo archivo).
+
+- `BloqueoArchivo`: bloqueo exclusivo entre procesos sobre un archivo
+  auxiliar (`<ruta>.bloqueo`). Es consultivo: solo lo respetan quienes lo
+  piden, es decir, todas las copias de la aplicación. Se toma solo para
+  añadir al diario o reemplazar archivos, nunca mientras se escribe el libro.
+- `ConflictoEdicion`: otro usuario modificó o eliminó un cliente que se
+  estaba editando. Cada fila lleva una versión (`Version`, que aumenta con
+  cada modificación) y la fecha y hora de su último cambio
+  (`Actualizado`); una escritura indica la versión que tenía la fila
+  cuando se editó y no se aplica si ya no es la actual.
+- `ContadorIds`: reserva de IDs sin repetir entre procesos para el libro
+  Excel (la base SQLite lleva su propio contador).
+"""
+
+import datetime
+import os
+import threading
+import time
+import uuid
+
+from instrumentacion import medidor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Espera máxima para tomar el bloqueo, en segundos
+ESPERA_BLOQUEO = 10.0
+# Pausa entre intentos mientras otro proceso lo tiene
+REINTENTO_BLOQUEO = 0.01
+# Versión de las filas que ya no existen
+ELIMINADA = -1
+
+
+def sello_actualizacion():
+    """Fecha y hora de una modificación, tal como se guarda en `Actualizado`"""
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def identificador_proceso():
+    """Identificador único de una copia de la aplicación, para reconocer sus propias escrituras"""
+    return uuid.uuid4().hex
+
+
+def escribir_atomico(ruta, datos):
+    """Escribe bytes en un temporal propio del proceso y lo pone en lugar del archivo"""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+class ArchivoBloqueado(Exception):
+    """Otro proceso retuvo el bloqueo más de lo que se espera"""
+
+
+class ConflictoEdicion(Exception):
+    """Escrituras no aplicadas porque otro usuario cambió esos clientes antes.
+
+    `modificados` y `eliminados` son los IDs que otro usuario modificó o
+    eliminó después de que se leyeran; el resto de la tanda sí se guardó.
+    """
+
+    def __init__(self, modificados=(), eliminados=()):
+        self.modificados = sorted(set(modificados))
+        self.eliminados = sorted(set(eliminados) - set(modificados))
+        partes = []
+        if self.modificados:
+            partes.append(f"modificó {texto_ids(self.modificados)}")
+        if self.eliminados:
+            partes.append(f"eliminó {texto_ids(self.eliminados)}")
+        if not partes:
+            partes.append("cambió los datos")
+        super().__init__(f"Otro usuario {' y '.join(partes)} mientras se editaba; "
+                         "esos cambios no se guardaron.")
+
+    @classmethod
+    def de_pares(cls, pares):
+        """A partir de pares (ID, 'modificado' o 'eliminado')"""
+        return cls([i for i, motivo in pares if motivo == 'modificado'],
+                   [i for i, motivo in pares if motivo == 'eliminado'])
+
+
+def texto_ids(ids, limite=10):
+    """'el cliente 7' o 'los clientes 3, 5, 8...' para los mensajes"""
+    if len(ids) == 1:
+        return f"el cliente {ids[0]}"
+    texto = ', '.join(str(i) for i in ids[:limite])
+    return f"los clientes {texto}{'...' if len(ids) > limite else ''}"
+
+
+def comprobar_versiones(ids, esperadas, actuales):
+    """Pares (ID, motivo) de los IDs cuya versión actual no es la esperada"""
+    conflictos = []
+    for cliente_id, esperada, actual in zip(ids, esperadas, actuales):
+        if actual == ELIMINADA:
+            conflictos.append((cliente_id, 'eliminado'))
+        elif actual is not None and actual != esperada:
+            conflictos.append((cliente_id, 'modificado'))
+    return conflictos
+
+
+def _bloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _desbloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BloqueoArchivo:
+    """Bloqueo exclusivo entre procesos, reentrante dentro del mismo hilo.
+
+    Se usa como `with bloqueo:`. Entre hilos del mismo proceso también
+    excluye. El tiempo de espera y el de retención de cada uso se anotan en
+    el medidor como la operación 'bloqueo.<nombre>'.
+    """
+
+    def __init__(self, ruta, nombre='archivo', espera=ESPERA_BLOQUEO):
+        self.ruta = ruta
+        self.nombre = nombre
+        self.espera = espera
+        self._hilos = threading.RLock()
+        self._profundidad = 0
+        self._archivo = None
+        self._tomado = 0.0
+        self._esperado = 0.0
+
+    def __enter__(self):
+        inicio = time.perf_counter()
+        if not self._hilos.acquire(timeout=self.espera):
+            raise ArchivoBloqueado(f"No se pudo bloquear {self.ruta}")
+        if self._profundidad:
+            self._profundidad += 1
+            return self
+        try:
+            archivo = open(self.ruta, 'a+b')
+            limite = time.monotonic() + self.espera
+            while True:
+                try:
+                    _bloquear(archivo)
+                    break
+                except OSError:
+                    if time.monotonic() >= limite:
+                        archivo.close()
+                        raise ArchivoBloqueado(f"Otro usuario mantiene bloqueado {self.ruta}")
+                    time.sleep(REINTENTO_BLOQUEO)
+        except BaseException:
+            self._hilos.release()
+            raise
+        self._archivo = archivo
+        self._profundidad = 1
+        self._tomado = time.perf_counter()
+        self._esperado = self._tomado - inicio
+        return self
+
+    def __exit__(self, *exc):
+        self._profundidad -= 1
+        if not self._profundidad:
+            esperado, retenido = self._esperado, time.perf_counter() - self._tomado
+            try:
+                _desbloquear(self._archivo)
+            finally:
+                self._archivo.close()
+                self._archivo = None
+                self._hilos.release()
+            medidor.registrar(f'bloqueo.{self.nombre}', esperado + retenido,
+                              {'espera': esperado, 'retencion': retenido})
+            return False
+        self._hilos.release()
+        return False
+
+
+class ContadorIds:
+    """Siguiente ID libre en un archivo de texto (`<ruta>.ids`), bajo el bloqueo dado"""
+
+    def __init__(self, ruta, bloqueo):
+        self.ruta = ruta
+        self.bloqueo = bloqueo
+
+    def reservar(self, cantidad, minimo=1):
+        """Reserva `cantidad` IDs contiguos, ninguno menor que `minimo`; devuelve el primero"""
+        with self.bloqueo:
+            try:
+                with open(self.ruta, encoding='utf-8') as f:
+                    siguiente = int(f.read().strip() or 1)
+            except (OSError, ValueError):
+                siguiente = 1
+            inicio = max(siguiente, int(minimo))
+            escribir_atomico(self.ruta, str(inicio + cantidad).encode('ascii'))
+        return inicio
@@ -0,0 +1,496 @@
+"""Detección de clientes duplicados por claves de bloqueo y puntuación difusa.
+
+Cada cliente recibe claves normalizadas: dígitos del teléfono, correo,
+dominio del correo (salvo los de correo gratuito), el nombre sin formas
+societarias y cada una de sus palabras. Solo se comparan los pares que comparten alguna clave,
+en bloques de tamaño limitado, en lugar de todos contra todos. Cada par se
+puntúa con el parecido de los nombres, los datos de contacto en común y la
+localidad; los pares por encima del umbral se agrupan (unión-búsqueda).
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from indices import normalizar_texto
+
+COLUMNAS_DUPLICADOS = ['Nombre_Empresa', 'Telefono', 'Correo_Electronico', 'Localidad']
+
+# Puntuación mínima (0 a 1) para considerar duplicado un par
+UMBRAL = 0.75
+
+# Bloques con más clientes no se comparan: una palabra o un dominio tan
+# frecuentes no distinguen a nadie
+LIMITE_BLOQUE = 50
+
+# Pares por tarea del grupo de procesos
+PARES_POR_TAREA = 200000
+
+# Palabras del nombre que no distinguen empresas
+PALABRAS_VACIAS = {
+    'sa', 'sas', 'sac', 'srl', 'eirl', 'ltda', 'ltd', 'inc', 'corp', 'cia', 'co', 'sl', 'spa',
+    'limitada', 'sociedad', 'anonima', 'company', 'compania',
+    'de', 'del', 'la', 'el', 'los', 'las', 'y', 'e', 'the', 'and',
+}
+
+DOMINIOS_GRATUITOS = {
+    'gmail.com', 'hotmail.com', 'hotmail.es', 'outlook.com', 'outlook.es', 'live.com',
+    'yahoo.com', 'yahoo.es', 'icloud.com', 'msn.com', 'aol.com', 'protonmail.com',
+}
+
+# Jerarquía del estado al fusionar: se conserva el más avanzado
+ORDEN_ESTADOS = ['Por contactar', 'No interesado', 'Contactado', 'En seguimiento', 'Cliente']
+CAMPOS_SI_NO = ['Es_Cliente', 'Solicito_Propuesta', 'Se_Le_Envio_Propuesta']
+
+
+# --- Normalización -------------------------------------------------------
+
+def normalizar_nombre(valor):
+    """Nombre en minúsculas, sin acentos, puntuación ni formas societarias"""
+    texto = re.sub(r'[^a-z0-9]+', ' ', normalizar_texto(valor))
+    return ' '.join(p for p in texto.split() if len(p) > 1 and p not in PALABRAS_VACIAS)
+
+
+def digitos_telefono(valor):
+    """Últimos 10 dígitos del teléfono (sin prefijo de país ni separadores); '' si no hay 7"""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    digitos = re.sub(r'\D', '', normalizar_texto(valor))
+    return digitos[-10:] if len(digitos) >= 7 else ''
+
+
+def normalizar_correo(valor):
+    """(correo, dominio corporativo) normalizados; dominio '' si es de correo gratuito"""
+    correo = normalizar_texto(valor).strip()
+    if '@' not in correo:
+        return '', ''
+    dominio = correo.rsplit('@', 1)[1]
+    return correo, ('' if dominio in DOMINIOS_GRATUITOS else dominio)
+
+
+def normalizar_columna(valores, funcion):
+    """Aplica la normalización una vez por valor distinto"""
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=False)
+    return [funcion(u) for u in unicos], codigos
+
+
+def datos_normalizados(df):
+    """Columnas normalizadas para puntuar: nombre, teléfono, correo, dominio y localidad"""
+    datos = {}
+    for campo, origen, funcion in (('nombre', 'Nombre_Empresa', normalizar_nombre),
+                                   ('telefono', 'Telefono', digitos_telefono),
+                                   ('correo', 'Correo_Electronico', normalizar_correo),
+                                   ('localidad', 'Localidad', lambda v: normalizar_texto(v).strip())):
+        unicos, codigos = normalizar_columna(df[origen].to_numpy(dtype=object), funcion)
+        valores = [unicos[c] for c in codigos]
+        if campo == 'correo':
+            datos['correo'] = [c for c, _ in valores]
+            datos['dominio'] = [d for _, d in valores]
+        else:
+            datos[campo] = valores
+    return datos
+
+
+def normalizar_fila(fila):
+    """Las mismas columnas normalizadas para un solo cliente (diccionario)"""
+    correo, dominio = normalizar_correo(fila.get('Correo_Electronico'))
+    return {'nombre': normalizar_nombre(fila.get('Nombre_Empresa')),
+            'telefono': digitos_telefono(fila.get('Telefono')),
+            'correo': correo, 'dominio': dominio,
+            'localidad': normalizar_texto(fila.get('Localidad')).strip()}
+
+
+def claves_bloqueo(nombre, telefono, correo, dominio):
+    """Claves de bloqueo de un cliente a partir de sus datos normalizados"""
+    claves = [f'n:{palabra}' for palabra in set(nombre.split()) if len(palabra) >= 3]
+    if nombre:
+        # Nombre completo: junta los nombres iguales aunque sus palabras sean comunes
+        claves.append(f'f:{nombre.replace(" ", "")}')
+    if telefono:
+        claves.append(f't:{telefono}')
+    if correo:
+        claves.append(f'c:{correo}')
+    if dominio:
+        claves.append(f'd:{dominio}')
+    return claves
+
+
+# --- Puntuación ----------------------------------------------------------
+
+def trigramas(nombre):
+    """Trigramas del nombre sin espacios, con relleno para contar el inicio y el final"""
+    texto = f"  {nombre.replace(' ', '')} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class Puntuador:
+    """Puntúa pares de clientes (posiciones) sobre columnas ya normalizadas"""
+
+    def __init__(self, datos):
+        self.datos = datos
+        self._trigramas = {}
+
+    def trigramas(self, nombre):
+        guardado = self._trigramas.get(nombre)
+        if guardado is None:
+            guardado = self._trigramas[nombre] = trigramas(nombre)
+        return guardado
+
+    def similitud_nombres(self, a, b):
+        """Máximo entre Jaccard de palabras y Dice de trigramas (0 a 1)"""
+        if not a or not b:
+            return 0.0
+        if a == b:
+            return 1.0
+        palabras_a, palabras_b = set(a.split()), set(b.split())
+        jaccard = len(palabras_a & palabras_b) / len(palabras_a | palabras_b)
+        tri_a, tri_b = self.trigramas(a), self.trigramas(b)
+        dice = 2 * len(tri_a & tri_b) / (len(tri_a) + len(tri_b))
+        return max(jaccard, dice)
+
+    def puntuar(self, a, b):
+        """Puntuación entre dos clientes normalizados (ver normalizar_fila)"""
+        nombre = self.similitud_nombres(a['nombre'], b['nombre'])
+        if (a['telefono'] and a['telefono'] == b['telefono']) or (a['correo'] and a['correo'] == b['correo']):
+            contacto = 1.0
+        elif a['dominio'] and a['dominio'] == b['dominio']:
+            contacto = 0.5
+        elif a['telefono'] and b['telefono']:
+            # Teléfonos distintos y ningún dato en común: p. ej. dos sucursales
+            contacto = -0.5
+        else:
+            contacto = 0.0
+        if a['localidad'] and b['localidad']:
+            lugar = 1.0 if a['localidad'] == b['localidad'] else -1.0
+        else:
+            lugar = 0.0
+        return min(1.0, max(0.0, 0.6 * nombre + 0.3 * contacto + 0.15 * lugar))
+
+    def fila(self, posicion):
+        return {campo: valores[posicion] for campo, valores in self.datos.items()}
+
+    def puntuar_pares(self, izquierda, derecha):
+        """Puntuaciones de los pares (izquierda[k], derecha[k])"""
+        return np.fromiter((self.puntuar(self.fila(i), self.fila(j)) for i, j in zip(izquierda, derecha)),
+                           dtype=np.float64, count=len(izquierda))
+
+
+# Puntuador de cada proceso del grupo, creado por su inicializador
+_puntuador = None
+
+
+def _iniciar_proceso(datos):
+    global _puntuador
+    _puntuador = Puntuador(datos)
+
+
+def _puntuar_tarea(izquierda, derecha):
+    return _puntuador.puntuar_pares(izquierda, derecha)
+
+
+# --- Búsqueda completa ---------------------------------------------------
+
+def pares_candidatos(datos, total, limite_bloque=LIMITE_BLOQUE):
+    """Pares de posiciones (i < j) que comparten alguna clave en un bloque pequeño"""
+    claves, posiciones = [], []
+    for posicion, (nombre, telefono, correo, dominio) in enumerate(
+            zip(datos['nombre'], datos['telefono'], datos['correo'], datos['dominio'])):
+        for clave in claves_bloqueo(nombre, telefono, correo, dominio):
+            claves.append(clave)
+            posiciones.append(posicion)
+    if not claves:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    codigos, _ = pd.factorize(pd.Series(claves, dtype=object))
+    posiciones = np.asarray(posiciones, dtype=np.int64)
+    tamanos = np.bincount(codigos)
+    utiles = (tamanos >= 2) & (tamanos <= limite_bloque)
+    conservar = utiles[codigos]
+    codigos, posiciones = codigos[conservar], posiciones[conservar]
+    orden = np.argsort(codigos, kind='stable')
+    codigos, posiciones = codigos[orden], posiciones[orden]
+
+    # Bloques del mismo tamaño k: todos sus pares a la vez con triu_indices(k)
+    inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+    tamanos_bloque = np.diff(np.r_[inicios, len(codigos)])
+    izquierda, derecha = [], []
+    for k in np.unique(tamanos_bloque):
+        desde = inicios[tamanos_bloque == k]
+        fi, fj = np.triu_indices(k, 1)
+        izquierda.append(posiciones[(desde[:, None] + fi).ravel()])
+        derecha.append(posiciones[(desde[:, None] + fj).ravel()])
+    izquierda, derecha = np.concatenate(izquierda), np.concatenate(derecha)
+
+    # Un par puede compartir varias claves: quedarse con uno
+    menor, mayor = np.minimum(izquierda, derecha), np.maximum(izquierda, derecha)
+    unicos = np.unique(menor * total + mayor)
+    return unicos // total, unicos % total
+
+
+def agrupar(total, izquierda, derecha):
+    """Componentes conexas de los pares (unión-búsqueda); solo grupos de 2 o más"""
+    padre = np.arange(total)
+
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for i, j in zip(izquierda.tolist(), derecha.tolist()):
+        ri, rj = raiz(i), raiz(j)
+        if ri != rj:
+            padre[max(ri, rj)] = min(ri, rj)
+    grupos = {}
+    for posicion in set(izquierda.tolist()) | set(derecha.tolist()):
+        grupos.setdefault(raiz(posicion), []).append(posicion)
+    return [sorted(grupo) for grupo in grupos.values()]
+
+
+def completitud(df):
+    """Campos con dato de cada fila: el más completo de un grupo queda como principal"""
+    return (df.notna() & (df.astype(str) != '')).sum(axis=1).to_numpy()
+
+
+class GrupoDuplicados:
+    """Clientes que parecen el mismo; `ids[0]` es el principal (el más completo)"""
+
+    def __init__(self, ids, puntuacion):
+        self.ids = ids
+        self.puntuacion = puntuacion
+
+
+def buscar_duplicados(df, distintos=(), umbral=UMBRAL, procesos=None, progreso=None):
+    """Grupos de posibles duplicados en el conjunto, de mayor a menor puntuación.
+
+    `distintos` son pares de IDs ya marcados como clientes diferentes.
+    `procesos` limita el grupo de procesos que puntúa los pares (1 = en
+    este proceso). `progreso(fase, hechos, total)` informa el avance.
+    Devuelve (grupos, estadísticas).
+    """
+    estadisticas = {}
+    inicio = time.perf_counter()
+    total = len(df)
+    datos = datos_normalizados(df)
+    estadisticas['normalizar'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    izquierda, derecha = pares_candidatos(datos, total)
+    ids = df['ID'].to_numpy()
+    if len(distintos) and len(izquierda):
+        marcados = {(min(a, b), max(a, b)) for a, b in distintos}
+        ida, idb = ids[izquierda], ids[derecha]
+        descartar = np.fromiter(((min(a, b), max(a, b)) in marcados for a, b in zip(ida.tolist(), idb.tolist())),
+                                dtype=bool, count=len(izquierda))
+        izquierda, derecha = izquierda[~descartar], derecha[~descartar]
+    estadisticas['bloqueo'] = time.perf_counter() - inicio
+    estadisticas['pares'] = len(izquierda)
+
+    inicio = time.perf_counter()
+    puntuaciones = np.empty(len(izquierda), dtype=np.float64)
+    tareas = range(0, len(izquierda), PARES_POR_TAREA)
+    procesos = procesos or os.cpu_count() or 1
+    if procesos > 1 and len(tareas) > 1:
+        # 'spawn': quien llama puede ser la interfaz, con hilos que no deben copiarse con fork
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tareas)),
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_iniciar_proceso, initargs=(datos,)) as grupo:
+            futuros = [grupo.submit(_puntuar_tarea, izquierda[d:d + PARES_POR_TAREA],
+                                    derecha[d:d + PARES_POR_TAREA]) for d in tareas]
+            for hechas, (desde, futuro) in enumerate(zip(tareas, futuros), 1):
+                resultado = futuro.result()
+                puntuaciones[desde:desde + len(resultado)] = resultado
+                if progreso:
+                    progreso('puntuar', hechas, len(tareas))
+    else:
+        puntuador = Puntuador(datos)
+        for hechas, desde in enumerate(tareas, 1):
+            resultado = puntuador.puntuar_pares(izquierda[desde:desde + PARES_POR_TAREA],
+                                                derecha[desde:desde + PARES_POR_TAREA])
+            puntuaciones[desde:desde + len(resultado)] = resultado
+            if progreso:
+                progreso('puntuar', hechas, len(tareas))
+    estadisticas['puntuar'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    arriba = puntuaciones >= umbral
+    izquierda, derecha, puntuaciones = izquierda[arriba], derecha[arriba], puntuaciones[arriba]
+    mejor = {}
+    for i, j, p in zip(izquierda.tolist(), derecha.tolist(), puntuaciones.tolist()):
+        mejor[i] = max(mejor.get(i, 0.0), p)
+        mejor[j] = max(mejor.get(j, 0.0), p)
+
+    grupos = []
+    posiciones_grupos = agrupar(total, izquierda, derecha)
+    if posiciones_grupos:
+        todas = np.concatenate([np.asarray(g) for g in posiciones_grupos])
+        llenos = dict(zip(todas.tolist(), completitud(df.iloc[todas][COLUMNAS_DUPLICADOS + [
+            c for c in df.columns if c not in COLUMNAS_DUPLICADOS and c != 'ID']]).tolist()))
+        for posiciones in posiciones_grupos:
+            posiciones.sort(key=lambda p: (-llenos[p], ids[p]))
+            grupos.append(GrupoDuplicados([int(ids[p]) for p in posiciones],
+                                          max(mejor[p] for p in posiciones)))
+    grupos.sort(key=lambda g: -g.puntuacion)
+    estadisticas['agrupar'] = time.perf_counter() - inicio
+    estadisticas['grupos'] = len(grupos)
+    return grupos, estadisticas
+
+
+# --- Comprobación al dar de alta ------------------------------------------
+
+class DetectorDuplicados:
+    """Claves de bloqueo (clave -> IDs) para comprobar un cliente nuevo contra los existentes.
+
+    Sigue el esquema de versiones de `IndicesClientes`: se construye de una
+    vez para una versión y se mantiene con cada alta, modificación o baja.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.bloques = {}
+        self._bloqueo = threading.RLock()
+
+    def asegurar(self, df, version):
+        with self._bloqueo:
+            if self.version is None or version > self.version:
+                self.construir(df, version)
+
+    def construir(self, df, version):
+        with self._bloqueo:
+            datos = datos_normalizados(df)
+            self.bloques = {}
+            for cliente_id, nombre, telefono, correo, dominio in zip(
+                    df['ID'].tolist(), datos['nombre'], datos['telefono'], datos['correo'], datos['dominio']):
+                for clave in claves_bloqueo(nombre, telefono, correo, dominio):
+                    self.bloques.setdefault(clave, set()).add(cliente_id)
+            self.version = version
+
+    def claves(self, fila):
+        normalizada = normalizar_fila(fila)
+        return claves_bloqueo(normalizada['nombre'], normalizada['telefono'],
+                              normalizada['correo'], normalizada['dominio'])
+
+    def sumar(self, fila, signo):
+        for clave in self.claves(fila):
+            if signo > 0:
+                self.bloques.setdefault(clave, set()).add(fila['ID'])
+            else:
+                bloque = self.bloques.get(clave)
+                if bloque is not None:
+                    bloque.discard(fila['ID'])
+                    if not bloque:
+                        del self.bloques[clave]
+
+    def aplicar(self, version_previa, version, cambio):
+        with self._bloqueo:
+            if self.version != version_previa:
+                return
+            cambio()
+            self.version = version
+
+    def insertar(self, version_previa, version, filas):
+        def cambio():
+            for fila in filas:
+                self.sumar(fila, 1)
+        self.aplicar(version_previa, version, cambio)
+
+    def actualizar(self, version_previa, version, anteriores, cambios):
+        def cambio():
+            if any(campo in cambios for campo in COLUMNAS_DUPLICADOS):
+                for fila in anteriores:
+                    self.sumar(fila, -1)
+                    self.sumar({**fila, **cambios}, 1)
+        self.aplicar(version_previa, version, cambio)
+
+    def eliminar(self, version_previa, version, anteriores):
+        def cambio():
+            for fila in anteriores:
+                self.sumar(fila, -1)
+        self.aplicar(version_previa, version, cambio)
+
+    def candidatos(self, fila, limite_bloque=LIMITE_BLOQUE):
+        """IDs que comparten con la fila alguna clave de un bloque pequeño"""
+        with self._bloqueo:
+            ids = set()
+            for clave in self.claves(fila):
+                bloque = self.bloques.get(clave, ())
+                if len(bloque) <= limite_bloque:
+                    ids.update(bloque)
+            ids.discard(fila.get('ID'))
+            return ids
+
+
+# --- Decisiones ----------------------------------------------------------
+
+def combinar(filas):
+    """Fusiona filas del mismo cliente; la primera es la principal.
+
+    Devuelve los cambios para la principal: los campos vacíos se completan
+    con los de las demás, las observaciones se unen, los SI/NO quedan en SI
+    si alguna lo tenía y el estado queda en el más avanzado.
+    """
+    principal = filas[0]
+    cambios = {}
+
+    def vacio(valor):
+        return valor is None or (isinstance(valor, float) and np.isnan(valor)) or str(valor).strip() == ''
+
+    for campo, valor in principal.items():
+        if campo == 'ID' or not vacio(valor):
+            continue
+        for otra in filas[1:]:
+            if not vacio(otra.get(campo)):
+                cambios[campo] = otra[campo]
+                break
+
+    notas = []
+    for fila in filas:
+        nota = fila.get('Observaciones')
+        if not vacio(nota) and str(nota).strip() not in notas:
+            notas.append(str(nota).strip())
+    if len(notas) > 1:
+        cambios['Observaciones'] = ' | '.join(notas)
+
+    for campo in CAMPOS_SI_NO:
+        if principal.get(campo) != 'SI' and any(fila.get(campo) == 'SI' for fila in filas):
+            cambios[campo] = 'SI'
+
+    estados = [fila.get('Estado_Contacto') for fila in filas if fila.get('Estado_Contacto') in ORDEN_ESTADOS]
+    if estados:
+        estado = max(estados, key=ORDEN_ESTADOS.index)
+        if estado != principal.get('Estado_Contacto'):
+            cambios['Estado_Contacto'] = estado
+    return cambios
+
+
+class ParesDistintos:
+    """Pares de IDs marcados como clientes distintos, guardados en un JSON junto a los datos"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.pares = set()
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                self.pares = {tuple(par) for par in json.load(f)}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error al leer {ruta}: {e}")
+
+    def marcar(self, ids):
+        """Marca como distintos todos los pares del grupo de IDs"""
+        ids = sorted(int(i) for i in ids)
+        for k, a in enumerate(ids):
+            for b in ids[k + 1:]:
+                self.pares.add((a, b))
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(sorted(self.pares), f)
+        os.replace(temporal, self.ruta)
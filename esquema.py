@@ -0,0 +1,330 @@
+"""Tipos en memoria de las columnas de clientes.
+
+Los archivos (libro Excel, base SQLite y diario) guardan texto: 'SI'/'NO',
+los valores de las listas y las fechas como AAAA-MM-DD. En memoria cada
+columna tiene el tipo que le declara `TIPOS_COLUMNAS`:
+
+- 'entero': el ID, int64.
+- 'lista': categórica con los valores admitidos de OPCIONES_CAMPOS (un
+  byte por fila). Las variantes antiguas ('si', 'Tiene web', 'nuevo'...)
+  se pasan al valor admitido; las que no se reconocen se conservan como
+  categorías extra y se informan.
+- 'categoria': categórica abierta, para texto libre con pocos valores
+  distintos (sector, localidad).
+- 'fecha': datetime64. Las fechas que no se entienden quedan vacías y se
+  informan.
+- 'version': la versión de la fila (ver concurrencia.py), int64; las filas
+  anteriores a la columna quedan en 0.
+- 'texto': se deja como está.
+
+`tipar` convierte al cargar (y deja igual lo que ya tiene su tipo) y
+`validar_filas` / `validar_cambios` comprueban cada escritura y devuelven
+los valores en la forma en que se guardan. Uso por línea de comandos, para
+ver el informe de tipos y memoria de los datos:
+
+    python esquema.py [--archivo clientes_potenciales.db]
+"""
+
+import argparse
+import re
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import (FORMATO_FECHA, OPCIONES_CAMPOS, abrir_almacenamiento, asignar_ids_faltantes,
+                            fecha_de_valor, texto_fechas)
+from indices import normalizar_texto
+
+TIPOS_COLUMNAS = {
+    'ID': 'entero',
+    'Nombre_Empresa': 'texto',
+    'Sector': 'categoria',
+    'Localidad': 'categoria',
+    'Telefono': 'texto',
+    'Correo_Electronico': 'texto',
+    'Estado_Contacto': 'lista',
+    'Fecha_Contacto': 'fecha',
+    'Observaciones': 'texto',
+    'Sitio_Web_Actual': 'lista',
+    'Interes': 'lista',
+    'Fecha_Proximo_Contacto': 'fecha',
+    'Es_Cliente': 'lista',
+    'Solicito_Propuesta': 'lista',
+    'Se_Le_Envio_Propuesta': 'lista',
+    'Fecha_Envio_Propuesta': 'fecha',
+    'Version': 'version',
+    'Actualizado': 'texto',
+}
+
+
+def vacio(valor):
+    """Indica si un valor cuenta como campo vacío (nulo o texto en blanco)"""
+    if valor is None:
+        return True
+    if isinstance(valor, str):
+        return not valor.strip()
+    try:
+        return bool(pd.isna(valor))
+    except (TypeError, ValueError):
+        return False
+
+
+class InformeTipos:
+    """Valores que no encajaron en el tipo de su columna al cargar"""
+
+    def __init__(self):
+        # Columna -> Counter(valor original -> filas)
+        self.no_reconocidos = {}
+
+    def anotar(self, columna, valor, filas):
+        self.no_reconocidos.setdefault(columna, Counter())[valor] += filas
+
+    def texto(self, ejemplos=3):
+        lineas = []
+        for columna, valores in self.no_reconocidos.items():
+            muestra = ', '.join(repr(valor) for valor, _ in valores.most_common(ejemplos))
+            lineas.append(f"{columna}: {sum(valores.values())} valores no reconocidos (p. ej. {muestra})")
+        return '\n'.join(lineas)
+
+
+# --- Valores admitidos ----------------------------------------------------
+
+# Variantes aceptadas (normalizadas) de los valores de los campos de lista
+VARIANTES_SI = ['si', 's', 'yes', 'y', 'true', 'verdadero', '1', 'x']
+VARIANTES_NO = ['no', 'n', 'false', 'falso', '0']
+VARIANTES_CAMPOS = {
+    'Sitio_Web_Actual': {'No tiene': VARIANTES_NO + ['sin web', 'ninguno'],
+                         'Tiene': VARIANTES_SI + ['tiene web']},
+    'Estado_Contacto': {'Por contactar': ['nuevo', 'pendiente']},
+    'Interes': {'No evaluado': ['sin evaluar', 'ninguno']},
+}
+
+
+def clave(texto):
+    """Forma normalizada de un encabezado o valor para compararlo"""
+    return re.sub(r'\s+', ' ', normalizar_texto(texto).strip())
+
+
+def tabla_valores(campo):
+    """Variante normalizada -> valor admitido, para un campo de lista"""
+    tabla = {}
+    for opcion in OPCIONES_CAMPOS[campo]:
+        tabla[clave(opcion)] = opcion
+        if opcion == 'SI':
+            tabla.update(dict.fromkeys(VARIANTES_SI, opcion))
+        elif opcion == 'NO':
+            tabla.update(dict.fromkeys(VARIANTES_NO, opcion))
+    for opcion, variantes in VARIANTES_CAMPOS.get(campo, {}).items():
+        tabla.update(dict.fromkeys(variantes, opcion))
+    return tabla
+
+
+def convertir_fechas(texto):
+    """Fechas en formato AAAA-MM-DD; primero ISO y después día/mes/año. NaT si no se entienden"""
+    fechas = pd.to_datetime(texto, format='ISO8601', errors='coerce')
+    resto = fechas.isna()
+    if resto.any():
+        fechas[resto] = pd.to_datetime(texto[resto], format='mixed', dayfirst=True, errors='coerce')
+    return fechas
+
+
+# --- Carga ---------------------------------------------------------------
+
+def tipar_lista(serie, campo, informe=None):
+    """Categórica con los valores admitidos del campo (y los no reconocidos al final)"""
+    codigos, unicos = pd.factorize(serie.to_numpy(dtype=object))
+    tabla = tabla_valores(campo)
+    filas = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+    valores = []
+    for valor, cantidad in zip(unicos, filas.tolist()):
+        if vacio(valor):
+            valores.append(None)
+            continue
+        admitido = tabla.get(clave(str(valor)))
+        if admitido is None:
+            admitido = str(valor).strip()
+            if informe is not None:
+                informe.anotar(campo, valor, cantidad)
+        valores.append(admitido)
+
+    opciones = OPCIONES_CAMPOS[campo]
+    categorias = opciones + sorted({v for v in valores if v is not None} - set(opciones))
+    posicion = {categoria: i for i, categoria in enumerate(categorias)}
+    # El último elemento atiende el código -1 (vacío) de factorize
+    traduccion = np.array([posicion[v] if v is not None else -1 for v in valores] + [-1], dtype=np.int32)
+    return pd.Series(pd.Categorical.from_codes(traduccion[codigos], categories=categorias),
+                     index=serie.index, name=serie.name)
+
+
+def tipar_fechas(serie, campo, informe=None):
+    """datetime64 a partir de texto (ISO o día/mes/año) o de fechas de Excel; cada valor distinto se interpreta una vez"""
+    codigos, unicos = pd.factorize(serie.to_numpy(dtype=object))
+    textos = pd.Series([str(valor).strip() for valor in unicos], dtype=object)
+    fechas = convertir_fechas(textos) if len(textos) else pd.Series([], dtype='datetime64[ns]')
+    fallidas = (fechas.isna() & (textos != '')).to_numpy()
+    if informe is not None and fallidas.any():
+        filas = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+        for i in np.flatnonzero(fallidas).tolist():
+            informe.anotar(campo, unicos[i], int(filas[i]))
+    valores = np.append(fechas.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(valores[codigos], index=serie.index, name=serie.name)
+
+
+def tipar_categoria(serie):
+    """Categórica abierta con los valores como texto; los vacíos quedan nulos"""
+    textos = serie.astype(str)
+    # astype(str) da 'nan' / 'None' para los nulos según la versión de pandas
+    vacios = serie.isna().to_numpy() | textos.str.strip().eq('').fillna(False).to_numpy(dtype=bool)
+    return textos.mask(vacios).astype('category')
+
+
+def tipar(df, informe=None):
+    """El DataFrame con los tipos del esquema. Las columnas que ya los tienen no se convierten"""
+    convertidas = {}
+    for col, tipo in TIPOS_COLUMNAS.items():
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        categorica = isinstance(serie.dtype, pd.CategoricalDtype)
+        if tipo == 'lista' and not categorica:
+            convertidas[col] = tipar_lista(serie, col, informe)
+        elif tipo == 'categoria' and not categorica:
+            convertidas[col] = tipar_categoria(serie)
+        elif tipo == 'fecha' and not pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            convertidas[col] = tipar_fechas(serie, col, informe)
+        elif tipo == 'entero' and len(serie) and serie.dtype != 'int64':
+            convertidas[col] = serie.astype('int64')
+        elif tipo == 'version' and serie.dtype != 'int64':
+            convertidas[col] = pd.to_numeric(serie, errors='coerce').fillna(0).astype('int64')
+    if not convertidas:
+        return df
+    return df.assign(**convertidas)
+
+
+def concatenar(df, nuevas):
+    """Añade filas nuevas (en texto o ya tipadas) al conjunto tipado, sin perder las categóricas.
+
+    pd.concat de dos categóricas con categorías distintas da una columna de
+    objetos; aquí se igualan antes las categorías. Las columnas existentes
+    solo se recodifican si las filas nuevas traen categorías que no tenían.
+    """
+    nuevas = tipar(nuevas.reindex(columns=df.columns))
+    ampliadas = {}
+    for col in df.columns:
+        actual, agregada = df[col], nuevas[col]
+        if isinstance(actual.dtype, pd.CategoricalDtype) and isinstance(agregada.dtype, pd.CategoricalDtype):
+            categorias = actual.cat.categories
+            if not categorias.equals(agregada.cat.categories):
+                if len(agregada.cat.categories.difference(categorias)):
+                    categorias = categorias.union(agregada.cat.categories, sort=False)
+                    ampliadas[col] = actual.cat.set_categories(categorias)
+                nuevas[col] = agregada.cat.set_categories(categorias)
+        elif isinstance(actual.dtype, pd.StringDtype) and agregada.dtype != actual.dtype:
+            # Texto: del tipo de la columna existente, para que concat no la pase a objetos
+            nuevas[col] = agregada.astype(actual.dtype)
+    if ampliadas:
+        df = df.assign(**ampliadas)
+    return pd.concat([df, nuevas], ignore_index=True)
+
+
+def memoria_por_cliente(df):
+    """Bytes en memoria del conjunto (contando los textos) y bytes por cliente"""
+    total = int(df.memory_usage(deep=True).sum())
+    return total, total / len(df) if len(df) else 0.0
+
+
+# --- Escritura -----------------------------------------------------------
+
+def validar_valor(campo, valor, categorias=()):
+    """Valor tal como se guarda en el campo; ValueError si no corresponde al tipo.
+
+    En los campos de lista se admiten los valores de OPCIONES_CAMPOS y los
+    que ya tiene la columna (`categorias`, p. ej. valores antiguos que se
+    conservan al fusionar duplicados).
+    """
+    tipo = TIPOS_COLUMNAS.get(campo, 'texto')
+    if tipo == 'entero':
+        try:
+            entero = int(valor)
+        except (TypeError, ValueError):
+            entero = None
+        if entero is None or entero != valor:
+            raise ValueError(f"ID no válido: {valor!r}")
+        return entero
+    if tipo in ('lista', 'fecha', 'categoria') and vacio(valor):
+        return None
+    if tipo == 'lista':
+        if valor in OPCIONES_CAMPOS[campo] or valor in categorias:
+            return valor
+        raise ValueError(f"Valor no válido para {campo}: {valor!r} "
+                         f"(admitidos: {', '.join(OPCIONES_CAMPOS[campo])})")
+    if tipo == 'fecha':
+        fecha = fecha_de_valor(valor)
+        if pd.isna(fecha):
+            raise ValueError(f"Fecha no válida en {campo}: {valor!r} (use AAAA-MM-DD o DD/MM/AAAA)")
+        return fecha.strftime(FORMATO_FECHA)
+    return valor
+
+
+def categorias_actuales(df, campo):
+    if df is not None and campo in df.columns and isinstance(df[campo].dtype, pd.CategoricalDtype):
+        return df[campo].cat.categories
+    return ()
+
+
+def validar_cambios(cambios, df=None):
+    """Cambios (campo -> valor) validados y en la forma en que se guardan"""
+    return {campo: validar_valor(campo, valor, categorias_actuales(df, campo))
+            for campo, valor in cambios.items()}
+
+
+def validar_filas(filas, df=None):
+    """Filas nuevas (diccionarios) validadas y en la forma en que se guardan"""
+    return [validar_cambios(fila, df) for fila in filas]
+
+
+# --- Informe -------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Informe de tipos y memoria de los datos de clientes")
+    parser.add_argument('--archivo', help="Archivo .xlsx o .db (por defecto, el de la aplicación)")
+    args = parser.parse_args(argv)
+
+    if args.archivo and args.archivo.lower().endswith('.db'):
+        almacen = abrir_almacenamiento(archivo_sqlite=args.archivo)
+    elif args.archivo:
+        almacen = abrir_almacenamiento(archivo_excel=args.archivo, archivo_sqlite='')
+    else:
+        almacen = abrir_almacenamiento()
+    try:
+        original = asignar_ids_faltantes(almacen.leer())
+    except Exception as e:
+        print(f"Error al leer archivo: {e}")
+        return 1
+    finally:
+        almacen.cerrar()
+
+    # Como texto, tal cual lo dan los archivos (una instantánea puede venir ya tipada)
+    original = original.assign(**{col: texto_fechas(original[col]) for col in original.columns
+                                  if pd.api.types.is_datetime64_any_dtype(original[col].dtype)})
+    original = original.astype({col: object for col in original.columns
+                                if isinstance(original[col].dtype, pd.CategoricalDtype)})
+    informe = InformeTipos()
+    tipado = tipar(original, informe)
+
+    print(f"{len(tipado):,} clientes en {almacen.ruta}")
+    for col in tipado.columns:
+        print(f"  {col:<24} {TIPOS_COLUMNAS.get(col, 'texto'):<10} {tipado[col].dtype}")
+    antes, por_cliente_antes = memoria_por_cliente(original)
+    despues, por_cliente = memoria_por_cliente(tipado)
+    print(f"Memoria: {antes / 2**20:.1f} MB como texto ({por_cliente_antes:.0f} B por cliente), "
+          f"{despues / 2**20:.1f} MB con tipos ({por_cliente:.0f} B por cliente)")
+    if informe.no_reconocidos:
+        print(informe.texto())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
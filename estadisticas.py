@@ -0,0 +1,212 @@
+"""Agregados de clientes mantenidos en memoria para estadísticas y gráficos"""
+
+import threading
+from collections import Counter
+
+import pandas as pd
+
+from indices import clave_categoria
+
+
+class ResumenClientes:
+    """Copia inmutable de los agregados en una versión de los datos"""
+
+    def __init__(self, version, total, conteos, cruce, columnas_cruce):
+        self.version = version
+        self.total = total
+        self.conteos = conteos
+        self.cruce_conteos = cruce
+        self.columnas_cruce = columnas_cruce
+
+    def conteo(self, columna, valor):
+        """Filas con ese valor en la columna"""
+        return self.conteos[columna].get(clave_categoria(valor), 0)
+
+    def distintos(self, columna):
+        """Número de valores distintos no nulos, como Series.nunique()"""
+        return sum(1 for clave in self.conteos[columna] if clave is not None)
+
+    def serie(self, columna, nulos=None, limite=None):
+        """Conteos de mayor a menor, como value_counts(); `nulos` da nombre a los vacíos (fillna)"""
+        conteos = Counter()
+        for clave, cantidad in self.conteos[columna].items():
+            if clave is None:
+                if nulos is None:
+                    continue
+                clave = nulos
+            conteos[clave] += cantidad
+        serie = pd.Series(dict(conteos.most_common(limite)), dtype='int64', name='count')
+        serie.index.name = columna
+        return serie
+
+    def cruce(self):
+        """Tabla cruzada de las dos columnas de propuestas, como pd.crosstab sin nulos"""
+        filas, columnas = self.columnas_cruce
+        if not self.cruce_conteos:
+            return pd.DataFrame()
+        serie = pd.Series(self.cruce_conteos, dtype='int64')
+        tabla = serie.unstack(fill_value=0).sort_index().sort_index(axis=1)
+        tabla.index.name = filas
+        tabla.columns.name = columnas
+        return tabla
+
+
+class AgregadosClientes:
+    """Conteos por valor de las columnas resumidas y tabla Solicitó × Envío.
+
+    Se construyen de una vez para una versión de los datos y luego cada alta,
+    modificación o baja suma o resta sus filas en tiempo constante por fila,
+    con el mismo esquema de versiones que `IndicesClientes`. Todos los
+    paneles leen la misma copia (`resumen`) de una versión.
+    """
+
+    COLUMNAS = ['Estado_Contacto', 'Interes', 'Sector', 'Localidad', 'Sitio_Web_Actual',
+                'Es_Cliente', 'Solicito_Propuesta', 'Se_Le_Envio_Propuesta']
+    COLUMNAS_CRUCE = ('Solicito_Propuesta', 'Se_Le_Envio_Propuesta')
+
+    def __init__(self):
+        self.version = None
+        self.total = 0
+        self.conteos = {col: Counter() for col in self.COLUMNAS}
+        self.cruce = Counter()
+        self._resumen = None
+        self._bloqueo = threading.RLock()
+
+    def asegurar(self, df, version):
+        """Construye los agregados si están atrasados respecto a la versión dada"""
+        with self._bloqueo:
+            if self.version is None or version > self.version:
+                self.construir(df, version)
+
+    def construir(self, df, version):
+        """Recalcula todos los conteos para esa versión de los datos"""
+        with self._bloqueo:
+            self.total = len(df)
+            for col in self.COLUMNAS:
+                conteos = Counter()
+                for valor, cantidad in df[col].value_counts(dropna=False).items():
+                    # Las categóricas cuentan también las categorías sin filas
+                    if cantidad:
+                        conteos[clave_categoria(valor)] += int(cantidad)
+                self.conteos[col] = conteos
+
+            self.cruce = Counter()
+            pares = df.groupby(list(self.COLUMNAS_CRUCE), dropna=True, observed=True).size()
+            for (solicito, envio), cantidad in pares.items():
+                self.cruce[(solicito, envio)] += int(cantidad)
+            self.version = version
+
+    def sumar(self, fila, signo):
+        """Suma (signo 1) o resta (signo -1) una fila de todos los conteos"""
+        self.total += signo
+        for col in self.COLUMNAS:
+            self.variar(self.conteos[col], clave_categoria(fila.get(col)), signo)
+        par = tuple(clave_categoria(fila.get(col)) for col in self.COLUMNAS_CRUCE)
+        if None not in par:
+            self.variar(self.cruce, par, signo)
+
+    def variar(self, conteos, clave, signo):
+        conteos[clave] += signo
+        if conteos[clave] <= 0:
+            del conteos[clave]
+
+    def aplicar(self, version_previa, version, cambio):
+        """Aplica un cambio por fila si los agregados estaban al día; si no, se reconstruirán"""
+        with self._bloqueo:
+            if self.version != version_previa:
+                return
+            cambio()
+            self.version = version
+
+    def insertar(self, version_previa, version, filas):
+        def cambio():
+            for fila in filas:
+                self.sumar(fila, 1)
+        self.aplicar(version_previa, version, cambio)
+
+    def actualizar(self, version_previa, version, anteriores, cambios):
+        """`anteriores` son las filas modificadas tal como estaban antes del cambio"""
+        def cambio():
+            for fila in anteriores:
+                self.sumar(fila, -1)
+                self.sumar({**fila, **cambios}, 1)
+        self.aplicar(version_previa, version, cambio)
+
+    def eliminar(self, version_previa, version, anteriores):
+        def cambio():
+            for fila in anteriores:
+                self.sumar(fila, -1)
+        self.aplicar(version_previa, version, cambio)
+
+    def resumen(self):
+        """Copia de los agregados actuales, compartida mientras no cambie la versión"""
+        with self._bloqueo:
+            if self._resumen is None or self._resumen.version != self.version:
+                self._resumen = ResumenClientes(
+                    self.version, self.total,
+                    {col: dict(conteos) for col, conteos in self.conteos.items()},
+                    dict(self.cruce), self.COLUMNAS_CRUCE)
+            return self._resumen
+
+
+def cifras_principales(resumen):
+    """Las ESTADÍSTICAS PRINCIPALES del informe, como diccionario"""
+    es_cliente = resumen.conteo('Es_Cliente', 'SI')
+    envio_propuesta = resumen.conteo('Se_Le_Envio_Propuesta', 'SI')
+    return {
+        'total_clientes': resumen.total,
+        'sin_web': resumen.conteo('Sitio_Web_Actual', 'No tiene'),
+        'interes_alto': resumen.conteo('Interes', 'Alto'),
+        'es_cliente': es_cliente,
+        'solicito_propuesta': resumen.conteo('Solicito_Propuesta', 'SI'),
+        'envio_propuesta': envio_propuesta,
+        'sectores': resumen.distintos('Sector'),
+        'localidades': resumen.distintos('Localidad'),
+        'tasa_conversion': es_cliente / max(envio_propuesta, 1),
+    }
+
+
+def informe_texto(resumen):
+    """Texto del INFORME ESTADÍSTICO a partir de los agregados"""
+    cifras = cifras_principales(resumen)
+    total_clientes = cifras['total_clientes']
+    sin_web = cifras['sin_web']
+    interes_alto = cifras['interes_alto']
+    es_cliente = cifras['es_cliente']
+    solicito_propuesta = cifras['solicito_propuesta']
+    envio_propuesta = cifras['envio_propuesta']
+    
+    stats_text = f"""
+{'='*60}
+        INFORME ESTADÍSTICO DE CLIENTES POTENCIALES
+{'='*60}
+
+📊 ESTADÍSTICAS PRINCIPALES:
+   • Total de clientes: {total_clientes}
+   • Clientes sin sitio web: {sin_web} ({sin_web/total_clientes*100:.1f}%)
+   • Clientes con interés alto: {interes_alto}
+   • Clientes actuales: {es_cliente} ({es_cliente/total_clientes*100:.1f}%)
+   • Solicitaron propuesta: {solicito_propuesta} ({solicito_propuesta/total_clientes*100:.1f}%)
+   • Se envió propuesta: {envio_propuesta} ({envio_propuesta/total_clientes*100:.1f}%)
+   • Sectores únicos: {cifras['sectores']}
+   • Localidades únicas: {cifras['localidades']}
+
+🎯 ESTADOS DE CONTACTO:
+"""
+    for estado, count in resumen.serie('Estado_Contacto').items():
+        porcentaje = (count / total_clientes) * 100
+        stats_text += f"   • {estado}: {count} ({porcentaje:.1f}%)\n"
+
+    stats_text += """
+🏢 TOP SECTORES:
+"""
+    for sector, count in resumen.serie('Sector', limite=10).items():
+        stats_text += f"   • {sector}: {count}\n"
+
+    stats_text += f"""
+📈 SEGUIMIENTO DE PROPUESTAS:
+   • Clientes que solicitaron propuesta: {solicito_propuesta}
+   • Propuestas enviadas: {envio_propuesta}
+   • Tasa de conversión a cliente: {cifras['tasa_conversion']*100:.1f}%
+"""
+    return stats_text
@@ -0,0 +1,128 @@
+"""Exportación de clientes a CSV, JSONL o XLSX por bloques.
+
+Las filas se toman de los arreglos por columna que ya pinta la tabla (ver
+AlmacenClientes.arreglos_columnas) y de las posiciones de la vista, de a
+un bloque por vez: no se arma una copia del conjunto ni un DataFrame con
+todo lo exportado, así que la memoria no depende del número de filas. El
+XLSX se escribe con el modo de solo escritura de openpyxl, que vuelca
+cada fila al archivo en vez de mantener el libro en memoria.
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FILAS_POR_BLOQUE = 5000
+
+FORMATOS_EXPORTACION = {
+    '.csv': "CSV",
+    '.jsonl': "JSON Lines",
+    '.xlsx': "Libro de Excel",
+}
+
+
+def bloques_filas(datos, posiciones, columnas, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Filas (tuplas, con None en los vacíos) de las posiciones dadas, de a un bloque por vez"""
+    for inicio in range(0, len(posiciones), filas_por_bloque):
+        tramo = posiciones[inicio:inicio + filas_por_bloque]
+        valores = []
+        for col in columnas:
+            arreglo = datos[col][tramo]
+            vacios = pd.isna(arreglo)
+            if vacios.any():
+                arreglo[vacios] = None
+            valores.append(arreglo)
+        yield list(zip(*valores))
+
+
+def escribir_csv(ruta, columnas, bloques):
+    # utf-8-sig: Excel abre el CSV con los acentos bien
+    with open(ruta, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(columnas)
+        for filas in bloques:
+            escritor.writerows(filas)
+
+
+def escribir_jsonl(ruta, columnas, bloques):
+    with open(ruta, 'w', encoding='utf-8', newline='\n') as f:
+        for filas in bloques:
+            f.writelines(
+                json.dumps(dict(zip(columnas, fila)), ensure_ascii=False, default=str) + '\n'
+                for fila in filas
+            )
+
+
+def escribir_xlsx(ruta, columnas, bloques):
+    # openpyxl solo se importa al exportar a Excel, no al abrir la aplicación
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Clientes')
+
+    def celda(valor):
+        # Textos que openpyxl tomaría por fórmula o con caracteres que Excel no admite
+        if not isinstance(valor, str):
+            return valor
+        if ILLEGAL_CHARACTERS_RE.search(valor):
+            valor = ILLEGAL_CHARACTERS_RE.sub('', valor)
+        if valor.startswith('='):
+            texto = WriteOnlyCell(hoja, value=valor)
+            texto.data_type = 's'
+            return texto
+        return valor
+
+    hoja.append(columnas)
+    for filas in bloques:
+        for fila in filas:
+            hoja.append([celda(valor) for valor in fila])
+    libro.save(ruta)
+
+
+ESCRITORES = {
+    '.csv': escribir_csv,
+    '.jsonl': escribir_jsonl,
+    '.xlsx': escribir_xlsx,
+}
+
+
+def exportar(ruta, datos, columnas, posiciones=None, progreso=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Escribe en `ruta` las filas de `datos` (columna -> arreglo) en esas posiciones (o todas).
+
+    El formato sale de la extensión. Se escribe en un archivo temporal que
+    reemplaza al destino solo al terminar, así que una exportación fallida
+    no deja un archivo a medias. `progreso(escritas, total)` se llama tras
+    cada bloque. Devuelve el número de filas exportadas.
+    """
+    raiz, extension = os.path.splitext(ruta)
+    extension = extension.lower()
+    if extension not in ESCRITORES:
+        raise ValueError(f"Formato no admitido: {extension or 'sin extensión'} "
+                         f"(use {', '.join(FORMATOS_EXPORTACION)})")
+    if posiciones is None:
+        posiciones = np.arange(len(datos[columnas[0]]))
+    posiciones = np.asarray(posiciones, dtype=np.int64)
+    total = len(posiciones)
+
+    def bloques():
+        escritas = 0
+        for filas in bloques_filas(datos, posiciones, columnas, filas_por_bloque):
+            yield filas
+            escritas += len(filas)
+            if progreso is not None:
+                progreso(escritas, total)
+
+    temporal = f"{raiz}.tmp{extension}"
+    try:
+        ESCRITORES[extension](temporal, list(columnas), bloques())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return total
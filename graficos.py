@@ -0,0 +1,159 @@
+"""Construcción de los gráficos de clientes con el backend Agg, sin interfaz"""
+
+import io
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+
+def aplicar_estilo():
+    """Estilo y paleta de los gráficos; importa seaborn solo aquí"""
+    import seaborn as sns
+    matplotlib.style.use('default')
+    sns.set_palette("husl")
+
+
+def nueva_figura(figsize, filas=1, columnas=1):
+    """Figura independiente de pyplot, segura para construirse fuera del hilo de Tk"""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots(filas, columnas)
+
+
+def etiquetar_barras(ax, barras, horizontal=False):
+    """Escribe el valor de cada barra junto a ella"""
+    for bar in barras:
+        if horizontal:
+            width = bar.get_width()
+            ax.text(width, bar.get_y() + bar.get_height()/2.,
+                    f'{int(width)}', ha='left', va='center', fontweight='bold')
+        else:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height,
+                    f'{int(height)}', ha='center', va='bottom', fontweight='bold')
+
+
+def figura_estados(resumen, figsize=(12, 10)):
+    """Estados de contacto, niveles de interés, sectores y presencia web"""
+    fig, ((ax1, ax2), (ax3, ax4)) = nueva_figura(figsize, 2, 2)
+    fig.suptitle('ANÁLISIS VISUAL DE CLIENTES POTENCIALES', fontsize=16, fontweight='bold')
+    
+    # Gráfico 1: Estados de contacto
+    estados_count = resumen.serie('Estado_Contacto')
+    colors1 = matplotlib.colormaps['Set3'](np.linspace(0, 1, len(estados_count)))
+    ax1.pie(estados_count.values, labels=estados_count.index, autopct='%1.1f%%',
+            colors=colors1, startangle=90)
+    ax1.set_title('DISTRIBUCIÓN POR ESTADO DE CONTACTO')
+    
+    # Gráfico 2: Niveles de interés
+    interes_count = resumen.serie('Interes')
+    colors2 = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4']
+    bars = ax2.bar(interes_count.index, interes_count.values, 
+                  color=colors2[:len(interes_count)])
+    ax2.set_title('CLIENTES POR NIVEL DE INTERÉS')
+    ax2.set_ylabel('Cantidad de Clientes')
+    ax2.tick_params(axis='x', rotation=45)
+    etiquetar_barras(ax2, bars)
+    
+    # Gráfico 3: Top sectores
+    sectores_count = resumen.serie('Sector', limite=8)
+    colors3 = matplotlib.colormaps['viridis'](np.linspace(0, 1, len(sectores_count)))
+    bars = ax3.barh(range(len(sectores_count)), sectores_count.values, color=colors3)
+    ax3.set_title('TOP 8 SECTORES MÁS COMUNES')
+    ax3.set_yticks(range(len(sectores_count)))
+    ax3.set_yticklabels(sectores_count.index)
+    ax3.set_xlabel('Cantidad de Clientes')
+    etiquetar_barras(ax3, bars, horizontal=True)
+    
+    # Gráfico 4: Presencia web
+    web_count = resumen.serie('Sitio_Web_Actual')
+    colors4 = ['#FF9999', '#66B3FF']
+    ax4.pie(web_count.values, labels=web_count.index, autopct='%1.1f%%',
+            colors=colors4, startangle=90)
+    ax4.set_title('PRESENCIA WEB ACTUAL')
+    return fig
+
+
+def figura_propuestas(resumen, figsize=(12, 10)):
+    """Clientes actuales, solicitud y envío de propuestas y su relación"""
+    fig, ((ax1, ax2), (ax3, ax4)) = nueva_figura(figsize, 2, 2)
+    fig.suptitle('SEGUIMIENTO DE PROPUESTAS Y CLIENTES', fontsize=16, fontweight='bold')
+    
+    # Gráfico 1: Es cliente
+    cliente_count = resumen.serie('Es_Cliente', nulos='NO')
+    colors1 = ['#FF9999', '#66B3FF']
+    ax1.pie(cliente_count.values, labels=cliente_count.index, autopct='%1.1f%%',
+            colors=colors1, startangle=90)
+    ax1.set_title('CLIENTES ACTUALES')
+    
+    # Gráfico 2: Solicitud de propuestas
+    solicitud_count = resumen.serie('Solicito_Propuesta', nulos='NO')
+    colors2 = ['#FF9999', '#66B3FF']
+    bars2 = ax2.bar(solicitud_count.index, solicitud_count.values, color=colors2)
+    ax2.set_title('SOLICITUD DE PROPUESTAS')
+    ax2.set_ylabel('Cantidad')
+    etiquetar_barras(ax2, bars2)
+    
+    # Gráfico 3: Envío de propuestas
+    envio_count = resumen.serie('Se_Le_Envio_Propuesta', nulos='NO')
+    colors3 = ['#FF9999', '#66B3FF']
+    bars3 = ax3.bar(envio_count.index, envio_count.values, color=colors3)
+    ax3.set_title('ENVÍO DE PROPUESTAS')
+    ax3.set_ylabel('Cantidad')
+    etiquetar_barras(ax3, bars3)
+    
+    # Gráfico 4: Relación solicitud vs envío
+    cross_tab = resumen.cruce()
+    if not cross_tab.empty:
+        cross_tab.plot(kind='bar', ax=ax4, color=['#FF9999', '#66B3FF'])
+        ax4.set_title('SOLICITUD VS ENVÍO DE PROPUESTAS')
+        ax4.set_ylabel('Cantidad')
+        ax4.legend(title='Se envió propuesta')
+        ax4.tick_params(axis='x', rotation=45)
+    else:
+        ax4.text(0.5, 0.5, 'No hay datos suficientes', ha='center', va='center', transform=ax4.transAxes)
+        ax4.set_title('SOLICITUD VS ENVÍO DE PROPUESTAS')
+    return fig
+
+
+def figura_localidades(resumen, figsize=(10, 6)):
+    """Las diez localidades con más clientes"""
+    localidades_count = resumen.serie('Localidad', limite=10)
+    
+    fig, ax = nueva_figura(figsize)
+    colors = matplotlib.colormaps['plasma'](np.linspace(0, 1, len(localidades_count)))
+    
+    bars = ax.bar(localidades_count.index, localidades_count.values, color=colors)
+    ax.set_title('TOP 10 LOCALIDADES CON MÁS CLIENTES POTENCIALES', fontweight='bold')
+    ax.set_xlabel('Localidad')
+    ax.set_ylabel('Cantidad de Clientes')
+    ax.set_xticks(range(len(localidades_count)))
+    ax.set_xticklabels(localidades_count.index, rotation=45, ha='right')
+    etiquetar_barras(ax, bars)
+    return fig
+
+
+def renderizar_png(figura, dpi=100):
+    """Dibuja la figura como PNG y libera sus elementos"""
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format='png', dpi=dpi)
+    figura.clear()
+    return buffer.getvalue()
+
+
+# Figuras del informe por nombre, para quien las arma fuera de la interfaz
+FIGURAS = {
+    'estados': figura_estados,
+    'propuestas': figura_propuestas,
+    'localidades': figura_localidades,
+}
+
+
+def exportar_figura(nombre, resumen, ruta, dpi=100):
+    """Arma una figura del informe y la guarda en `ruta` (formato según la extensión)"""
+    figura = FIGURAS[nombre](resumen)
+    figura.savefig(ruta, dpi=dpi)
+    figura.clear()
+    return ruta
@@ -0,0 +1,293 @@
+"""Importación masiva de clientes desde archivos CSV o XLSX.
+
+El archivo de origen se lee por bloques. Cada bloque se pasa a las columnas
+del gestor, y los campos de lista (estado, interés, SI/NO...) y las fechas
+se validan y normalizan de forma vectorizada. Las filas válidas se dan de
+alta de una vez con IDs contiguos (AlmacenClientes.importar), y las
+rechazadas se devuelven con el motivo. Uso por línea de comandos:
+
+    python importacion.py leads.csv --rechazadas rechazadas.csv
+"""
+
+import argparse
+import csv
+import datetime
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+from almacenamiento import COLUMNAS_CLIENTES, OPCIONES_CAMPOS
+from esquema import clave, convertir_fechas, tabla_valores
+
+FILAS_POR_BLOQUE = 5000
+
+COLUMNAS_FECHA = ['Fecha_Contacto', 'Fecha_Proximo_Contacto', 'Fecha_Envio_Propuesta']
+
+# Encabezados habituales en listas compradas (normalizados: sin acentos,
+# en minúsculas y solo letras y números) -> columna del gestor
+SINONIMOS_COLUMNAS = {
+    'empresa': 'Nombre_Empresa', 'nombre': 'Nombre_Empresa', 'razonsocial': 'Nombre_Empresa',
+    'compania': 'Nombre_Empresa', 'company': 'Nombre_Empresa',
+    'rubro': 'Sector', 'industria': 'Sector', 'actividad': 'Sector',
+    'ciudad': 'Localidad', 'municipio': 'Localidad', 'provincia': 'Localidad',
+    'tel': 'Telefono', 'celular': 'Telefono', 'movil': 'Telefono', 'whatsapp': 'Telefono',
+    'telefono1': 'Telefono', 'phone': 'Telefono',
+    'correo': 'Correo_Electronico', 'email': 'Correo_Electronico', 'mail': 'Correo_Electronico',
+    'estado': 'Estado_Contacto', 'nivelinteres': 'Interes',
+    'web': 'Sitio_Web_Actual', 'sitioweb': 'Sitio_Web_Actual', 'paginaweb': 'Sitio_Web_Actual',
+    'notas': 'Observaciones', 'comentarios': 'Observaciones', 'nota': 'Observaciones',
+    'cliente': 'Es_Cliente',
+}
+
+def mapear_columnas(encabezados, columnas=COLUMNAS_CLIENTES, mapeo=None):
+    """Columna del origen -> columna del gestor. `mapeo` fuerza correspondencias concretas"""
+    # El ID del origen no se usa: los importados reciben IDs nuevos
+    destinos = {re.sub(r'[^a-z0-9]', '', clave(col)): col for col in columnas if col != 'ID'}
+    resultado = {}
+    for encabezado in encabezados:
+        if mapeo and encabezado in mapeo:
+            destino = mapeo[encabezado]
+        else:
+            normalizado = re.sub(r'[^a-z0-9]', '', clave(encabezado))
+            destino = destinos.get(normalizado) or SINONIMOS_COLUMNAS.get(normalizado)
+        # Cada columna del gestor se toma de la primera columna del origen que le corresponda
+        if destino in columnas and destino != 'ID' and destino not in resultado.values():
+            resultado[encabezado] = destino
+    return resultado
+
+
+def detectar_separador(ruta):
+    """Separador del CSV (coma, punto y coma, tabulador o barra) según sus primeras líneas"""
+    with open(ruta, encoding='utf-8-sig', errors='replace', newline='') as f:
+        muestra = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(muestra, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+
+def texto_celda(valor):
+    """Valor de una celda de Excel como texto, con las fechas en formato ISO"""
+    if valor is None:
+        return ''
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.strftime('%Y-%m-%d')
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def leer_bloques(ruta, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera el archivo como DataFrames de texto ('' en las celdas vacías), bloque a bloque.
+
+    El índice de cada bloque es el número de fila de datos en el archivo (desde 0).
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        yield from leer_bloques_excel(ruta, filas_por_bloque)
+        return
+    if extension not in ('.csv', '.txt'):
+        raise ValueError(f"Formato no soportado: {extension or ruta} (use .csv o .xlsx)")
+
+    lector = pd.read_csv(ruta, sep=detectar_separador(ruta), dtype=str, keep_default_na=False,
+                         encoding='utf-8-sig', chunksize=filas_por_bloque)
+    desde = 0
+    with lector:
+        for bloque in lector:
+            bloque.index = pd.RangeIndex(desde, desde + len(bloque))
+            desde += len(bloque)
+            yield bloque
+
+
+def leer_bloques_excel(ruta, filas_por_bloque):
+    """Lee la primera hoja en modo de solo lectura de openpyxl, sin cargar el libro entero"""
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if encabezados is None:
+            return
+        encabezados = [str(e) if e is not None else f'Columna_{i + 1}' for i, e in enumerate(encabezados)]
+        desde = 0
+        bloque = []
+        for fila in filas:
+            if all(valor is None for valor in fila):
+                continue
+            bloque.append([texto_celda(valor) for valor in fila[:len(encabezados)]])
+            if len(bloque) == filas_por_bloque:
+                yield pd.DataFrame(bloque, columns=encabezados,
+                                   index=pd.RangeIndex(desde, desde + len(bloque)))
+                desde += len(bloque)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=encabezados, index=pd.RangeIndex(desde, desde + len(bloque)))
+    finally:
+        libro.close()
+
+
+def normalizar_bloque(bloque, mapeo, columnas=COLUMNAS_CLIENTES, hoy=None):
+    """Pasa un bloque del origen a las columnas del gestor y lo valida.
+
+    Devuelve (válidas, rechazadas). Las válidas tienen las columnas del
+    gestor sin ID (el ID se asigna al importar); las rechazadas son las
+    filas originales con su número de fila y el motivo.
+    """
+    hoy = hoy or datetime.date.today().strftime('%Y-%m-%d')
+    origen_de = {destino: origen for origen, destino in mapeo.items()}
+    vacio = pd.Series('', index=bloque.index, dtype=object)
+    datos = {}
+    for col in columnas:
+        if col != 'ID':
+            datos[col] = bloque[origen_de[col]].astype(str).str.strip() if col in origen_de else vacio
+    motivos = pd.Series('', index=bloque.index, dtype=object)
+
+    def rechazar(mascara, motivo):
+        motivos[mascara] = motivos[mascara] + motivo + '; '
+
+    rechazar(datos['Nombre_Empresa'] == '', "Falta el nombre de la empresa")
+
+    # Campos de lista: se normalizan solo los valores distintos del bloque
+    for campo in OPCIONES_CAMPOS:
+        if campo not in datos:
+            continue
+        valores = datos[campo]
+        tabla = tabla_valores(campo)
+        unicos = pd.unique(valores)
+        normalizados = valores.map({u: tabla.get(clave(u)) for u in unicos})
+        en_blanco = valores == ''
+        invalidos = normalizados.isna() & ~en_blanco
+        rechazar(invalidos, f"{campo} no válido ('" + valores[invalidos] + "')")
+        datos[campo] = normalizados.where(~en_blanco, OPCIONES_CAMPOS[campo][0])
+
+    for campo in COLUMNAS_FECHA:
+        if campo not in datos:
+            continue
+        valores = datos[campo]
+        con_fecha = valores != ''
+        fechas = convertir_fechas(valores[con_fecha])
+        invalidas = fechas.isna().reindex(valores.index, fill_value=False)
+        rechazar(invalidas, f"{campo} no es una fecha ('" + valores[invalidas] + "')")
+        normalizadas = pd.Series(None, index=valores.index, dtype=object)
+        normalizadas[con_fecha] = fechas.dt.strftime('%Y-%m-%d').astype(object)
+        datos[campo] = normalizadas
+
+    # Mismos valores por defecto que el alta desde el formulario
+    datos['Fecha_Contacto'] = datos['Fecha_Contacto'].fillna(hoy)
+    enviada = (datos['Se_Le_Envio_Propuesta'] == 'SI') & datos['Fecha_Envio_Propuesta'].isna()
+    datos['Fecha_Envio_Propuesta'] = datos['Fecha_Envio_Propuesta'].mask(enviada, hoy)
+
+    validas = pd.DataFrame(datos)
+    for col in validas.columns:
+        if col not in OPCIONES_CAMPOS and col not in COLUMNAS_FECHA:
+            # Texto libre vacío -> nulo, como las celdas vacías del libro
+            validas[col] = validas[col].mask(validas[col] == '', None)
+
+    aceptadas = motivos == ''
+    rechazadas = bloque[~aceptadas].copy()
+    # Número de fila como en una hoja de cálculo (la 1 es el encabezado)
+    rechazadas.insert(0, 'Fila', rechazadas.index + 2)
+    rechazadas['Motivo'] = motivos[~aceptadas].str.rstrip('; ')
+    return validas[aceptadas], rechazadas
+
+
+class LoteImportacion:
+    """Resultado de leer y validar un archivo: filas listas para dar de alta y rechazadas"""
+
+    def __init__(self, ruta, mapeo, ignoradas, clientes, rechazadas, segundos):
+        self.ruta = ruta
+        self.mapeo = mapeo
+        self.ignoradas = ignoradas
+        self.clientes = clientes
+        self.rechazadas = rechazadas
+        self.segundos = segundos
+
+    @property
+    def leidas(self):
+        return len(self.clientes) + len(self.rechazadas)
+
+    def informe(self, segundos_alta=0.0):
+        """Texto con filas leídas, importadas y rechazadas, velocidad y motivos más frecuentes"""
+        segundos = self.segundos + segundos_alta
+        velocidad = self.leidas / segundos if segundos > 0 else 0
+        lineas = [
+            f"Archivo: {os.path.basename(self.ruta)}",
+            f"Filas leídas: {self.leidas:,}",
+            f"Importadas: {len(self.clientes):,}",
+            f"Rechazadas: {len(self.rechazadas):,}",
+            f"Tiempo: {segundos:.2f} s ({velocidad:,.0f} filas/s)",
+        ]
+        if self.ignoradas:
+            lineas.append(f"Columnas ignoradas: {', '.join(map(str, self.ignoradas))}")
+        if len(self.rechazadas):
+            lineas.append("Motivos más frecuentes:")
+            for motivo, cantidad in self.rechazadas['Motivo'].value_counts().head(5).items():
+                lineas.append(f"   {cantidad:,} - {motivo}")
+        return '\n'.join(lineas)
+
+    def guardar_rechazadas(self, ruta):
+        """Escribe las filas rechazadas, con su número de fila y motivo, en un CSV"""
+        self.rechazadas.to_csv(ruta, index=False, encoding='utf-8-sig')
+
+
+def preparar_importacion(ruta, columnas=COLUMNAS_CLIENTES, mapeo=None, progreso=None,
+                         filas_por_bloque=FILAS_POR_BLOQUE):
+    """Lee y valida el archivo por bloques; no escribe nada. `progreso(filas)` recibe las filas leídas"""
+    inicio = time.perf_counter()
+    hoy = datetime.date.today().strftime('%Y-%m-%d')
+    correspondencia = None
+    validas, rechazadas = [], []
+    leidas = 0
+    for bloque in leer_bloques(ruta, filas_por_bloque):
+        if correspondencia is None:
+            correspondencia = mapear_columnas(bloque.columns, columnas, mapeo)
+            if 'Nombre_Empresa' not in correspondencia.values():
+                raise ValueError("No se encontró la columna del nombre de la empresa en el archivo")
+        buenas, malas = normalizar_bloque(bloque, correspondencia, columnas, hoy)
+        validas.append(buenas)
+        rechazadas.append(malas)
+        leidas += len(bloque)
+        if progreso:
+            progreso(leidas)
+
+    if correspondencia is None:
+        raise ValueError("El archivo no tiene filas para importar")
+    ignoradas = [col for col in bloque.columns if col not in correspondencia]
+    return LoteImportacion(ruta, correspondencia, ignoradas,
+                           pd.concat(validas, ignore_index=True), pd.concat(rechazadas, ignore_index=True),
+                           time.perf_counter() - inicio)
+
+
+def main(argv=None):
+    from clientes import AlmacenClientes
+
+    parser = argparse.ArgumentParser(description="Importa clientes potenciales desde un CSV o XLSX")
+    parser.add_argument('archivo', help="Archivo .csv o .xlsx con los clientes")
+    parser.add_argument('--rechazadas', help="CSV donde guardar las filas rechazadas y su motivo")
+    args = parser.parse_args(argv)
+
+    try:
+        lote = preparar_importacion(args.archivo)
+        clientes = AlmacenClientes()
+        clientes.inicializar()
+        inicio = time.perf_counter()
+        clientes.importar(lote.clientes)
+        clientes.cerrar()
+        alta = time.perf_counter() - inicio
+    except Exception as e:
+        print(f"Error al importar: {e}")
+        return 1
+
+    print(lote.informe(alta))
+    if args.rechazadas and len(lote.rechazadas):
+        lote.guardar_rechazadas(args.rechazadas)
+        print(f"Filas rechazadas guardadas en {args.rechazadas}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,644 @@
+"""Índices en memoria sobre el conjunto de clientes"""
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+# Marcas diacríticas que quedan separadas de su letra tras la forma NFKD
+_DIACRITICOS = re.compile('[\u0300-\u036f]')
+
+
+def normalizar_texto(valor):
+    """Texto sin acentos y en minúsculas ('Bogotá' -> 'bogota'); vacío para nulos"""
+    if valor is None:
+        return ''
+    try:
+        if pd.isna(valor):
+            return ''
+    except (TypeError, ValueError):
+        pass
+    texto = str(valor)
+    if not texto.isascii():
+        texto = _DIACRITICOS.sub('', unicodedata.normalize('NFKD', texto))
+    return texto.casefold()
+
+
+def codigos_trigramas(texto):
+    """Conjunto de trigramas de un texto normalizado, cada uno codificado como entero.
+
+    Cada carácter ocupa 21 bits (todo el rango Unicode), así que un trigrama
+    cabe en un int64 y se puede buscar en arreglos ordenados de numpy.
+    """
+    puntos = [ord(c) for c in texto]
+    return {(puntos[i] << 42) | (puntos[i + 1] << 21) | puntos[i + 2]
+            for i in range(len(puntos) - 2)}
+
+
+class IndiceTrigramas:
+    """Índice invertido de trigramas para búsquedas 'contiene' sobre una columna.
+
+    La base se construye una vez, vectorizada, como arreglos ordenados
+    (trigrama -> IDs); las altas y modificaciones posteriores van a listas de
+    posteo en memoria y las bajas y filas modificadas se marcan como
+    eliminadas de la base. Una consulta intersecta las listas de sus
+    trigramas y confirma los candidatos comparando con el texto normalizado.
+    """
+
+    def __init__(self):
+        self.trigramas = np.empty(0, dtype=np.int64)
+        self.limites = np.zeros(1, dtype=np.int64)
+        self.ids_posteo = np.empty(0, dtype=np.int64)
+        self.ids_base = np.empty(0, dtype=np.int64)
+        self.textos_base = np.empty(0, dtype=object)
+        self.eliminados = set()
+        self.textos_nuevos = {}
+        self.posteo_nuevo = {}
+
+    def construir(self, ids, valores):
+        """Construye la base a partir de IDs y valores alineados"""
+        # Cada valor distinto se normaliza una sola vez
+        factores, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=False)
+        textos_unicos = [normalizar_texto(valor) for valor in unicos]
+
+        # Trigramas de todos los valores distintos a la vez: se concatenan
+        # separados por '\0' y se descartan los que cruzan un separador
+        puntos = np.frombuffer(('\0'.join(textos_unicos) + '\0').encode('utf-32-le'),
+                               dtype=np.uint32).astype(np.int64)
+        separador = puntos == 0
+        valor_de_punto = np.cumsum(separador) - separador
+        codigos = (puntos[:-2] << 42) | (puntos[1:-1] << 21) | puntos[2:]
+        validos = ~(separador[:-2] | separador[1:-1] | separador[2:])
+        codigos = codigos[validos]
+        valor_de_codigo = valor_de_punto[:-2][validos]
+
+        # Pares (valor, trigrama) únicos, agrupados por valor. Los trigramas
+        # se reemplazan por su rango para poder combinar ambos en una clave
+        self.trigramas, rangos = np.unique(codigos, return_inverse=True)
+        total_trigramas = max(len(self.trigramas), 1)
+        claves = np.sort(valor_de_codigo * total_trigramas + rangos)
+        claves = claves[np.concatenate([claves[:1] == claves[:1], claves[1:] != claves[:-1]])]
+        rangos = claves % total_trigramas
+        largos = np.bincount(claves // total_trigramas, minlength=len(unicos))
+
+        # Filas en orden de ID, para que cada lista de posteo salga ordenada
+        ids = np.asarray(ids, dtype=np.int64)
+        orden = np.argsort(ids, kind='stable')
+        ids = ids[orden]
+        factores = factores[orden]
+        total_filas = max(len(ids), 1)
+
+        # Expandir a pares (fila, trigrama) repitiendo los trigramas de su valor
+        desplazamientos = np.cumsum(largos) - largos
+        largos_fila = largos[factores]
+        inicio_fila = np.repeat(desplazamientos[factores] - np.cumsum(largos_fila) + largos_fila, largos_fila)
+        pares_rango = rangos[inicio_fila + np.arange(int(largos_fila.sum()))]
+        pares_fila = np.repeat(np.arange(len(ids)), largos_fila)
+
+        claves = np.sort(pares_rango * total_filas + pares_fila)
+        self.ids_posteo = ids[claves % total_filas]
+        self.limites = np.searchsorted(claves, np.arange(len(self.trigramas) + 1) * total_filas)
+
+        self.ids_base = ids
+        self.textos_base = np.array(textos_unicos, dtype=object)[factores]
+        self.eliminados = set()
+        self.textos_nuevos = {}
+        self.posteo_nuevo = {}
+
+    def agregar(self, cliente_id, valor):
+        """Indexa una fila nueva o el nuevo valor de una fila modificada"""
+        self.quitar(cliente_id)
+        texto = normalizar_texto(valor)
+        self.textos_nuevos[cliente_id] = texto
+        for codigo in codigos_trigramas(texto):
+            self.posteo_nuevo.setdefault(codigo, set()).add(cliente_id)
+
+    def quitar(self, cliente_id):
+        """Deja de indexar una fila"""
+        texto = self.textos_nuevos.pop(cliente_id, None)
+        if texto is not None:
+            for codigo in codigos_trigramas(texto):
+                self.posteo_nuevo[codigo].discard(cliente_id)
+        posicion = np.searchsorted(self.ids_base, cliente_id)
+        if posicion < len(self.ids_base) and self.ids_base[posicion] == cliente_id:
+            self.eliminados.add(cliente_id)
+
+    def posteo_base(self, codigo):
+        """IDs de la base (ordenados) que contienen el trigrama"""
+        posicion = np.searchsorted(self.trigramas, codigo)
+        if posicion == len(self.trigramas) or self.trigramas[posicion] != codigo:
+            return self.ids_posteo[:0]
+        return self.ids_posteo[self.limites[posicion]:self.limites[posicion + 1]]
+
+    def buscar(self, valor):
+        """IDs cuyo texto normalizado contiene el valor normalizado"""
+        consulta = normalizar_texto(valor)
+        claves = codigos_trigramas(consulta)
+
+        if claves:
+            listas = sorted((self.posteo_base(codigo) for codigo in claves), key=len)
+            candidatos = listas[0]
+            for lista in listas[1:]:
+                if not len(candidatos):
+                    break
+                candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+            nuevos = set.intersection(*(self.posteo_nuevo.get(codigo, set()) for codigo in claves))
+        else:
+            # Consultas de menos de tres caracteres: se revisan todas las filas
+            candidatos = self.ids_base
+            nuevos = set(self.textos_nuevos)
+
+        if self.eliminados and len(candidatos):
+            candidatos = candidatos[~np.isin(candidatos, list(self.eliminados))]
+        textos = self.textos_base[np.searchsorted(self.ids_base, candidatos)]
+        coincide = np.fromiter((consulta in texto for texto in textos), dtype=bool, count=len(textos))
+        encontrados = candidatos[coincide]
+
+        nuevos = [i for i in nuevos if consulta in self.textos_nuevos[i]]
+        if nuevos:
+            encontrados = np.concatenate([encontrados, np.array(nuevos, dtype=np.int64)])
+        return encontrados
+
+
+def clave_categoria(valor):
+    """Valor de una columna categórica tal como se indexa; los nulos se agrupan en None"""
+    if valor is None:
+        return None
+    try:
+        if pd.isna(valor):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return valor
+
+
+def bits_de_mascara(mascara):
+    """Convierte una máscara booleana en un conjunto de bits (bit i = fila i)"""
+    return int.from_bytes(np.packbits(mascara, bitorder='little').tobytes(), 'little')
+
+
+def mascara_de_bits(bits, total):
+    """Máscara booleana de `total` filas a partir de un conjunto de bits"""
+    octetos = np.frombuffer(bits.to_bytes((total + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(octetos, count=total, bitorder='little').astype(bool)
+
+
+class IndiceCategorias:
+    """Índice de mapas de bits sobre las columnas de pocos valores distintos.
+
+    Por cada columna y valor guarda un entero de Python usado como conjunto
+    de bits, donde el bit i corresponde a la fila en la posición i de la
+    caché. Un filtro de varias columnas es un AND de esos enteros (OR entre
+    los valores aceptados de una misma columna) y un conteo es el número de
+    bits encendidos, sin recorrer las filas.
+    """
+
+    # A partir de cuántas bajas conviene desempaquetar los bits en lugar de
+    # correrlos uno por uno
+    BAJAS_VECTORIZADAS = 64
+
+    def __init__(self, columnas):
+        self.columnas = columnas
+        self.total = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.bits = {col: {} for col in columnas}
+
+    def construir(self, df):
+        """Construye los mapas de bits a partir del conjunto completo"""
+        self.total = len(df)
+        self.ids = df['ID'].to_numpy(dtype=np.int64)
+        for col in self.columnas:
+            serie = df[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                # Las categóricas ya traen sus códigos (-1 en los vacíos)
+                codigos = serie.cat.codes.to_numpy()
+                valores = list(serie.cat.categories) + [None]
+                codigos = np.where(codigos < 0, len(valores) - 1, codigos)
+            else:
+                codigos, valores = pd.factorize(serie.to_numpy(dtype=object), use_na_sentinel=False)
+            mapas = {}
+            for codigo, valor in enumerate(valores):
+                mascara = codigos == codigo
+                if not mascara.any():
+                    continue
+                clave = clave_categoria(valor)
+                mapas[clave] = mapas.get(clave, 0) | bits_de_mascara(mascara)
+            self.bits[col] = mapas
+
+    def todas(self):
+        """Conjunto de bits con todas las filas"""
+        return (1 << self.total) - 1
+
+    def encender(self, col, clave, bit):
+        mapas = self.bits[col]
+        mapas[clave] = mapas.get(clave, 0) | bit
+
+    def apagar(self, col, bits):
+        mapas = self.bits[col]
+        for clave in list(mapas):
+            mapas[clave] &= ~bits
+            if not mapas[clave]:
+                del mapas[clave]
+
+    def insertar(self, filas):
+        """Las filas nuevas se agregan al final de la caché"""
+        for fila in filas:
+            bit = 1 << self.total
+            for col in self.columnas:
+                self.encender(col, clave_categoria(fila.get(col)), bit)
+            self.total += 1
+        self.ids = np.concatenate([self.ids, np.array([fila['ID'] for fila in filas], dtype=np.int64)])
+
+    def actualizar(self, ids, cambios):
+        # De una vez desde la máscara: con cientos de filas seleccionadas, un OR
+        # por fila recorrería el conjunto de bits completo cada vez
+        bits = bits_de_mascara(np.isin(self.ids, list(ids)))
+        for col in self.columnas:
+            if col in cambios:
+                self.apagar(col, bits)
+                self.encender(col, clave_categoria(cambios[col]), bits)
+
+    def eliminar(self, ids):
+        """Quita las filas y corre hacia atrás los bits de las posteriores, como en la caché"""
+        quitar = np.isin(self.ids, list(ids))
+        posiciones = np.flatnonzero(quitar)
+        for col in self.columnas:
+            mapas = self.bits[col]
+            for clave in list(mapas):
+                if len(posiciones) > self.BAJAS_VECTORIZADAS:
+                    mapas[clave] = bits_de_mascara(mascara_de_bits(mapas[clave], self.total)[~quitar])
+                else:
+                    bits = mapas[clave]
+                    for posicion in reversed(posiciones.tolist()):
+                        bits = (bits & ((1 << posicion) - 1)) | ((bits >> (posicion + 1)) << posicion)
+                    mapas[clave] = bits
+                if not mapas[clave]:
+                    del mapas[clave]
+        self.ids = self.ids[~quitar]
+        self.total -= len(posiciones)
+
+    def filtrar(self, criterios):
+        """Bits de las filas que cumplen todos los criterios (columna -> valor o lista de valores)"""
+        resultado = self.todas()
+        for col, valores in criterios.items():
+            if not isinstance(valores, (list, tuple, set)):
+                valores = [valores]
+            bits = 0
+            for valor in valores:
+                bits |= self.bits[col].get(clave_categoria(valor), 0)
+            resultado &= bits
+        return resultado
+
+    def valores_que_contienen(self, col, texto):
+        """Valores de la columna cuya representación en minúsculas contiene el texto"""
+        return [valor for valor in self.bits[col] if valor is not None and texto in str(valor).lower()]
+
+    def posiciones(self, bits):
+        """Posiciones (en orden) de los bits encendidos"""
+        return np.flatnonzero(mascara_de_bits(bits, self.total))
+
+
+def orden_como_texto(serie, orden_categorias=False):
+    """Indica si rangos_orden compara la columna por su texto"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return not orden_categorias
+    return not (pd.api.types.is_datetime64_any_dtype(serie.dtype) or pd.api.types.is_numeric_dtype(serie.dtype))
+
+
+def clave_texto(valor):
+    """Clave con que rangos_orden compara un texto; None si está vacío"""
+    texto = normalizar_texto(valor).strip()
+    return (texto, str(valor)) if texto else None
+
+
+def rangos_orden(serie, orden_categorias=False):
+    """Rango de cada fila en el orden ascendente de la columna y número de rangos distintos.
+
+    Los vacíos (nulos o texto en blanco) reciben el rango más alto, para
+    quedar al final. Los textos se comparan sin distinguir mayúsculas ni
+    acentos; las categóricas, por el texto de su categoría o, con
+    `orden_categorias`, en el orden de sus categorías (p. ej. interés Bajo <
+    Medio < Alto). Fechas y números, por su valor.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype) or not (
+            pd.api.types.is_datetime64_any_dtype(serie.dtype) or pd.api.types.is_numeric_dtype(serie.dtype)):
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = serie.cat.codes.to_numpy().astype(np.int64)
+            unicos = list(serie.cat.categories)
+        else:
+            codigos, unicos = pd.factorize(serie.to_numpy(dtype=object))
+        claves = [clave_texto(valor) for valor in unicos]
+        if orden_categorias:
+            orden = range(len(unicos))
+        else:
+            orden = sorted(range(len(unicos)), key=lambda i: claves[i] or ('', ''))
+        rango_de = np.empty(len(unicos) + 1, dtype=np.int64)
+        rango_de[list(orden)] = np.arange(len(unicos))
+        distintos = len(unicos)
+        rango_de[[i for i, clave in enumerate(claves) if clave is None]] = distintos
+        # El último elemento atiende el código -1 (vacío)
+        rango_de[-1] = distintos
+        return rango_de[codigos], distintos
+
+    valores = serie.to_numpy()
+    vacios = pd.isna(valores)
+    unicos, inverso = np.unique(valores[~vacios], return_inverse=True)
+    rangos = np.full(len(valores), len(unicos), dtype=np.int64)
+    rangos[~vacios] = inverso
+    return rangos, len(unicos)
+
+
+def extender_rangos(valores, rangos, distintos):
+    """Rangos de una columna de texto tras agregar filas al final, sin volver a ordenarla.
+
+    `rangos` y `distintos` son los de rangos_orden para las primeras filas
+    de `valores`; cada fila agregada se ubica con una búsqueda binaria entre
+    los valores presentes y, si es un valor nuevo, corre en uno los rangos
+    mayores. Devuelve (rangos, distintos) de todas las filas.
+    """
+    rangos = np.asarray(rangos, dtype=np.int64)
+    for valor in valores[len(rangos):]:
+        clave = clave_texto(valor)
+        if clave is None:
+            rangos = np.append(rangos, distintos)
+            continue
+        # Un representante (primera fila) de cada rango presente, sin los vacíos
+        presentes, primeras = np.unique(rangos, return_index=True)
+        total = np.searchsorted(presentes, distintos)
+        desde, hasta = 0, total
+        while desde < hasta:
+            medio = (desde + hasta) // 2
+            if clave_texto(valores[primeras[medio]]) < clave:
+                desde = medio + 1
+            else:
+                hasta = medio
+        if desde < total and clave_texto(valores[primeras[desde]]) == clave:
+            rango = presentes[desde]
+        else:
+            rango = presentes[desde] if desde < total else distintos
+            rangos = np.where(rangos >= rango, rangos + 1, rangos)
+            distintos += 1
+        rangos = np.append(rangos, rango)
+    return rangos, distintos
+
+
+def dia_de_valor(valor):
+    """Fecha como número de día (días desde 1970-01-01); None si está vacía o no es una fecha"""
+    if valor is None:
+        return None
+    try:
+        if pd.isna(valor):
+            return None
+        return int(pd.Timestamp(valor).to_datetime64().astype('datetime64[D]').astype(np.int64))
+    except (TypeError, ValueError):
+        return None
+
+
+class IndiceFechas:
+    """Fechas de una columna en orden, para consultas por rango en O(log N + k).
+
+    La base son dos arreglos alineados (día, ID) ordenados por día y luego
+    por ID, construidos de una vez. Las altas y los cambios de fecha van a
+    una lista ordenada aparte (bisect) y las filas de la base modificadas o
+    eliminadas se marcan; una consulta busca los extremos del rango en ambas
+    partes. Cuando lo agregado y lo marcado crece (o un cambio afecta a
+    muchas filas) todo se funde de nuevo en la base.
+    """
+
+    # Cambios a partir de los cuales se funde en la base en vez de ir a la lista
+    FUNDIR = 2000
+
+    def __init__(self):
+        self.dias = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        # Los mismos pares ordenados por ID, para saber el día de un ID de la base
+        self.ids_base = np.empty(0, dtype=np.int64)
+        self.dias_base = np.empty(0, dtype=np.int64)
+        self.eliminados = set()
+        self.nuevos = []
+        self.dia_nuevo = {}
+
+    def construir(self, ids, fechas):
+        """Construye la base a partir de IDs y fechas (datetime64) alineados"""
+        fechas = np.asarray(fechas, dtype='datetime64[ns]')
+        con_fecha = ~np.isnat(fechas)
+        self.establecer_base(np.asarray(ids, dtype=np.int64)[con_fecha],
+                             fechas[con_fecha].astype('datetime64[D]').astype(np.int64))
+
+    def establecer_base(self, ids, dias):
+        orden = np.lexsort((ids, dias))
+        self.dias, self.ids = dias[orden], ids[orden]
+        orden = np.argsort(ids, kind='stable')
+        self.ids_base, self.dias_base = ids[orden], dias[orden]
+        self.eliminados = set()
+        self.nuevos = []
+        self.dia_nuevo = {}
+
+    def dia_base(self, cliente_id):
+        """Día del ID en la base, o None si no está"""
+        posicion = np.searchsorted(self.ids_base, cliente_id)
+        if posicion < len(self.ids_base) and self.ids_base[posicion] == cliente_id:
+            return int(self.dias_base[posicion])
+        return None
+
+    def quitar(self, cliente_id):
+        dia = self.dia_nuevo.pop(cliente_id, None)
+        if dia is not None:
+            del self.nuevos[bisect_left(self.nuevos, (dia, cliente_id))]
+        if self.dia_base(cliente_id) is not None:
+            self.eliminados.add(cliente_id)
+
+    def cambiar(self, ids, dia):
+        """Pone ese día (None: sin fecha) a los IDs dados"""
+        ids = list(ids)
+        if len(ids) + len(self.eliminados) + len(self.nuevos) > max(self.FUNDIR, len(self.dias) // 8):
+            self.fundir(ids, dia)
+            return
+        for cliente_id in ids:
+            self.quitar(cliente_id)
+            if dia is not None:
+                insort(self.nuevos, (dia, cliente_id))
+                self.dia_nuevo[cliente_id] = dia
+
+    def fundir(self, ids=(), dia=None):
+        """Vuelve a armar la base con todo lo vigente y, además, ese día en esos IDs"""
+        ids_actuales, dias_actuales = self.consultar(None, None)
+        quitar = np.asarray(list(ids), dtype=np.int64)
+        conservar = ~np.isin(ids_actuales, quitar)
+        ids_actuales, dias_actuales = ids_actuales[conservar], dias_actuales[conservar]
+        if dia is not None and len(quitar):
+            ids_actuales = np.concatenate([ids_actuales, quitar])
+            dias_actuales = np.concatenate([dias_actuales, np.full(len(quitar), dia, dtype=np.int64)])
+        self.establecer_base(ids_actuales, dias_actuales)
+
+    def consultar(self, desde, hasta):
+        """(IDs, días) con desde <= día < hasta (None: sin límite), en orden de día"""
+        inicio = 0 if desde is None else np.searchsorted(self.dias, desde, 'left')
+        fin = len(self.dias) if hasta is None else np.searchsorted(self.dias, hasta, 'left')
+        ids, dias = self.ids[inicio:fin], self.dias[inicio:fin]
+        if self.eliminados and len(ids):
+            vigentes = ~np.isin(ids, list(self.eliminados))
+            ids, dias = ids[vigentes], dias[vigentes]
+        if self.nuevos:
+            inicio = 0 if desde is None else bisect_left(self.nuevos, (desde,))
+            fin = len(self.nuevos) if hasta is None else bisect_left(self.nuevos, (hasta,))
+            if fin > inicio:
+                nuevos = np.array(self.nuevos[inicio:fin], dtype=np.int64)
+                ids = np.concatenate([ids, nuevos[:, 1]])
+                dias = np.concatenate([dias, nuevos[:, 0]])
+                orden = np.lexsort((ids, dias))
+                ids, dias = ids[orden], dias[orden]
+        return ids, dias
+
+    def contar(self, desde, hasta):
+        """Número de IDs con desde <= día < hasta, sin recorrerlos"""
+        inicio = 0 if desde is None else np.searchsorted(self.dias, desde, 'left')
+        fin = len(self.dias) if hasta is None else np.searchsorted(self.dias, hasta, 'left')
+        total = max(int(fin - inicio), 0)
+        if self.eliminados:
+            dias = self.dias_base[np.searchsorted(self.ids_base, list(self.eliminados))]
+            dentro = np.ones(len(dias), dtype=bool)
+            if desde is not None:
+                dentro &= dias >= desde
+            if hasta is not None:
+                dentro &= dias < hasta
+            total -= int(np.count_nonzero(dentro))
+        if self.nuevos:
+            inicio = 0 if desde is None else bisect_left(self.nuevos, (desde,))
+            fin = len(self.nuevos) if hasta is None else bisect_left(self.nuevos, (hasta,))
+            total += max(fin - inicio, 0)
+        return total
+
+
+class IndicesClientes:
+    """Conjunto de índices sincronizado con una versión del conjunto de datos.
+
+    Hay tres grupos: 'texto' (trigramas, caro de construir, se prepara en
+    segundo plano), 'categorias' (mapas de bits, barato) y 'fechas' (fechas
+    ordenadas para la agenda, barato). Cada grupo se
+    construye de una vez para una versión y luego se mantiene con los
+    cambios por fila (`insertar`, `actualizar`, `eliminar`), que avanzan su
+    versión junto con la de los datos.
+    """
+
+    COLUMNAS_TEXTO = ['Nombre_Empresa', 'Sector', 'Localidad']
+    COLUMNAS_CATEGORIAS = ['Estado_Contacto', 'Interes', 'Es_Cliente', 'Solicito_Propuesta',
+                           'Se_Le_Envio_Propuesta', 'Sitio_Web_Actual']
+    COLUMNAS_FECHAS = ['Fecha_Proximo_Contacto']
+    GRUPOS = ('texto', 'categorias', 'fechas')
+
+    def __init__(self):
+        self.versiones = {grupo: None for grupo in self.GRUPOS}
+        self.trigramas = {}
+        self.categorias = IndiceCategorias(self.COLUMNAS_CATEGORIAS)
+        self.fechas = {col: IndiceFechas() for col in self.COLUMNAS_FECHAS}
+        # Un bloqueo por grupo: construir los trigramas no frena a los filtros
+        self._bloqueos = {grupo: threading.RLock() for grupo in self.GRUPOS}
+
+    def asegurar(self, df, version, grupos=GRUPOS):
+        """Construye los índices si están atrasados respecto a la versión dada"""
+        for grupo in grupos:
+            with self._bloqueos[grupo]:
+                actual = self.versiones[grupo]
+                if actual is None or version > actual:
+                    self.construir(df, version, grupo)
+
+    def construir(self, df, version, grupo):
+        """Reconstruye un grupo de índices para esa versión de los datos"""
+        with self._bloqueos[grupo]:
+            if grupo == 'texto':
+                ids = df['ID'].to_numpy()
+                for col in self.COLUMNAS_TEXTO:
+                    indice = IndiceTrigramas()
+                    indice.construir(ids, df[col].to_numpy(dtype=object))
+                    self.trigramas[col] = indice
+            elif grupo == 'fechas':
+                ids = df['ID'].to_numpy()
+                for col, indice in self.fechas.items():
+                    indice.construir(ids, df[col].to_numpy(dtype='datetime64[ns]'))
+            else:
+                self.categorias.construir(df)
+            self.versiones[grupo] = version
+
+    def aplicar(self, version_previa, version, cambios):
+        """Aplica un cambio por fila a cada grupo que estaba al día; los demás se reconstruirán"""
+        for grupo, cambio in cambios.items():
+            with self._bloqueos[grupo]:
+                if self.versiones[grupo] != version_previa:
+                    continue
+                cambio()
+                self.versiones[grupo] = version
+
+    def insertar(self, version_previa, version, filas):
+        def texto():
+            for fila in filas:
+                for col, indice in self.trigramas.items():
+                    indice.agregar(fila['ID'], fila.get(col))
+
+        def fechas():
+            for col, indice in self.fechas.items():
+                for fila in filas:
+                    indice.cambiar([fila['ID']], dia_de_valor(fila.get(col)))
+        self.aplicar(version_previa, version,
+                     {'texto': texto, 'categorias': lambda: self.categorias.insertar(filas), 'fechas': fechas})
+
+    def actualizar(self, version_previa, version, ids, cambios):
+        def texto():
+            for col, indice in self.trigramas.items():
+                if col in cambios:
+                    for cliente_id in ids:
+                        indice.agregar(cliente_id, cambios[col])
+
+        def fechas():
+            for col, indice in self.fechas.items():
+                if col in cambios:
+                    indice.cambiar(ids, dia_de_valor(cambios[col]))
+        self.aplicar(version_previa, version,
+                     {'texto': texto, 'categorias': lambda: self.categorias.actualizar(ids, cambios),
+                      'fechas': fechas})
+
+    def eliminar(self, version_previa, version, ids):
+        def texto():
+            for indice in self.trigramas.values():
+                for cliente_id in ids:
+                    indice.quitar(cliente_id)
+
+        def fechas():
+            for indice in self.fechas.values():
+                indice.cambiar(ids, None)
+        self.aplicar(version_previa, version,
+                     {'texto': texto, 'categorias': lambda: self.categorias.eliminar(ids), 'fechas': fechas})
+
+    def buscar_texto(self, columna, valor):
+        """IDs cuya columna contiene el valor, sin distinguir mayúsculas ni acentos"""
+        with self._bloqueos['texto']:
+            return self.trigramas[columna].buscar(valor)
+
+    def filtrar(self, criterios):
+        """Posiciones en la caché de las filas que cumplen los criterios categóricos"""
+        with self._bloqueos['categorias']:
+            return self.categorias.posiciones(self.categorias.filtrar(criterios))
+
+    def contar(self, criterios):
+        """Número de filas que cumplen los criterios categóricos"""
+        with self._bloqueos['categorias']:
+            return self.categorias.filtrar(criterios).bit_count()
+
+    def rango_fechas(self, columna, desde, hasta):
+        """(IDs, días) de las filas con desde <= día < hasta en la columna de fecha, por día"""
+        with self._bloqueos['fechas']:
+            return self.fechas[columna].consultar(desde, hasta)
+
+    def contar_fechas(self, columna, desde, hasta):
+        """Número de filas con desde <= día < hasta en la columna de fecha"""
+        with self._bloqueos['fechas']:
+            return self.fechas[columna].contar(desde, hasta)
+
+    def buscar_categoria(self, columna, valor):
+        """Posiciones de las filas cuya columna categórica contiene el texto (en minúsculas)"""
+        with self._bloqueos['categorias']:
+            valores = self.categorias.valores_que_contienen(columna, valor)
+            return self.categorias.posiciones(self.categorias.filtrar({columna: valores}))
@@ -0,0 +1,122 @@
+"""Informe de clientes potenciales por línea de comandos, sin interfaz gráfica.
+
+Lee los datos una sola vez, calcula los agregados y genera el texto del
+INFORME ESTADÍSTICO, un resumen HTML y los gráficos en los formatos pedidos.
+Los gráficos se dibujan en paralelo en un grupo de procesos con el backend
+Agg, así que no hace falta pantalla. Uso:
+
+    python informe.py --salida informes --formatos png,svg,pdf
+"""
+
+import argparse
+import html
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from almacenamiento import abrir_origen
+from clientes import AlmacenClientes
+from estadisticas import informe_texto
+import graficos
+
+FORMATOS = ('png', 'svg', 'pdf')
+
+
+def renderizar(nombre, resumen, ruta, dpi):
+    """Tarea de un proceso del grupo: dibuja una figura y devuelve cuánto tardó"""
+    inicio = time.perf_counter()
+    graficos.exportar_figura(nombre, resumen, ruta, dpi)
+    return time.perf_counter() - inicio
+
+
+def escribir_html(ruta, texto, imagenes):
+    """Resumen HTML con el texto del informe y los gráficos generados"""
+    partes = ['<!DOCTYPE html>', '<html lang="es">', '<head>', '<meta charset="utf-8">',
+              '<title>Informe de clientes potenciales</title>', '</head>', '<body>',
+              f'<pre>{html.escape(texto)}</pre>']
+    for imagen in imagenes:
+        partes.append(f'<p><img src="{html.escape(imagen)}" alt="{html.escape(imagen)}"></p>')
+    partes += ['</body>', '</html>']
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write('\n'.join(partes) + '\n')
+
+
+def generar_informe(almacen, salida, formatos=FORMATOS, procesos=None, dpi=100):
+    """Genera todos los artefactos en `salida`; devuelve la duración de cada uno en segundos"""
+    tiempos = {}
+    os.makedirs(salida, exist_ok=True)
+
+    clientes = AlmacenClientes(almacen)
+    inicio = time.perf_counter()
+    clientes.leer()
+    tiempos['lectura'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resumen = clientes.resumen()
+    tiempos['agregados'] = time.perf_counter() - inicio
+    if not resumen.total:
+        raise ValueError("No hay datos para generar el informe.")
+
+    # Las figuras se lanzan primero para que el texto se escriba mientras se dibujan
+    with ProcessPoolExecutor(max_workers=procesos, initializer=graficos.aplicar_estilo) as grupo:
+        tareas = {}
+        for nombre in graficos.FIGURAS:
+            for formato in formatos:
+                archivo = f'{nombre}.{formato}'
+                tarea = grupo.submit(renderizar, nombre, resumen, os.path.join(salida, archivo), dpi)
+                tareas[tarea] = archivo
+
+        inicio = time.perf_counter()
+        texto = informe_texto(resumen)
+        with open(os.path.join(salida, 'informe.txt'), 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+        tiempos['informe.txt'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        # En el HTML se prefiere SVG (escala sin perder calidad) y si no, PNG
+        formato_web = next((f for f in ('svg', 'png') if f in formatos), None)
+        imagenes = [f'{nombre}.{formato_web}' for nombre in graficos.FIGURAS] if formato_web else []
+        escribir_html(os.path.join(salida, 'informe.html'), texto, imagenes)
+        tiempos['informe.html'] = time.perf_counter() - inicio
+
+        for tarea in as_completed(tareas):
+            tiempos[tareas[tarea]] = tarea.result()
+
+    return tiempos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera el informe estadístico y los gráficos de clientes")
+    parser.add_argument('--archivo', help="Libro .xlsx o base .db (por defecto, el de la aplicación)")
+    parser.add_argument('--salida', default='informe', help="Carpeta de salida (por defecto: informe)")
+    parser.add_argument('--formatos', default=','.join(FORMATOS),
+                        help="Formatos de los gráficos separados por comas: png, svg, pdf")
+    parser.add_argument('--procesos', type=int, default=None,
+                        help="Procesos para dibujar los gráficos (por defecto, uno por CPU)")
+    parser.add_argument('--dpi', type=int, default=100, help="Resolución de los gráficos PNG")
+    args = parser.parse_args(argv)
+
+    formatos = [f.strip().lower() for f in args.formatos.split(',') if f.strip()]
+    invalidos = [f for f in formatos if f not in FORMATOS]
+    if invalidos:
+        parser.error(f"Formatos no soportados: {', '.join(invalidos)}")
+
+    inicio = time.perf_counter()
+    try:
+        almacen = abrir_origen(args.archivo)
+        tiempos = generar_informe(almacen, args.salida, formatos, args.procesos, args.dpi)
+    except Exception as e:
+        print(f"Error al generar el informe: {e}")
+        return 1
+    total = time.perf_counter() - inicio
+
+    print(f"Informe generado en {args.salida} ({almacen.nombre})")
+    for artefacto, segundos in tiempos.items():
+        print(f"   {artefacto:<20} {segundos * 1000:8.0f} ms")
+    print(f"   {'total':<20} {total * 1000:8.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
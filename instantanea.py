@@ -0,0 +1,147 @@
+"""Instantánea binaria de un DataFrame, sin pickle.
+
+El libro Excel puede estar en una carpeta compartida, y la instantánea que
+lo acompaña también: cargarla no debe poder ejecutar código. Por eso se
+guarda como un archivo .npz sin comprimir (un .npy por arreglo) con una
+cabecera JSON de tipos y categorías, y se lee con
+`np.load(..., allow_pickle=False)`:
+
+- números, booleanos y fechas datetime64: el arreglo tal cual;
+- categóricas: los códigos, con las categorías en la cabecera;
+- texto (solo cadenas y vacíos): los valores distintos en UTF-8,
+  separados por un carácter que no aparece en la columna, y el código de
+  cada fila (-1 los vacíos);
+- columnas mezcladas (p. ej. números y texto leídos del Excel), o de texto
+  que contiene todos los separadores: los valores en JSON, con las fechas
+  marcadas.
+
+Los vacíos de las columnas de objetos vuelven como None o NaN, según lo
+que tenía la columna (el Excel da NaN; las columnas agregadas, None).
+"""
+
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+
+# Cambia si cambia la forma de guardar; una instantánea de otro formato no se usa
+FORMATO = 1
+
+# Separadores posibles entre los valores de texto, el primero que no aparezca
+SEPARADORES = ['\x1f', '\x00', '\ue000', '\uffff']
+
+
+def valor_json(valor):
+    """Valor de una columna mezclada como JSON; las fechas como {'fecha': ISO}"""
+    if valor is None:
+        return None
+    if isinstance(valor, (datetime.date, np.datetime64)):
+        fecha = pd.Timestamp(valor)
+        return None if pd.isna(fecha) else {'fecha': fecha.isoformat()}
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and valor != valor:
+        return None
+    if not isinstance(valor, (str, int, float, bool)):
+        return str(valor)
+    return valor
+
+
+def valor_de_json(valor):
+    if isinstance(valor, dict):
+        return pd.Timestamp(valor['fecha'])
+    return valor
+
+
+def solo_texto(valores):
+    """Indica si los valores son todos cadenas o vacíos"""
+    return all(isinstance(valor, str) or valor is None or (isinstance(valor, float) and valor != valor)
+               for valor in valores)
+
+
+def codificar_columna(serie, clave, arreglos):
+    """Agrega a `arreglos` los de la columna y devuelve su descripción para la cabecera"""
+    dtype = serie.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        arreglos[clave] = serie.cat.codes.to_numpy()
+        return {'tipo': 'categoria', 'ordenada': bool(dtype.ordered),
+                'categorias': [valor_json(valor) for valor in dtype.categories]}
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufM':
+        arreglos[clave] = serie.to_numpy()
+        return {'tipo': 'numpy'}
+    valores = serie.to_numpy(dtype=object)
+    vacios = np.flatnonzero(pd.isna(valores))
+    nulo = 'None' if len(vacios) and valores[vacios[0]] is None else 'NaN'
+    if solo_texto(valores):
+        codigos, unicos = pd.factorize(valores)
+        juntos = ''.join(unicos)
+        separador = next((sep for sep in SEPARADORES if sep not in juntos), None)
+        if separador is not None:
+            arreglos[clave] = np.frombuffer(separador.join(unicos).encode('utf-8'), dtype=np.uint8)
+            arreglos[clave + '.codigos'] = codigos
+            return {'tipo': 'texto', 'separador': separador, 'distintos': len(unicos), 'nulo': nulo,
+                    'dtype': str(dtype)}
+    datos = json.dumps([valor_json(valor) for valor in valores], ensure_ascii=False)
+    arreglos[clave] = np.frombuffer(datos.encode('utf-8'), dtype=np.uint8)
+    return {'tipo': 'json', 'nulo': nulo, 'dtype': str(dtype)}
+
+
+def decodificar_columna(descripcion, clave, datos):
+    tipo = descripcion['tipo']
+    if tipo == 'numpy':
+        return datos[clave]
+    if tipo == 'categoria':
+        categorias = pd.Index([valor_de_json(valor) for valor in descripcion['categorias']])
+        return pd.Categorical.from_codes(datos[clave], categories=categorias, ordered=descripcion['ordenada'])
+    nulo = None if descripcion.get('nulo') == 'None' else np.nan
+    if tipo == 'texto':
+        # Los distintos y, al final, el vacío para el código -1
+        unicos = np.empty(descripcion['distintos'] + 1, dtype=object)
+        if descripcion['distintos']:
+            unicos[:-1] = datos[clave].tobytes().decode('utf-8').split(descripcion['separador'])
+        unicos[-1] = nulo
+        valores = unicos.take(datos[clave + '.codigos'])
+    elif tipo == 'json':
+        lista = [nulo if valor is None else valor_de_json(valor)
+                 for valor in json.loads(datos[clave].tobytes().decode('utf-8'))]
+        valores = np.empty(len(lista), dtype=object)
+        valores[:] = lista
+    else:
+        raise ValueError(f"Tipo de columna desconocido en la instantánea: {tipo!r}")
+    serie = pd.Series(valores, dtype=object)
+    if descripcion['dtype'] != 'object':
+        try:
+            serie = serie.astype(descripcion['dtype'])
+        except (TypeError, ValueError):
+            pass
+    return serie
+
+
+def escribir(df, ruta):
+    """Guarda el DataFrame (con índice 0..n-1) en la ruta"""
+    arreglos = {}
+    columnas = []
+    for i, col in enumerate(df.columns):
+        clave = f'c{i}'
+        columnas.append({'nombre': col, **codificar_columna(df[col], clave, arreglos)})
+    cabecera = json.dumps({'formato': FORMATO, 'filas': len(df), 'columnas': columnas}, ensure_ascii=False)
+    arreglos['cabecera'] = np.frombuffer(cabecera.encode('utf-8'), dtype=np.uint8)
+    # Con un archivo abierto, np.savez no agrega la extensión .npz a la ruta
+    with open(ruta, 'wb') as f:
+        np.savez(f, **arreglos)
+
+
+def leer(ruta):
+    """Carga una instantánea; ValueError si no es del formato esperado"""
+    with np.load(ruta, allow_pickle=False) as datos:
+        cabecera = json.loads(datos['cabecera'].tobytes().decode('utf-8'))
+        if cabecera.get('formato') != FORMATO:
+            raise ValueError(f"formato de instantánea {cabecera.get('formato')!r}")
+        columnas = {}
+        for i, descripcion in enumerate(cabecera['columnas']):
+            columna = decodificar_columna(descripcion, f'c{i}', datos)
+            if len(columna) != cabecera['filas']:
+                raise ValueError(f"la columna {descripcion['nombre']} no tiene {cabecera['filas']} filas")
+            columnas[descripcion['nombre']] = columna
+    return pd.DataFrame(columnas, index=pd.RangeIndex(cabecera['filas']))
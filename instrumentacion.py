@@ -0,0 +1,279 @@
+"""Medición de la interfaz: duración de cada operación, por fases, con percentiles.
+
+Cada manejador de la interfaz (botones, búsqueda, formularios, filtros,
+pestañas de gráficos...) se mide como una *operación* con el decorador
+`medido`. Dentro, `fase` reparte el tiempo entre la lectura de disco
+('lectura'), las consultas con pandas y los índices ('consulta'), el
+pintado en Tk ('tk') y la escritura ('escritura'); las fases anidadas
+cuentan solo su propio tiempo y lo que no cae en ninguna queda como
+'otros'. El tiempo dentro de `pausa` (diálogos que esperan al usuario) no
+se cuenta. Lo que corre en otros hilos (la búsqueda, el dibujo de los
+gráficos, el hilo de E/S) se anota ya medido con `registrar`.
+
+De cada operación y fase se guardan las últimas VENTANA duraciones para
+dar p50/p95/p99. Las operaciones que superan el umbral se escriben en la
+consola y quedan en `lentas`. Opcionalmente se captura un perfil de
+cProfile de cada operación del hilo principal (se guarda el de las lentas)
+y el pico de memoria asignada durante ella (tracemalloc). `volcar`
+escribe todo en JSON.
+"""
+
+import cProfile
+import datetime
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+FASES = ('lectura', 'consulta', 'tk', 'escritura')
+# Duraciones que se guardan por operación y por fase para los percentiles
+VENTANA = 1000
+# Operaciones más lentas que esto se informan, en segundos
+UMBRAL_LENTO = 0.25
+# Operaciones lentas que se conservan y líneas del perfil de cada una
+LENTAS = 100
+LINEAS_PERFIL = 25
+PERCENTILES = (50, 95, 99)
+
+
+class Ventana:
+    """Últimas duraciones de una operación o fase, para sus percentiles"""
+
+    def __init__(self, tamano=VENTANA):
+        self.valores = deque(maxlen=tamano)
+        self.cantidad = 0
+        self.maximo = 0.0
+
+    def agregar(self, valor):
+        self.valores.append(valor)
+        self.cantidad += 1
+        self.maximo = max(self.maximo, valor)
+
+    def resumen(self):
+        """Cantidad, percentiles y media de la ventana y máximo desde el inicio"""
+        valores = np.fromiter(self.valores, dtype=float, count=len(self.valores))
+        resumen = {'cantidad': self.cantidad, 'maximo': self.maximo,
+                   'media': float(valores.mean()) if len(valores) else 0.0}
+        for percentil, valor in zip(PERCENTILES, np.percentile(valores, PERCENTILES) if len(valores)
+                                    else [0.0] * len(PERCENTILES)):
+            resumen[f'p{percentil}'] = float(valor)
+        return resumen
+
+
+class Medidor:
+    """Tiempos de las operaciones de la interfaz; seguro entre hilos.
+
+    Una operación anidada en otra (un manejador que llama a otro) cuenta
+    como parte de la exterior.
+    """
+
+    def __init__(self, umbral=UMBRAL_LENTO, ventana=VENTANA):
+        self.umbral = umbral
+        self.ventana = ventana
+        self.perfilar = False
+        self.operaciones = {}
+        self.lentas = deque(maxlen=LENTAS)
+        self._memoria = False
+        self._memoria_propia = False
+        self._bloqueo = threading.Lock()
+        self._local = threading.local()
+
+    # --- Configuración ---------------------------------------------------
+
+    @property
+    def memoria(self):
+        """Si se mide el pico de memoria de cada operación (tracemalloc, hace todo más lento)"""
+        return self._memoria
+
+    @memoria.setter
+    def memoria(self, activar):
+        if activar and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._memoria_propia = True
+        elif not activar and self._memoria_propia:
+            tracemalloc.stop()
+            self._memoria_propia = False
+        self._memoria = bool(activar)
+
+    def reiniciar(self):
+        """Descarta lo medido hasta ahora"""
+        with self._bloqueo:
+            self.operaciones = {}
+            self.lentas.clear()
+
+    # --- Medición --------------------------------------------------------
+
+    def en_curso(self):
+        """Operación en curso en este hilo, o None"""
+        return getattr(self._local, 'operacion', None)
+
+    @contextmanager
+    def operacion(self, nombre):
+        """Mide el bloque como una operación"""
+        if self.en_curso() is not None:
+            yield
+            return
+
+        # La fase activa ('otros' fuera de toda fase) y desde cuándo se le suma tiempo
+        actual = {'nombre': nombre, 'fases': defaultdict(float), 'pila': ['otros'],
+                  'marca': time.perf_counter()}
+        self._local.operacion = actual
+        perfil = None
+        if self.perfilar and threading.current_thread() is threading.main_thread():
+            perfil = cProfile.Profile()
+        memoria = self._memoria and tracemalloc.is_tracing()
+        if memoria:
+            tracemalloc.reset_peak()
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+        inicio = actual['marca']
+        if perfil is not None:
+            perfil.enable()
+        try:
+            yield
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            fin = time.perf_counter()
+            actual['fases'][actual['pila'][-1]] += fin - actual['marca']
+            self._local.operacion = None
+            detalle = {}
+            if memoria:
+                detalle['memoria_pico'] = max(0, tracemalloc.get_traced_memory()[1] - memoria_inicial)
+            fases = dict(actual['fases'])
+            pausado = fases.pop('pausa', 0.0)
+            self.anotar(nombre, fin - inicio - pausado, fases, detalle, perfil)
+
+    @contextmanager
+    def fase(self, nombre):
+        """Atribuye el tiempo del bloque a una fase de la operación en curso (si hay una)"""
+        actual = self.en_curso()
+        if actual is None:
+            yield
+            return
+        ahora = time.perf_counter()
+        actual['fases'][actual['pila'][-1]] += ahora - actual['marca']
+        actual['pila'].append(nombre)
+        actual['marca'] = ahora
+        try:
+            yield
+        finally:
+            ahora = time.perf_counter()
+            actual['fases'][actual['pila'].pop()] += ahora - actual['marca']
+            actual['marca'] = ahora
+
+    def pausa(self):
+        """Bloque que no cuenta en la duración de la operación (p. ej. un diálogo)"""
+        return self.fase('pausa')
+
+    def registrar(self, nombre, segundos, fases=None):
+        """Anota una operación medida en otro hilo; el tiempo fuera de `fases` queda como 'otros'"""
+        fases = dict(fases or {})
+        fases['otros'] = max(0.0, segundos - sum(fases.values()))
+        self.anotar(nombre, segundos, fases)
+
+    def anotar(self, nombre, segundos, fases, detalle=None, perfil=None):
+        with self._bloqueo:
+            medidas = self.operaciones.get(nombre)
+            if medidas is None:
+                medidas = {'total': Ventana(self.ventana), 'fases': {}}
+                self.operaciones[nombre] = medidas
+            medidas['total'].agregar(segundos)
+            for fase, duracion in fases.items():
+                if fase not in medidas['fases']:
+                    medidas['fases'][fase] = Ventana(self.ventana)
+                medidas['fases'][fase].agregar(duracion)
+            if detalle and 'memoria_pico' in detalle:
+                medidas.setdefault('memoria_pico', Ventana(self.ventana)).agregar(detalle['memoria_pico'])
+            if segundos < self.umbral:
+                return
+            lenta = {'operacion': nombre, 'hora': datetime.datetime.now().isoformat(timespec='seconds'),
+                     'segundos': segundos, 'fases': {fase: d for fase, d in fases.items() if d >= 0.0005}}
+            lenta.update(detalle or {})
+            if perfil is not None:
+                lenta['perfil'] = texto_perfil(perfil)
+            self.lentas.append(lenta)
+        print(f"Operación lenta: {texto_lenta(lenta)}")
+
+    # --- Resultados ------------------------------------------------------
+
+    def resumen(self):
+        """Operación -> percentiles de la duración total y de cada fase (y del pico de memoria)"""
+        with self._bloqueo:
+            resumen = {}
+            for nombre, medidas in sorted(self.operaciones.items()):
+                datos = medidas['total'].resumen()
+                datos['fases'] = {fase: ventana.resumen() for fase, ventana in medidas['fases'].items()}
+                if 'memoria_pico' in medidas:
+                    datos['memoria_pico'] = medidas['memoria_pico'].resumen()
+                resumen[nombre] = datos
+            return resumen
+
+    def volcar(self, ruta):
+        """Escribe en JSON la configuración, el resumen y las operaciones lentas"""
+        with self._bloqueo:
+            lentas = list(self.lentas)
+        datos = {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'umbral': self.umbral, 'perfilar': self.perfilar, 'memoria': self._memoria,
+            'operaciones': self.resumen(),
+            'lentas': lentas,
+        }
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(datos, archivo, ensure_ascii=False, indent=2)
+
+
+def texto_perfil(perfil, lineas=LINEAS_PERFIL):
+    """Las funciones con más tiempo acumulado del perfil, como texto"""
+    salida = io.StringIO()
+    pstats.Stats(perfil, stream=salida).sort_stats('cumulative').print_stats(lineas)
+    return salida.getvalue()
+
+
+def texto_lenta(lenta):
+    """Una operación lenta en una línea: duración y fases"""
+    fases = ', '.join(f"{fase} {segundos * 1000:.0f}" for fase, segundos in
+                      sorted(lenta['fases'].items(), key=lambda f: -f[1]))
+    texto = f"{lenta['operacion']} {lenta['segundos'] * 1000:.0f} ms ({fases})"
+    if 'memoria_pico' in lenta:
+        texto += f", pico de memoria {lenta['memoria_pico'] / 2**20:.1f} MB"
+    return texto
+
+
+# Medidor de la aplicación, compartido por la interfaz y la tabla
+medidor = Medidor()
+
+
+def medido(nombre=None):
+    """Decorador: cada llamada es una operación de `medidor` (por defecto, con el nombre de la función)"""
+    def decorar(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medidor.operacion(nombre or funcion.__name__):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorar
+
+
+class DialogosSinMedir:
+    """Módulo de diálogos (messagebox, filedialog) cuyas llamadas no cuentan en la operación en curso"""
+
+    def __init__(self, modulo):
+        self._modulo = modulo
+
+    def __getattr__(self, nombre):
+        funcion = getattr(self._modulo, nombre)
+        if not callable(funcion):
+            return funcion
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medidor.pausa():
+                return funcion(*args, **kwargs)
+        return envoltura
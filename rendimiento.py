@@ -0,0 +1,535 @@
+"""Pruebas de rendimiento del gestor de clientes sobre datos sintéticos.
+
+Genera conjuntos de clientes realistas y reproducibles (la misma semilla da
+los mismos datos) de 1.000 a 1.000.000 de filas y mide, para cada tamaño,
+los caminos de la aplicación que crecen con los datos:
+
+- leer_clientes y guardar_clientes con SQLite y con Excel (el libro solo
+  hasta LIMITE_EXCEL filas: más allá openpyxl tarda minutos), y el alta, la
+  modificación y la baja de un cliente tal como las hace la ventana;
+- la construcción de los índices y de los agregados;
+- buscar_cliente sobre columnas con trigramas, con mapas de bits y sin
+  índice; aplicar_filtro_rapido; ejecutar_busqueda_avanzada;
+  actualizar_estadisticas_rapidas;
+- el llenado de la tabla (mostrar, ordenar por un encabezado, pasar
+  páginas), con Tk si hay pantalla y si no con un Treeview sin pantalla;
+- cada gráfico de graficos.FIGURAS, armado y dibujado como PNG.
+
+De cada caso se guardan el mínimo y la mediana de varias repeticiones. El
+resultado se escribe en JSON y con --base se compara con uno anterior: un
+caso es una regresión si su mínimo creció más que la tolerancia y más de
+MARGEN_REGRESION segundos (para no marcar el ruido de los casos de
+milisegundos); si hay alguna, el programa termina con código 1. Uso:
+
+    python rendimiento.py --tamanos 1000,10000 --salida base.json
+    python rendimiento.py --tamanos 1000,10000 --base base.json
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import (COLUMNAS_CLIENTES, OPCIONES_CAMPOS, AlmacenamientoExcel, AlmacenamientoSQLite,
+                            asignar_valor)
+from clientes import AlmacenClientes, periodos_agenda
+from esquema import concatenar
+from estadisticas import AgregadosClientes
+from Gestor_Clientes import GestorClientesApp
+from indices import IndicesClientes
+import tabla_virtual
+
+TAMANOS = (1_000, 10_000, 100_000, 1_000_000)
+SEMILLA = 2024
+# Las fechas se generan alrededor de este día para que los datos no dependan de cuándo se corre
+FECHA_REFERENCIA = datetime.date(2025, 1, 15)
+LIMITE_EXCEL = 10_000
+REPETICIONES = 3
+TOLERANCIA = 0.25
+MARGEN_REGRESION = 0.005
+
+PREFIJOS = ['Comercial', 'Distribuidora', 'Inversiones', 'Servicios', 'Grupo', 'Industrias', 'Soluciones',
+            'Talleres', 'Ferretería', 'Panadería', 'Restaurante', 'Clínica', 'Consultores', 'Transportes',
+            'Almacén', 'Agencia', 'Laboratorio', 'Constructora', 'Papelería', 'Droguería']
+NUCLEOS = ['Andina', 'del Valle', 'El Roble', 'La Esperanza', 'San José', 'Santa Fe', 'Los Álamos',
+           'Horizonte', 'Pacífico', 'Caribe', 'Central', 'Nueva Era', 'del Norte', 'El Progreso',
+           'La Montaña', 'Río Claro', 'Sol Naciente', 'Aurora', 'Bellavista', 'Continental', 'Integral',
+           'Express', 'Premium', 'Global', 'Unidos', 'Familiar', 'Moderna', 'El Dorado', 'La Estrella',
+           'Vértice']
+APELLIDOS = ['', '', '', ' Gómez', ' Rodríguez', ' Martínez', ' López', ' García', ' Pérez', ' Hernández',
+             ' Ramírez', ' Torres', ' Díaz', ' Castillo', ' Vargas', ' Moreno', ' Rojas', ' Jiménez',
+             ' Ortiz', ' Suárez']
+SUFIJOS = ['', '', '', ' S.A.S', ' SAS', ' Ltda', ' S.A.', ' & Cía']
+SECTORES = ['Comercio', 'Restaurantes', 'Salud', 'Construcción', 'Educación', 'Tecnología', 'Transporte',
+            'Turismo', 'Belleza', 'Manufactura', 'Agricultura', 'Inmobiliaria', 'Servicios profesionales',
+            'Automotriz', 'Alimentos', 'Moda', 'Ferretería', 'Logística', 'Finanzas', 'Entretenimiento']
+LOCALIDADES = ['Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Cartagena', 'Bucaramanga', 'Pereira',
+               'Manizales', 'Santa Marta', 'Cúcuta', 'Ibagué', 'Villavicencio', 'Pasto', 'Montería', 'Neiva',
+               'Armenia', 'Popayán', 'Sincelejo', 'Valledupar', 'Tunja', 'Riohacha', 'Quibdó', 'Florencia',
+               'Yopal', 'Soacha', 'Envigado', 'Bello', 'Itagüí', 'Palmira', 'Tuluá']
+DOMINIOS = ['gmail.com', 'hotmail.com', 'outlook.com', 'yahoo.es', 'empresa.com.co', 'negocio.co']
+OBSERVACIONES = ['Pide precios por correo', 'Llamar después de las 3 pm', 'Interesado en tienda en línea',
+                 'Ya tiene proveedor, revisar en 6 meses', 'Quiere renovar su página', 'Solo redes sociales',
+                 'Dejar mensaje con la recepción', 'Presupuesto limitado', 'Referido por otro cliente',
+                 'Pidió una demostración']
+
+
+# --- Datos sintéticos -------------------------------------------------------
+
+def pesos_zipf(cantidad):
+    """Pesos decrecientes (1, 1/2, 1/3...): unos pocos valores concentran la mayoría de las filas"""
+    return 1 / np.arange(1, cantidad + 1)
+
+
+def generar_clientes(filas, semilla=SEMILLA, referencia=FECHA_REFERENCIA):
+    """DataFrame de clientes en texto, como lo guardan los archivos.
+
+    Nombres con variantes de escritura y un 2 % de casi duplicados (mismo
+    teléfono, nombre en otras mayúsculas), sectores y localidades con
+    frecuencias desiguales, campos de lista coherentes entre sí (los
+    clientes tienen Es_Cliente = SI, el envío de propuesta tiene su fecha) y
+    campos vacíos en las proporciones habituales.
+    """
+    rng = np.random.default_rng(semilla)
+
+    def elegir(valores, pesos=None):
+        probabilidades = None if pesos is None else np.asarray(pesos, dtype=float) / np.sum(pesos)
+        return np.asarray(valores, dtype=object)[rng.choice(len(valores), size=filas, p=probabilidades)]
+
+    def vaciar(valores, proporcion):
+        valores[rng.random(filas) < proporcion] = None
+        return valores
+
+    def fechas(desde, hasta):
+        dias = rng.integers(desde, hasta + 1, size=filas).astype('timedelta64[D]')
+        return (np.datetime64(referencia, 'D') + dias).astype(str).astype(object)
+
+    nombres = elegir(PREFIJOS) + ' ' + elegir(NUCLEOS) + elegir(APELLIDOS) + elegir(SUFIJOS)
+    telefonos = rng.integers(3_000_000_000, 3_210_000_000, size=filas).astype(str).astype(object)
+    con_prefijo = rng.random(filas) < 0.3
+    telefonos[con_prefijo] = [f'+57 {t[:3]} {t[3:6]} {t[6:]}' for t in telefonos[con_prefijo]]
+    # Casi duplicados de clientes anteriores
+    copias = np.flatnonzero(rng.random(filas) < 0.02)
+    originales = (rng.random(len(copias)) * copias).astype(np.int64)
+    nombres[copias] = [nombre.upper() if i % 2 else nombre.lower()
+                       for i, nombre in enumerate(nombres[originales])]
+    telefonos[copias] = telefonos[originales]
+    vaciar(telefonos, 0.05)
+
+    ids = np.arange(1, filas + 1, dtype=np.int64)
+    correos = np.array([f'contacto{i}@{dominio}' for i, dominio in zip(ids.tolist(), elegir(DOMINIOS))],
+                       dtype=object)
+    vaciar(correos, 0.2)
+
+    estados = elegir(OPCIONES_CAMPOS['Estado_Contacto'], [35, 25, 20, 12, 8])
+    por_contactar = estados == 'Por contactar'
+    es_cliente = np.where((estados == 'Cliente') | (rng.random(filas) < 0.03), 'SI', 'NO').astype(object)
+    solicito = np.where(rng.random(filas) < 0.2, 'SI', 'NO').astype(object)
+    envio = np.where((solicito == 'SI') & (rng.random(filas) < 0.7) | (rng.random(filas) < 0.05),
+                     'SI', 'NO').astype(object)
+
+    fecha_contacto = fechas(-730, 0)
+    fecha_contacto[por_contactar & (rng.random(filas) < 0.8)] = None
+    fecha_envio = fechas(-365, 0)
+    fecha_envio[envio == 'NO'] = None
+
+    return pd.DataFrame({
+        'ID': ids,
+        'Nombre_Empresa': nombres,
+        'Sector': elegir(SECTORES, pesos_zipf(len(SECTORES))),
+        'Localidad': elegir(LOCALIDADES, pesos_zipf(len(LOCALIDADES))),
+        'Telefono': telefonos,
+        'Correo_Electronico': correos,
+        'Estado_Contacto': estados,
+        'Fecha_Contacto': fecha_contacto,
+        'Observaciones': vaciar(elegir(OBSERVACIONES), 0.4),
+        'Sitio_Web_Actual': elegir(OPCIONES_CAMPOS['Sitio_Web_Actual'], [55, 45]),
+        'Interes': elegir(OPCIONES_CAMPOS['Interes'], [30, 25, 25, 20]),
+        'Fecha_Proximo_Contacto': vaciar(fechas(-60, 60), 0.35),
+        'Es_Cliente': es_cliente,
+        'Solicito_Propuesta': solicito,
+        'Se_Le_Envio_Propuesta': envio,
+        'Fecha_Envio_Propuesta': fecha_envio,
+    }, columns=COLUMNAS_CLIENTES)
+
+
+# --- Tabla sin pantalla -----------------------------------------------------
+
+class WidgetSinPantalla:
+    """Lo que TablaVirtual usa de un widget de ttk, sin hacer nada"""
+
+    def __init__(self, *args, **opciones):
+        pass
+
+    def pack(self, **opciones):
+        pass
+
+    def bind(self, evento, funcion):
+        pass
+
+    def config(self, **opciones):
+        pass
+
+    def set(self, *args):
+        pass
+
+    def xview(self, *args):
+        pass
+
+
+class TreeviewSinPantalla(WidgetSinPantalla):
+    """ttk.Treeview sin Tk: guarda los valores de los ítems en un diccionario.
+
+    Los valores se pasan a texto como lo haría Tk, así que mide lo que hace
+    TablaVirtual (leer las filas, calcular colores, actualizar ítems) sin el
+    costo de Tcl ni del dibujado.
+    """
+
+    def __init__(self, *args, **opciones):
+        self.items = {}
+        self.seleccion = []
+        self.etiquetas = {}
+        self._siguiente = 0
+
+    def heading(self, columna, **opciones):
+        pass
+
+    def column(self, columna, **opciones):
+        pass
+
+    def insert(self, padre, posicion, **opciones):
+        self._siguiente += 1
+        item = f'I{self._siguiente:03X}'
+        self.items[item] = {}
+        self.item(item, **opciones)
+        return item
+
+    def item(self, item, **opciones):
+        if 'values' in opciones:
+            opciones['values'] = tuple(str(valor) for valor in opciones['values'])
+        self.items[item].update(opciones)
+        return self.items[item]
+
+    def delete(self, item):
+        del self.items[item]
+
+    def selection_set(self, items):
+        self.seleccion = list(items)
+
+    def tag_configure(self, etiqueta, **opciones):
+        self.etiquetas[etiqueta] = opciones
+
+    def bbox(self, item):
+        return (0, tabla_virtual.TablaVirtual.ALTO_FILA + 5, 0, tabla_virtual.TablaVirtual.ALTO_FILA)
+
+    def winfo_height(self):
+        return (tabla_virtual.TablaVirtual.ALTO_FILA + 5) * 30
+
+
+@contextmanager
+def contenedor_tabla(sin_pantalla=False):
+    """(padre, modo) donde crear la tabla: una ventana de Tk oculta si hay pantalla, o el Treeview sin Tk"""
+    if not sin_pantalla:
+        try:
+            raiz = tabla_virtual.tk.Tk()
+        except tabla_virtual.tk.TclError:
+            raiz = None
+        if raiz is not None:
+            raiz.withdraw()
+            try:
+                yield raiz, 'tk'
+            finally:
+                raiz.destroy()
+            return
+
+    original = tabla_virtual.ttk
+    tabla_virtual.ttk = SimpleNamespace(Treeview=TreeviewSinPantalla, Scrollbar=WidgetSinPantalla)
+    try:
+        yield None, 'sin pantalla'
+    finally:
+        tabla_virtual.ttk = original
+
+
+# --- Medición ---------------------------------------------------------------
+
+class Banco:
+    """Mide los casos de un tamaño y acumula sus tiempos (caso -> {'min', 'mediana'} en segundos)"""
+
+    def __init__(self, repeticiones=REPETICIONES, casos=None):
+        self.repeticiones = repeticiones
+        self.casos = casos
+        self.resultados = {}
+
+    def incluido(self, nombre):
+        return not self.casos or any(nombre.startswith(caso) for caso in self.casos)
+
+    def medir(self, nombre, funcion, preparar=None):
+        """Cronometra `funcion` varias veces; `preparar` se corre antes de cada una, fuera del tiempo"""
+        if not self.incluido(nombre):
+            return
+        tiempos = []
+        for _ in range(self.repeticiones):
+            if preparar is not None:
+                preparar()
+            gc.collect()
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        self.resultados[nombre] = {'min': min(tiempos), 'mediana': statistics.median(tiempos)}
+        print(f"   {nombre:<48} {min(tiempos) * 1000:10.1f} ms")
+
+    def omitir(self, nombre, motivo):
+        if self.incluido(nombre):
+            print(f"   {nombre:<48} {'omitido':>13} ({motivo})")
+
+
+def estadisticas_rapidas(clientes):
+    """Lo que calcula actualizar_estadisticas_rapidas, sin las etiquetas"""
+    resumen = clientes.resumen()
+    return {
+        'total_clientes': resumen.total,
+        'sin_web': resumen.conteo('Sitio_Web_Actual', 'No tiene'),
+        'interes_alto': resumen.conteo('Interes', 'Alto'),
+        'es_cliente': resumen.conteo('Es_Cliente', 'SI'),
+        'propuestas_env': resumen.conteo('Se_Le_Envio_Propuesta', 'SI'),
+        'vencidos': clientes.contar_agenda(*periodos_agenda(FECHA_REFERENCIA)['vencidos']),
+    }
+
+
+def preparar_consultas(clientes):
+    """Índices, agregados y detector de duplicados al día, como tras preparar_indices"""
+    df = clientes.leer()
+    clientes.indices.asegurar(df, clientes.version)
+    clientes.agregados.asegurar(df, clientes.version)
+    clientes.duplicados.asegurar(df, clientes.version)
+
+
+def medir_escrituras(banco, clientes, motor, rng):
+    """Alta, modificación y baja de un cliente, como guardar_nuevo_cliente, actualizar_cliente_existente
+    y eliminar_cliente (sin los diálogos)"""
+    def preparar():
+        preparar_consultas(clientes)
+
+    def insertar():
+        df = clientes.leer()
+        datos = {'Nombre_Empresa': 'Panadería La Espiga', 'Sector': 'Alimentos', 'Localidad': 'Cali',
+                 'Telefono': '3104567890', 'Estado_Contacto': 'Por contactar', 'Interes': 'Medio',
+                 'ID': clientes.nuevos_ids()[0], 'Fecha_Contacto': FECHA_REFERENCIA.isoformat()}
+        clientes.posibles_duplicados(datos)
+        clientes.insertar(concatenar(df, pd.DataFrame([datos])), [datos])
+
+    def actualizar():
+        df = clientes.leer().copy()
+        cliente_id = int(rng.choice(df['ID'].to_numpy()))
+        datos = {'Estado_Contacto': 'En seguimiento', 'Interes': 'Alto', 'Fecha_Proximo_Contacto': '2025-02-03'}
+        for campo, valor in datos.items():
+            asignar_valor(df, df['ID'] == cliente_id, campo, valor)
+        clientes.actualizar(df, [cliente_id], datos)
+
+    def eliminar():
+        df = clientes.leer()
+        seleccion = [int(rng.choice(df['ID'].to_numpy()))]
+        clientes.eliminar(df[~df['ID'].isin(seleccion)], seleccion)
+
+    banco.medir(f'insertar_clientes[{motor}]', insertar, preparar)
+    banco.medir(f'actualizar_clientes[{motor}]', actualizar, preparar)
+    banco.medir(f'eliminar_clientes[{motor}]', eliminar, preparar)
+
+
+def medir_tamano(filas, directorio, banco, semilla=SEMILLA, limite_excel=LIMITE_EXCEL, sin_pantalla=False):
+    """Corre todos los casos sobre un conjunto de `filas` clientes; devuelve el modo de la tabla"""
+    rng = np.random.default_rng(semilla)
+    inicio = time.perf_counter()
+    datos = generar_clientes(filas, semilla)
+    print(f"{filas:,} clientes generados en {time.perf_counter() - inicio:.1f} s")
+
+    # --- Almacenamiento ---
+    almacen = AlmacenamientoSQLite(os.path.join(directorio, f'clientes_{filas}.db'), COLUMNAS_CLIENTES)
+    almacen.inicializar()
+    almacen.guardar(datos)
+    clientes = AlmacenClientes(almacen)
+    banco.medir('leer_clientes[sqlite]', lambda: AlmacenClientes(almacen).leer())
+    df = clientes.leer()
+    banco.medir('guardar_clientes[sqlite]', lambda: clientes.guardar(df))
+    medir_escrituras(banco, clientes, 'sqlite', rng)
+
+    casos_excel = [f'{caso}[excel]' for caso in ('guardar_clientes', 'leer_clientes', 'insertar_clientes',
+                                                  'actualizar_clientes', 'eliminar_clientes')]
+    casos_excel.append('leer_clientes[xlsx]')
+    if not any(banco.incluido(caso) for caso in casos_excel):
+        pass
+    elif filas <= limite_excel:
+        libro = AlmacenamientoExcel(os.path.join(directorio, f'clientes_{filas}.xlsx'), COLUMNAS_CLIENTES,
+                                    intervalo_compactacion=0)
+        excel = AlmacenClientes(libro)
+        if not banco.incluido('guardar_clientes[excel]'):
+            excel.guardar(df)
+        banco.medir('guardar_clientes[excel]', lambda: excel.guardar(df))
+        banco.medir('leer_clientes[excel]', lambda: AlmacenClientes(libro).leer())
+        # Primera apertura: sin instantánea hay que interpretar el .xlsx
+        banco.medir('leer_clientes[xlsx]', lambda: AlmacenClientes(libro).leer(),
+                    lambda: os.path.exists(libro.ruta_instantanea) and os.remove(libro.ruta_instantanea))
+        excel.leer()
+        medir_escrituras(banco, excel, 'excel', rng)
+        excel.cerrar()
+    else:
+        for caso in casos_excel:
+            banco.omitir(caso, f'más de {limite_excel:,} filas')
+
+    # --- Índices y agregados, desde cero ---
+    df, version = clientes.leer(), clientes.version
+    for grupo in IndicesClientes.GRUPOS:
+        banco.medir(f'indices[{grupo}]', lambda g=grupo: clientes.indices.asegurar(df, version, grupos=(g,)),
+                    lambda: setattr(clientes, 'indices', IndicesClientes()))
+    banco.medir('agregados', lambda: clientes.agregados.asegurar(df, version),
+                lambda: setattr(clientes, 'agregados', AgregadosClientes()))
+    preparar_consultas(clientes)
+
+    # --- Consultas, con los índices al día ---
+    for criterio, valor in (('Nombre_Empresa', 'panadería'), ('Localidad', 'cali'),
+                            ('Estado_Contacto', 'segui'), ('Telefono', '310'),
+                            ('Correo_Electronico', 'hotmail')):
+        banco.medir(f'buscar_cliente[{criterio}]', lambda c=criterio, v=valor: clientes.buscar(c, v, df, version))
+    for filtro, criterios in (('En seguimiento', {'Estado_Contacto': 'En seguimiento'}),
+                              ('Alto', {'Interes': 'Alto'}), ('SI', {'Se_Le_Envio_Propuesta': 'SI'})):
+        banco.medir(f'aplicar_filtro_rapido[{filtro}]', lambda c=criterios: clientes.filtrar(c))
+    banco.medir('ejecutar_busqueda_avanzada',
+                lambda: clientes.buscar_avanzada({'Nombre_Empresa': 'comercial', 'Sector': '',
+                                                  'Localidad': 'bogot', 'Estado_Contacto': 'En seguimiento',
+                                                  'Interes': 'Alto', 'Es_Cliente': 'NO'}))
+
+    # Tras cada alta o modificación: agregados e índice de fechas con el cambio ya aplicado
+    def modificar_uno():
+        actual = clientes.leer().copy()
+        cliente_id = int(rng.choice(actual['ID'].to_numpy()))
+        asignar_valor(actual, actual['ID'] == cliente_id, 'Interes', 'Alto')
+        clientes.actualizar(actual, [cliente_id], {'Interes': 'Alto'})
+    banco.medir('actualizar_estadisticas_rapidas', lambda: estadisticas_rapidas(clientes), modificar_uno)
+
+    # --- Tabla ---
+    with contenedor_tabla(sin_pantalla) as (padre, modo):
+        tabla = tabla_virtual.TablaVirtual(padre, COLUMNAS_CLIENTES, {}, GestorClientesApp.color_fila)
+        tabla.ordenar = clientes.ordenar_posiciones
+        # Una versión nueva, como tras un cambio: arreglos y rangos de orden desde cero
+        def nueva_version():
+            clientes.establecer(clientes.leer(), clientes.firma())
+        banco.medir('tabla[arreglos_columnas]', clientes.arreglos_columnas, nueva_version)
+        todas = np.arange(len(clientes.leer()))
+        banco.medir('tabla[mostrar]', lambda: tabla.mostrar(clientes.arreglos_columnas(), todas))
+
+        def sin_orden():
+            nueva_version()
+            tabla.orden = []
+            tabla.mostrar(clientes.arreglos_columnas(), todas)
+        banco.medir('tabla[ordenar_por]', lambda: tabla.ordenar_por('Nombre_Empresa'), sin_orden)
+
+        _, paginas = tabla.pagina()
+        saltos = rng.integers(1, paginas + 1, size=100).tolist()
+        banco.medir('tabla[100_paginas]', lambda: [tabla.ir_a_pagina(pagina) for pagina in saltos])
+
+    # --- Gráficos ---
+    casos_graficos = [f'grafico[{nombre}]' for nombre in ('estados', 'propuestas', 'localidades')]
+    if any(banco.incluido(caso) for caso in casos_graficos):
+        import graficos
+        graficos.aplicar_estilo()
+        resumen = clientes.resumen()
+        for nombre, figura in graficos.FIGURAS.items():
+            banco.medir(f'grafico[{nombre}]', lambda f=figura: graficos.renderizar_png(f(resumen)))
+
+    clientes.cerrar()
+    return modo
+
+
+# --- Comparación ------------------------------------------------------------
+
+def comparar(actual, base, tolerancia=TOLERANCIA, margen=MARGEN_REGRESION):
+    """Casos presentes en los dos resultados que empeoraron: lista de (filas, caso, antes, ahora)"""
+    regresiones = []
+    for filas, casos in actual['resultados'].items():
+        anteriores = base.get('resultados', {}).get(filas, {})
+        for caso, tiempos in casos.items():
+            if caso not in anteriores:
+                continue
+            antes, ahora = anteriores[caso]['min'], tiempos['min']
+            if ahora > antes * (1 + tolerancia) and ahora - antes > margen:
+                regresiones.append((int(filas), caso, antes, ahora))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el rendimiento del gestor de clientes con datos sintéticos")
+    parser.add_argument('--tamanos', default=','.join(str(t) for t in TAMANOS),
+                        help="Cantidades de clientes separadas por comas (por defecto: 1000,10000,100000,1000000)")
+    parser.add_argument('--semilla', type=int, default=SEMILLA, help="Semilla de los datos sintéticos")
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES, help="Repeticiones de cada caso")
+    parser.add_argument('--casos', help="Solo los casos que empiezan así, separados por comas (p. ej. buscar,tabla)")
+    parser.add_argument('--limite-excel', type=int, default=LIMITE_EXCEL,
+                        help=f"Mayor cantidad de clientes que se mide con Excel (por defecto: {LIMITE_EXCEL})")
+    parser.add_argument('--sin-pantalla', action='store_true',
+                        help="Usar el Treeview sin Tk aunque haya pantalla")
+    parser.add_argument('--directorio', help="Carpeta para los archivos de prueba (por defecto, una temporal)")
+    parser.add_argument('--salida', default='rendimiento.json', help="Archivo JSON con los resultados")
+    parser.add_argument('--base', help="Resultados anteriores (JSON) con los que comparar")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help="Aumento admitido del tiempo mínimo antes de marcar una regresión (0.25 = 25 %%)")
+    args = parser.parse_args(argv)
+
+    try:
+        tamanos = [int(t) for t in args.tamanos.split(',') if t.strip()]
+    except ValueError:
+        parser.error(f"Tamaños no válidos: {args.tamanos}")
+    base = None
+    if args.base:
+        try:
+            with open(args.base, encoding='utf-8') as archivo:
+                base = json.load(archivo)
+        except (OSError, ValueError) as e:
+            print(f"Error al leer la base {args.base}: {e}")
+            return 1
+    casos = [c.strip() for c in args.casos.split(',') if c.strip()] if args.casos else None
+
+    resultado = {
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'semilla': args.semilla,
+        'repeticiones': args.repeticiones,
+        'entorno': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                    'sistema': platform.platform(), 'procesador': platform.processor() or platform.machine()},
+        'resultados': {},
+    }
+    with tempfile.TemporaryDirectory(dir=args.directorio) as directorio:
+        for filas in tamanos:
+            banco = Banco(args.repeticiones, casos)
+            modo = medir_tamano(filas, directorio, banco, args.semilla, args.limite_excel, args.sin_pantalla)
+            resultado['entorno']['tabla'] = modo
+            resultado['resultados'][str(filas)] = banco.resultados
+
+    with open(args.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+    if base is None:
+        return 0
+    regresiones = comparar(resultado, base, args.tolerancia)
+    if not regresiones:
+        print(f"Sin regresiones respecto a {args.base} (tolerancia {args.tolerancia:.0%})")
+        return 0
+    print(f"{len(regresiones)} regresiones respecto a {args.base} (tolerancia {args.tolerancia:.0%}):")
+    for filas, caso, antes, ahora in regresiones:
+        print(f"   {filas:>9,} {caso:<48} {antes * 1000:10.1f} ms -> {ahora * 1000:10.1f} ms "
+              f"(+{ahora / antes - 1:.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
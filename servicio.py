@@ -0,0 +1,629 @@
+"""Servicio HTTP/JSON local sobre los clientes, para formularios web y otras herramientas.
+
+Un solo hilo con asyncio atiende todas las conexiones (HTTP/1.1 con
+conexiones persistentes, solo con la biblioteca estándar) y responde las
+consultas desde el conjunto en memoria de AlmacenClientes, con sus índices
+y agregados, igual que la interfaz. Las altas, modificaciones y bajas se
+aplican en memoria al momento y llegan al disco por el hilo de E/S
+(trabajador.py), que junta las que llegan seguidas en una sola escritura
+del motor; cada una se responde cuando su tanda quedó guardada. Uso:
+
+    python servicio.py --puerto 8765 --archivo clientes_potenciales.db
+
+Rutas (las respuestas y los cuerpos son JSON; los errores, {"error": ...}):
+
+    GET    /clientes        página de clientes: ?limite=100&desde=0, filtros
+                            ?Columna=valor (exactos en las listas de valores,
+                            "contiene" en el resto), búsqueda
+                            ?buscar=texto&campo=Columna y orden
+                            ?orden=Columna,-Otra. Con ?formato=jsonl se
+                            envían todas las filas por partes (JSON Lines)
+    GET    /clientes/<id>   un cliente
+    POST   /clientes        alta; responde el cliente con su ID y su Version
+    PATCH  /clientes/<id>   cambia los campos enviados; con "Version" (la
+                            leída), 409 si otro usuario lo cambió después
+    DELETE /clientes/<id>   baja; ?version=n como "Version" en PATCH
+    GET    /estadisticas    cifras y conteos del informe estadístico
+    GET    /diagnostico     duración de cada ruta (percentiles)
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import COLUMNAS_CONTROL, OPCIONES_CAMPOS, abrir_origen, asignar_valor, valor_sql
+from clientes import AlmacenClientes
+from concurrencia import ArchivoBloqueado, ConflictoEdicion
+from esquema import concatenar, vacio, validar_cambios
+from estadisticas import AgregadosClientes, cifras_principales
+from exportacion import bloques_filas
+from indices import IndicesClientes
+from instrumentacion import UMBRAL_LENTO, medidor
+from trabajador import TrabajadorAlmacenamiento
+
+PUERTO = 8765
+# Clientes por página si no se indica `limite`, y máximo por página
+LIMITE_PAGINA = 100
+LIMITE_MAXIMO = 1000
+# Filas por parte en las respuestas JSON Lines
+FILAS_POR_PARTE = 1000
+# Cuerpo más grande que se acepta, en bytes
+TAMANO_MAXIMO_CUERPO = 1 << 20
+# Segundos que una conexión puede quedar sin peticiones antes de cerrarla
+ESPERA_CONEXION = 60
+# Parámetros de /clientes que no son columnas
+PARAMETROS_LISTA = ('limite', 'desde', 'orden', 'buscar', 'campo', 'formato')
+
+
+class ErrorPeticion(Exception):
+    """Petición que no se puede atender; `estado` es el código HTTP de la respuesta"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class Peticion:
+    """Método, ruta (en partes), parámetros de la consulta y cuerpo de una petición HTTP"""
+
+    def __init__(self, metodo, objetivo, cuerpo=b'', version='HTTP/1.1'):
+        partes = urlsplit(objetivo)
+        self.metodo = metodo
+        self.version = version
+        self.ruta = [unquote(parte) for parte in partes.path.split('/') if parte]
+        self.consulta = dict(parse_qsl(partes.query))
+        self.cuerpo = cuerpo
+
+    def json(self):
+        """El cuerpo, que debe ser un objeto JSON"""
+        try:
+            datos = json.loads(self.cuerpo or b'{}')
+        except ValueError:
+            raise ErrorPeticion(400, "El cuerpo no es JSON válido")
+        if not isinstance(datos, dict):
+            raise ErrorPeticion(400, "El cuerpo debe ser un objeto JSON")
+        return datos
+
+    def entero(self, nombre, defecto=None, minimo=0, maximo=None):
+        """Parámetro entero de la consulta, dentro de [minimo, maximo]"""
+        texto = self.consulta.get(nombre)
+        if texto is None or texto == '':
+            return defecto
+        try:
+            valor = int(texto)
+        except ValueError:
+            raise ErrorPeticion(400, f"{nombre} debe ser un número entero")
+        if valor < minimo or (maximo is not None and valor > maximo):
+            limite = f"entre {minimo} y {maximo}" if maximo is not None else f"mayor o igual que {minimo}"
+            raise ErrorPeticion(400, f"{nombre} debe estar {limite}")
+        return valor
+
+
+class Flujo:
+    """Respuesta que se envía por partes (bytes) a medida que se generan"""
+
+    def __init__(self, partes, tipo='application/x-ndjson; charset=utf-8'):
+        self.partes = partes
+        self.tipo = tipo
+
+
+def codificar(datos):
+    return json.dumps(datos, ensure_ascii=False, default=valor_sql).encode('utf-8')
+
+
+class TrabajadorServicio(TrabajadorAlmacenamiento):
+    """Hilo de E/S cuyos resultados se entregan como futuros del bucle de asyncio.
+
+    Cada escritura encolada tiene un futuro (`ultima` es el de la última)
+    que se resuelve con el error de su tanda, o None, cuando la tanda llega
+    al disco. Los futuros solo se tocan en el hilo del bucle.
+    """
+
+    def __init__(self, bucle):
+        super().__init__()
+        self.bucle = bucle
+        self.confirmaciones = deque()
+        self.ultima = None
+        threading.Thread(target=self.entregar, daemon=True).start()
+
+    def escribir(self, almacenamiento, operacion, *args):
+        self.ultima = self.bucle.create_future()
+        self.confirmaciones.append(self.ultima)
+        super().escribir(almacenamiento, operacion, *args)
+
+    async def en_hilo(self, nombre, funcion):
+        """Ejecuta la función en el hilo de E/S, en orden con las escrituras; devuelve su aviso"""
+        futuro = self.bucle.create_future()
+        self.tarea(nombre, funcion, futuro)
+        return await futuro
+
+    def entregar(self):
+        """Pasa al bucle los avisos de la cola `resultados`"""
+        while True:
+            aviso = self.resultados.get()
+            try:
+                self.bucle.call_soon_threadsafe(self.recibir, aviso)
+            except RuntimeError:
+                # El bucle ya terminó
+                return
+
+    def recibir(self, aviso):
+        if aviso['tipo'] == 'escritura':
+            for _ in range(aviso['operaciones']):
+                futuro = self.confirmaciones.popleft()
+                if not futuro.done():
+                    futuro.set_result(aviso['error'])
+        elif aviso['tipo'] == 'tarea':
+            futuro = aviso['contexto']
+            if not futuro.done():
+                futuro.set_result(aviso)
+
+
+class ServicioClientes:
+    """Atiende las peticiones HTTP sobre un almacén de clientes en memoria.
+
+    Todo lo que toca el almacén corre en el hilo del bucle, así que entre
+    leer el conjunto y entregarle una escritura no puede colarse otra
+    petición (no hay `await` en medio). El disco solo se toca en el hilo
+    de E/S, también para reservar los IDs de las altas (`reservar_id`).
+    """
+
+    # Cada cuánto se comprueba si otro proceso cambió los datos, en segundos
+    INTERVALO_CAMBIOS = 2.0
+
+    def __init__(self, almacenamiento):
+        self.almacenamiento = almacenamiento
+        self.trabajador = None
+        self.clientes = None
+        self.servidor = None
+        self._vigilancia = None
+        # (versión de los datos, columnas -> arreglo) de las filas que se devuelven
+        self._datos = None
+        # (versión de los agregados, respuesta de /estadisticas)
+        self._estadisticas = None
+        # IDs ya reservados para las próximas altas y la reserva en curso
+        self._ids_libres = deque()
+        self._reposicion = None
+
+    # --- Ciclo de vida ---------------------------------------------------
+
+    async def iniciar(self, host='127.0.0.1', puerto=PUERTO):
+        """Carga los clientes y empieza a escuchar; devuelve el servidor (con puerto 0, en uno libre)"""
+        self.trabajador = TrabajadorServicio(asyncio.get_running_loop())
+        self.clientes = AlmacenClientes(self.almacenamiento, trabajador=self.trabajador)
+
+        def cargar():
+            self.clientes.inicializar()
+            return self.clientes.cargar()
+
+        aviso = await self.trabajador.en_hilo('carga', cargar)
+        if aviso['error'] is not None:
+            raise aviso['error']
+        self.clientes.establecer(*aviso['resultado'])
+        self.clientes.preparar_indices()
+        self._vigilancia = asyncio.create_task(self.vigilar())
+        self.servidor = await asyncio.start_server(self.atender, host, puerto)
+        return self.servidor
+
+    async def servir(self, host='127.0.0.1', puerto=PUERTO):
+        """Atiende hasta que se interrumpa; al terminar guarda lo pendiente"""
+        servidor = await self.iniciar(host, puerto)
+        direccion, puerto = servidor.sockets[0].getsockname()[:2]
+        print(f"{len(self.clientes.leer()):,} clientes ({self.almacenamiento.nombre}) "
+              f"en http://{direccion}:{puerto}/clientes")
+        try:
+            await servidor.serve_forever()
+        finally:
+            self.cerrar()
+
+    def cerrar(self):
+        """Deja de escuchar, espera las escrituras encoladas y compacta lo pendiente"""
+        if self.servidor is not None:
+            self.servidor.close()
+        if self._vigilancia is not None:
+            self._vigilancia.cancel()
+        if self.clientes is not None:
+            self.clientes.cerrar()
+
+    async def vigilar(self):
+        """Relee los datos cuando otro proceso los cambia, como la interfaz"""
+        while True:
+            await asyncio.sleep(self.INTERVALO_CAMBIOS)
+            if self.trabajador.ocupado():
+                continue
+            version = self.clientes.version
+            aviso = await self.trabajador.en_hilo('carga', self.clientes.comprobar_cambios)
+            if aviso['error'] is not None:
+                print(f"Error al leer archivo: {aviso['error']}")
+            elif aviso['resultado'] is not None and version == self.clientes.version:
+                # Si hubo escrituras mientras se releía, la próxima comprobación lo repite
+                self.clientes.establecer(*aviso['resultado'])
+
+    # --- HTTP ------------------------------------------------------------
+
+    async def atender(self, lector, escritor):
+        """Atiende las peticiones de una conexión, una tras otra"""
+        try:
+            while True:
+                linea = await asyncio.wait_for(lector.readline(), ESPERA_CONEXION)
+                if not linea:
+                    break
+                if not linea.strip():
+                    continue
+                inicio = time.perf_counter()
+                peticion, persistente = await self.leer_peticion(linea, lector, escritor)
+                if peticion is None:
+                    break
+                operacion, estado, datos = await self.responder(peticion)
+                if isinstance(datos, Flujo) and peticion.version != 'HTTP/1.1':
+                    # Sin partes con su largo, el fin del cuerpo lo marca el cierre
+                    persistente = False
+                await self.enviar(escritor, estado, datos, persistente)
+                medidor.registrar(f"api {peticion.metodo} {operacion}", time.perf_counter() - inicio)
+                if not persistente:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # El servicio se cierra con la conexión abierta
+            pass
+        finally:
+            escritor.close()
+
+    async def leer_peticion(self, linea, lector, escritor):
+        """(Peticion, conexión persistente) a partir de la línea inicial; (None, False) si no es válida"""
+        try:
+            metodo, objetivo, version = linea.decode('latin-1').split()
+        except ValueError:
+            await self.enviar(escritor, 400, {'error': "Petición HTTP no válida"}, False)
+            return None, False
+        cabeceras = {}
+        while True:
+            linea = await lector.readline()
+            if linea in (b'\r\n', b'\n', b''):
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        conexion = cabeceras.get('connection', '').lower()
+        persistente = conexion != 'close' if version == 'HTTP/1.1' else conexion == 'keep-alive'
+        if 'transfer-encoding' in cabeceras:
+            await self.enviar(escritor, 411, {'error': "Indique Content-Length"}, False)
+            return None, False
+        try:
+            largo = int(cabeceras.get('content-length') or 0)
+        except ValueError:
+            largo = -1
+        if not 0 <= largo <= TAMANO_MAXIMO_CUERPO:
+            await self.enviar(escritor, 413 if largo > 0 else 400,
+                              {'error': "Content-Length no válido o demasiado grande"}, False)
+            return None, False
+        if largo and cabeceras.get('expect', '').lower() == '100-continue':
+            escritor.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        cuerpo = await lector.readexactly(largo) if largo else b''
+        return Peticion(metodo.upper(), objetivo, cuerpo, version), persistente
+
+    async def responder(self, peticion):
+        """(ruta, estado, datos) de la respuesta; los errores se responden como {"error": ...}"""
+        operacion = '/' + '/'.join(peticion.ruta[:1])
+        try:
+            operacion, manejador = self.resolver(peticion)
+            estado, datos = await manejador(peticion)
+        except ErrorPeticion as e:
+            estado, datos = e.estado, {'error': str(e)}
+        except ConflictoEdicion as e:
+            estado, datos = 409, {'error': str(e), 'modificados': e.modificados, 'eliminados': e.eliminados}
+        except ValueError as e:
+            # Valores que no corresponden a su campo (esquema.validar_cambios)
+            estado, datos = 400, {'error': str(e)}
+        except ArchivoBloqueado as e:
+            estado, datos = 503, {'error': str(e)}
+        except Exception as e:
+            print(f"Error en {peticion.metodo} {operacion}: {e}")
+            estado, datos = 500, {'error': f"Error al atender la petición: {e}"}
+        return operacion, estado, datos
+
+    def resolver(self, peticion):
+        """(plantilla de la ruta, método que la atiende)"""
+        ruta = peticion.ruta
+        if ruta == ['clientes']:
+            plantilla, metodos = '/clientes', {'GET': self.listar, 'POST': self.crear}
+        elif len(ruta) == 2 and ruta[0] == 'clientes':
+            plantilla, metodos = '/clientes/<id>', {'GET': self.obtener, 'PATCH': self.modificar,
+                                                    'DELETE': self.eliminar}
+        elif ruta == ['estadisticas']:
+            plantilla, metodos = '/estadisticas', {'GET': self.estadisticas}
+        elif ruta == ['diagnostico']:
+            plantilla, metodos = '/diagnostico', {'GET': self.diagnostico}
+        else:
+            raise ErrorPeticion(404, "Ruta no encontrada")
+        if peticion.metodo not in metodos:
+            raise ErrorPeticion(405, f"{plantilla} admite {', '.join(metodos)}")
+        return plantilla, metodos[peticion.metodo]
+
+    async def enviar(self, escritor, estado, datos, persistente):
+        """Escribe la respuesta: JSON con su largo o, si es un Flujo, por partes"""
+        lineas = [f"HTTP/1.1 {estado} {HTTPStatus(estado).phrase}"]
+        if not persistente:
+            lineas.append("Connection: close")
+        if isinstance(datos, Flujo):
+            lineas += [f"Content-Type: {datos.tipo}"] + (["Transfer-Encoding: chunked"] if persistente else [])
+            escritor.write(('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1'))
+            for parte in datos.partes:
+                escritor.write(b'%X\r\n%s\r\n' % (len(parte), parte) if persistente else parte)
+                await escritor.drain()
+                # Que las demás conexiones avancen entre parte y parte
+                await asyncio.sleep(0)
+            if persistente:
+                escritor.write(b'0\r\n\r\n')
+            await escritor.drain()
+            return
+        cuerpo = b'' if datos is None else codificar(datos)
+        if estado != 204:
+            lineas += ["Content-Type: application/json; charset=utf-8", f"Content-Length: {len(cuerpo)}"]
+        escritor.write(('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1') + cuerpo)
+        await escritor.drain()
+
+    # --- Consultas -------------------------------------------------------
+
+    def datos_filas(self):
+        """(columnas, columna -> arreglo) de los clientes, con Version y Actualizado; una vez por versión"""
+        version = self.clientes.version
+        if self._datos is None or self._datos[0] != version:
+            df = self.clientes.leer()
+            datos = dict(self.clientes.arreglos_columnas())
+            for col in COLUMNAS_CONTROL:
+                datos[col] = df[col].to_numpy(dtype=object)
+            self._datos = (version, datos)
+        datos = self._datos[1]
+        return list(datos), datos
+
+    def filas(self, posiciones):
+        """Clientes de esas posiciones, como diccionarios"""
+        columnas, datos = self.datos_filas()
+        return [dict(zip(columnas, fila))
+                for bloque in bloques_filas(datos, posiciones, columnas) for fila in bloque]
+
+    def lineas(self, posiciones):
+        """Partes JSON Lines de los clientes de esas posiciones, con los datos de la versión actual"""
+        columnas, datos = self.datos_filas()
+        for bloque in bloques_filas(datos, posiciones, columnas, FILAS_POR_PARTE):
+            yield b''.join(codificar(dict(zip(columnas, fila))) + b'\n' for fila in bloque)
+
+    def cliente(self, cliente_id):
+        """El cliente con ese ID como diccionario, o None"""
+        df = self.clientes.leer()
+        posiciones = self.clientes.posiciones_de_ids(df, self.clientes.version, [cliente_id])
+        return self.filas(posiciones[:1])[0] if len(posiciones) else None
+
+    def id_de_ruta(self, peticion):
+        """ID de /clientes/<id>; 404 si no existe ese cliente"""
+        try:
+            cliente_id = int(peticion.ruta[1])
+        except ValueError:
+            raise ErrorPeticion(404, f"ID no válido: {peticion.ruta[1]}")
+        df = self.clientes.leer()
+        if not len(self.clientes.posiciones_de_ids(df, self.clientes.version, [cliente_id])):
+            raise ErrorPeticion(404, f"No existe el cliente {cliente_id}")
+        return cliente_id
+
+    def consultar(self, peticion):
+        """Posiciones de los clientes que cumplen los filtros y la búsqueda, en el orden pedido"""
+        df = self.clientes.leer()
+        version = self.clientes.version
+        columnas = self.clientes.columnas
+        consulta = peticion.consulta
+        desconocidos = [p for p in consulta if p not in PARAMETROS_LISTA and p not in columnas]
+        if desconocidos:
+            raise ErrorPeticion(400, f"Parámetros desconocidos: {', '.join(desconocidos)}")
+
+        # Listas de valores: AND de los mapas de bits; el resto, "contiene" sobre lo que queda
+        filtros = {campo: valor for campo, valor in consulta.items() if campo in columnas and valor}
+        criterios = {campo: valor for campo, valor in filtros.items()
+                     if campo in IndicesClientes.COLUMNAS_CATEGORIAS}
+        posiciones = self.clientes.filtrar(criterios) if criterios else np.arange(len(df))
+        busquedas = [(campo, valor) for campo, valor in filtros.items() if campo not in criterios]
+        if consulta.get('buscar'):
+            campo = consulta.get('campo') or 'Nombre_Empresa'
+            if campo not in columnas:
+                raise ErrorPeticion(400, f"Campo de búsqueda desconocido: {campo}")
+            busquedas.append((campo, consulta['buscar']))
+        for campo, valor in busquedas:
+            posiciones = self.clientes.buscar(campo, valor.lower(), df, version, base=posiciones)
+
+        claves = []
+        for parte in (consulta.get('orden') or '').split(','):
+            columna = parte.strip().lstrip('-')
+            if not columna:
+                continue
+            if columna not in columnas:
+                raise ErrorPeticion(400, f"No se puede ordenar por {columna}")
+            claves.append((columna, not parte.strip().startswith('-')))
+        return self.clientes.ordenar_posiciones(posiciones, claves)
+
+    async def listar(self, peticion):
+        formato = peticion.consulta.get('formato') or 'json'
+        if formato not in ('json', 'jsonl'):
+            raise ErrorPeticion(400, "formato debe ser json o jsonl")
+        posiciones = self.consultar(peticion)
+        desde = peticion.entero('desde', 0)
+        if formato == 'jsonl':
+            limite = peticion.entero('limite', len(posiciones))
+            return 200, Flujo(self.lineas(posiciones[desde:desde + limite]))
+        limite = peticion.entero('limite', LIMITE_PAGINA, maximo=LIMITE_MAXIMO)
+        return 200, {'total': len(posiciones), 'desde': desde, 'limite': limite,
+                     'clientes': self.filas(posiciones[desde:desde + limite])}
+
+    async def obtener(self, peticion):
+        return 200, self.cliente(self.id_de_ruta(peticion))
+
+    async def estadisticas(self, peticion):
+        resumen = self.clientes.resumen()
+        if self._estadisticas is None or self._estadisticas[0] != resumen.version:
+            propuestas = {}
+            for (solicito, envio), cantidad in resumen.cruce_conteos.items():
+                propuestas.setdefault(str(solicito), {})[str(envio)] = cantidad
+            datos = {
+                'principales': cifras_principales(resumen),
+                'conteos': {col: {str(valor): int(cantidad) for valor, cantidad in resumen.serie(col).items()}
+                            for col in AgregadosClientes.COLUMNAS},
+                'propuestas': propuestas,
+            }
+            self._estadisticas = (resumen.version, datos)
+        return 200, self._estadisticas[1]
+
+    async def diagnostico(self, peticion):
+        return 200, medidor.resumen()
+
+    # --- Escrituras ------------------------------------------------------
+
+    def campos(self, cuerpo):
+        """Los campos del cuerpo, que deben ser columnas de clientes (salvo el ID) con valores simples"""
+        no_admitidos = [campo for campo in cuerpo if campo not in self.clientes.columnas or campo == 'ID']
+        if no_admitidos:
+            raise ErrorPeticion(400, f"Campos no admitidos: {', '.join(no_admitidos)}")
+        compuestos = [campo for campo, valor in cuerpo.items() if isinstance(valor, (dict, list))]
+        if compuestos:
+            raise ErrorPeticion(400, f"Valores no admitidos en: {', '.join(compuestos)}")
+        return cuerpo
+
+    @staticmethod
+    def version_esperada(valor):
+        """La versión enviada por el cliente como lista para AlmacenClientes, o None"""
+        if valor is None or valor == '':
+            return None
+        try:
+            version = int(valor)
+        except (TypeError, ValueError):
+            version = None
+        if version is None or isinstance(valor, (bool, float)):
+            raise ErrorPeticion(400, f"Version no válida: {valor!r}")
+        return [version]
+
+    async def escribir(self, ids, operacion, *args):
+        """Aplica una escritura del almacén y espera a que su tanda llegue al disco.
+
+        Si la tanda falla, lo que quedó en disco es lo válido: la próxima
+        comprobación lo relee. Los conflictos de otras filas de la tanda no
+        afectan a esta escritura.
+        """
+        self.trabajador.ultima = None
+        operacion(*args)
+        futuro = self.trabajador.ultima
+        error = None if futuro is None else await futuro
+        if error is None:
+            return
+        self.clientes.descartar_firma()
+        if isinstance(error, ConflictoEdicion):
+            error = ConflictoEdicion([i for i in error.modificados if i in ids],
+                                     [i for i in error.eliminados if i in ids])
+            if not error.modificados and not error.eliminados:
+                return
+        raise error
+
+    async def reservar_id(self):
+        """ID para un alta, de los reservados de antemano.
+
+        Se reservan de a BLOQUE_IDS en el hilo de E/S, porque la reserva toca
+        el disco; las altas que llegan con una reserva en curso la esperan en
+        lugar de pedir otra.
+        """
+        while not self._ids_libres:
+            if self._reposicion is None or self._reposicion.done():
+                self._reposicion = asyncio.ensure_future(self.reponer_ids())
+            # Si se cancela una petición, la reserva sigue para las demás
+            await asyncio.shield(self._reposicion)
+        return self._ids_libres.popleft()
+
+    async def reponer_ids(self):
+        aviso = await self.trabajador.en_hilo(
+            'reserva_ids', lambda: self.clientes.nuevos_ids(self.clientes.BLOQUE_IDS))
+        if aviso['error'] is not None:
+            raise aviso['error']
+        self._ids_libres.extend(aviso['resultado'])
+
+    async def crear(self, peticion):
+        datos = self.campos(peticion.json())
+        if not str(datos.get('Nombre_Empresa') or '').strip():
+            raise ErrorPeticion(400, "El nombre de la empresa es obligatorio.")
+        # Mismos valores por defecto que el formulario y la importación
+        for campo, opciones in OPCIONES_CAMPOS.items():
+            if vacio(datos.get(campo)):
+                datos[campo] = opciones[0]
+        df = self.clientes.leer()
+        datos = validar_cambios(datos, df)
+        hoy = datetime.date.today().strftime('%Y-%m-%d')
+        if not datos.get('Fecha_Contacto'):
+            datos['Fecha_Contacto'] = hoy
+        # Si se envió propuesta pero no hay fecha, usar fecha actual
+        if datos.get('Se_Le_Envio_Propuesta') == 'SI' and not datos.get('Fecha_Envio_Propuesta'):
+            datos['Fecha_Envio_Propuesta'] = hoy
+        datos['ID'] = nuevo_id = await self.reservar_id()
+        # Otra petición pudo escribir mientras se reservaba el ID
+        df = self.clientes.leer()
+        fila = {col: datos.get(col) for col in self.clientes.columnas}
+        await self.escribir([nuevo_id], self.clientes.insertar, concatenar(df, pd.DataFrame([fila])), [fila])
+        return 201, self.cliente(nuevo_id)
+
+    async def modificar(self, peticion):
+        cliente_id = self.id_de_ruta(peticion)
+        cuerpo = peticion.json()
+        versiones = self.version_esperada(cuerpo.pop('Version', None))
+        cambios = self.campos(cuerpo)
+        if not cambios:
+            raise ErrorPeticion(400, "No hay campos para cambiar")
+        df = self.clientes.leer().copy()
+        cambios = validar_cambios(cambios, df)
+        mascara = df['ID'] == cliente_id
+        # Si se envió propuesta pero no hay fecha, usar fecha actual
+        if (cambios.get('Se_Le_Envio_Propuesta') == 'SI' and 'Fecha_Envio_Propuesta' not in cambios
+                and df.loc[mascara, 'Fecha_Envio_Propuesta'].isna().all()):
+            cambios['Fecha_Envio_Propuesta'] = datetime.date.today().strftime('%Y-%m-%d')
+        for campo, valor in cambios.items():
+            asignar_valor(df, mascara, campo, valor)
+        await self.escribir([cliente_id], self.clientes.actualizar, df, [cliente_id], cambios, versiones)
+        return 200, self.cliente(cliente_id)
+
+    async def eliminar(self, peticion):
+        cliente_id = self.id_de_ruta(peticion)
+        versiones = self.version_esperada(peticion.consulta.get('version'))
+        df = self.clientes.leer()
+        df = df[df['ID'] != cliente_id]
+        await self.escribir([cliente_id], self.clientes.eliminar, df, [cliente_id], versiones)
+        return 204, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON local sobre los clientes")
+    parser.add_argument('--archivo', help="Libro .xlsx o base .db (por defecto, el de la aplicación)")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Dirección en la que escuchar (por defecto, solo este equipo)")
+    parser.add_argument('--puerto', type=int, default=PUERTO, help=f"Puerto (por defecto: {PUERTO})")
+    parser.add_argument('--umbral-lento', type=float, default=UMBRAL_LENTO * 1000,
+                        help=f"Informar en la consola las peticiones de más de estos ms (por defecto: {UMBRAL_LENTO * 1000:.0f})")
+    args = parser.parse_args(argv)
+    medidor.umbral = args.umbral_lento / 1000
+
+    try:
+        servicio = ServicioClientes(abrir_origen(args.archivo))
+        asyncio.run(servicio.servir(args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error en el servicio: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+"""Tabla de clientes con desplazamiento virtual sobre un ttk.Treeview"""
+
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import medido, medidor
+
+
+class TablaVirtual:
+    """Treeview que solo mantiene como ítems las filas visibles.
+
+    Los datos completos viven en arreglos por columna (uno por columna del
+    conjunto en caché) y la vista es un arreglo de posiciones dentro de esos
+    arreglos. Al desplazarse se reescriben los valores de los mismos ítems,
+    por lo que el costo de repintar depende de la altura de la ventana y no
+    del número de clientes. La selección se guarda como posiciones y se
+    traduce a IDs de cliente con `ids_seleccionados`.
+
+    Tras un alta, modificación o baja no hace falta volver a mostrar la
+    vista: `insertar_filas`, `actualizar_filas` y `eliminar_filas` aplican
+    solo el cambio, conservando el desplazamiento y la selección. Con un
+    orden activo, las filas nuevas o con cambios en sus claves se llevan a su
+    lugar (`reordenar`).
+
+    Un click en un encabezado ordena por esa columna (otro click invierte el
+    sentido) y con Mayúsculas la agrega como clave secundaria. El orden lo
+    calcula `ordenar(vista, claves)`, que recibe las posiciones y las claves
+    [(columna, ascendente), ...]; sin esa función los encabezados no ordenan.
+    La vista se recorre también por páginas del alto de la tabla
+    (`ir_a_pagina`); `al_desplazar` avisa cada vez que cambian las filas a la
+    vista.
+    """
+
+    # Filas extra por debajo de la última visible, para que la fila cortada
+    # al pie de la tabla nunca quede vacía
+    SOBREBARRIDO = 2
+    ALTO_FILA = 20
+
+    def __init__(self, parent, columnas, anchos, color_fila):
+        self.columnas = columnas
+        self.color_fila = color_fila
+        self.al_seleccionar = None
+        self.al_doble_click = None
+        self.al_desplazar = None
+        self.ordenar = None
+        self.orden = []
+
+        self.datos = {col: np.empty(0, dtype=object) for col in columnas}
+        self.vista = np.empty(0, dtype=np.int64)
+        self.inicio = 0
+        self.filas_visibles = 20
+        self.items = []
+        # ID de cliente -> ítem y ítem -> posición, para las filas visibles
+        self.item_por_id = {}
+        self.posicion_item = {}
+        self.seleccion = set()
+        self.ancla = None
+        self.cursor = None
+        self.colores_configurados = set()
+
+        self.v_scroll = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        h_scroll = ttk.Scrollbar(parent, orient=tk.HORIZONTAL)
+
+        self.tree = ttk.Treeview(parent, columns=columnas, show='headings',
+                                 xscrollcommand=h_scroll.set, selectmode='none',
+                                 height=20)
+
+        for col in columnas:
+            self.tree.heading(col, text=self.titulo_columna(col))
+            self.tree.column(col, width=anchos.get(col, 100), minwidth=50)
+
+        h_scroll.config(command=self.tree.xview)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self.tree.bind('<Configure>', self.al_redimensionar)
+        self.tree.bind('<Button-1>', self.al_click)
+        self.tree.bind('<Shift-Button-1>', lambda e: self.al_click(e, extender=True))
+        self.tree.bind('<Control-Button-1>', lambda e: self.al_click(e, alternar=True))
+        self.tree.bind('<Double-1>', self.al_doble)
+        self.tree.bind('<MouseWheel>', self.al_rueda)
+        self.tree.bind('<Button-4>', lambda e: self.desplazar(-3))
+        self.tree.bind('<Button-5>', lambda e: self.desplazar(3))
+        for tecla, paso in (('<Up>', -1), ('<Down>', 1),
+                            ('<Prior>', 'pagina-'), ('<Next>', 'pagina+'),
+                            ('<Home>', 'inicio'), ('<End>', 'fin')):
+            self.tree.bind(tecla, lambda e, p=paso: self.mover_cursor(p))
+            self.tree.bind(f'<Shift-{tecla[1:-1]}>', lambda e, p=paso: self.mover_cursor(p, extender=True))
+
+    # --- Datos -----------------------------------------------------------
+
+    def mostrar(self, datos, vista):
+        """Muestra las posiciones `vista` de los arreglos `datos` (columna -> arreglo), con el orden activo"""
+        self.datos = datos
+        self.vista = np.asarray(vista, dtype=np.int64)
+        if self.orden and self.ordenar is not None:
+            self.vista = self.ordenar(self.vista, self.orden)
+        self.inicio = 0
+        self.seleccion.clear()
+        self.ancla = None
+        self.cursor = None
+        self.pintar()
+
+    def total(self):
+        """Número de filas en la vista"""
+        return len(self.vista)
+
+    def vista_actual(self):
+        """Arreglos y posiciones de lo que se muestra, para leerlos desde otro hilo"""
+        return self.datos, self.vista.copy()
+
+    def ids_seleccionados(self):
+        """IDs de los clientes seleccionados, en el orden de la vista"""
+        if not self.seleccion:
+            return []
+        posiciones = self.vista[np.isin(self.vista, list(self.seleccion))]
+        return self.datos['ID'][posiciones].tolist()
+
+    def insertar_filas(self, datos, ids):
+        """Añade a la vista las filas nuevas con esos IDs: al final, o en su lugar si hay un orden activo"""
+        nuevas = np.flatnonzero(np.isin(datos['ID'], list(ids)))
+        self.datos = datos
+        self.vista = np.concatenate([self.vista, nuevas])
+        if self.orden and self.ordenar is not None:
+            self.reordenar()
+        self.pintar()
+
+    def actualizar_filas(self, datos, ids, columnas=None):
+        """Repinta las filas modificadas con esos IDs, solo si están a la vista.
+
+        `columnas` son las que cambiaron (None si no se sabe). Si alguna es
+        clave del orden activo, la vista se reordena y se repinta entera.
+        """
+        self.datos = datos
+        claves = {columna for columna, _ in self.orden}
+        if claves and self.ordenar is not None and (columnas is None or claves.intersection(columnas)):
+            self.reordenar()
+            self.pintar()
+            return
+        for cliente_id in ids:
+            item = self.item_por_id.get(cliente_id)
+            if item is not None:
+                valores, color = self.valores_fila(self.posicion_item[item])
+                self.tree.item(item, values=valores, tags=(self.etiqueta_color(color),))
+
+    def eliminar_filas(self, datos, ids):
+        """Quita de la vista las filas con esos IDs.
+
+        `datos` es el conjunto ya sin esas filas: las posiciones posteriores
+        a cada fila eliminada se corren hacia atrás.
+        """
+        quitadas = np.flatnonzero(np.isin(self.datos['ID'], list(ids)))
+        quitar = np.isin(self.vista, quitadas)
+        # Conservar la primera fila visible aunque se quiten filas anteriores
+        self.inicio -= int(np.count_nonzero(quitar[:self.inicio]))
+        self.vista = self.vista[~quitar]
+        self.vista = self.vista - np.searchsorted(quitadas, self.vista)
+
+        seleccion = np.array(sorted(self.seleccion - set(quitadas.tolist())), dtype=np.int64)
+        self.seleccion = set((seleccion - np.searchsorted(quitadas, seleccion)).tolist())
+        self.ancla = self.cursor = None
+
+        self.datos = datos
+        self.pintar()
+
+    def reordenar(self):
+        """Vuelve a aplicar el orden activo tras un cambio en los datos.
+
+        La selección se guarda como posiciones, así que no cambia; el inicio
+        de la ventana, el ancla y el cursor (índices de la vista) se llevan al
+        nuevo lugar de sus filas.
+        """
+        filas = [None if indice is None or indice >= len(self.vista) else self.vista[indice]
+                 for indice in (self.inicio, self.ancla, self.cursor)]
+        self.vista = self.ordenar(self.vista, self.orden)
+        inicio, self.ancla, self.cursor = (self.indice_de(posicion) for posicion in filas)
+        self.inicio = inicio or 0
+
+    def indice_de(self, posicion):
+        """Índice en la vista de una posición de los datos, o None si no está"""
+        if posicion is None:
+            return None
+        indices = np.flatnonzero(self.vista == posicion)
+        return int(indices[0]) if len(indices) else None
+
+    def limpiar_seleccion(self):
+        """Quita la selección actual"""
+        self.seleccion.clear()
+        self.pintar()
+        self.notificar_seleccion()
+
+    # --- Orden y páginas -------------------------------------------------
+
+    def titulo_columna(self, col):
+        """Texto del encabezado, con el sentido y el lugar de la columna en el orden"""
+        titulo = col.replace('_', ' ').title()
+        for numero, (columna, ascendente) in enumerate(self.orden, 1):
+            if columna == col:
+                titulo += ' ▲' if ascendente else ' ▼'
+                if len(self.orden) > 1:
+                    titulo += str(numero)
+        return titulo
+
+    @medido('ordenar_tabla')
+    def ordenar_por(self, col, agregar=False):
+        """Ordena por la columna: la pone como única clave, o como secundaria con `agregar`.
+
+        Si la columna ya es la clave principal (o, con `agregar`, una de las
+        claves) se invierte su sentido.
+        """
+        claves = [columna for columna, _ in self.orden]
+        if agregar and col in claves or not agregar and claves[:1] == [col]:
+            self.orden = [(columna, not ascendente if columna == col else ascendente)
+                          for columna, ascendente in self.orden]
+        elif agregar:
+            self.orden = self.orden + [(col, True)]
+        else:
+            self.orden = [(col, True)]
+        for columna in self.columnas:
+            self.tree.heading(columna, text=self.titulo_columna(columna))
+
+        self.vista = self.ordenar(self.vista, self.orden)
+        self.inicio = 0
+        self.cursor = None
+        self.ancla = None
+        self.pintar()
+
+    def pagina(self):
+        """Página actual (desde 1) y número de páginas, del alto de la tabla"""
+        paginas = max(1, -(-len(self.vista) // self.filas_visibles))
+        if self.inicio + self.filas_visibles >= len(self.vista):
+            # La última ventana puede empezar antes del inicio de la última página
+            return paginas, paginas
+        return self.inicio // self.filas_visibles + 1, paginas
+
+    def ir_a_pagina(self, numero):
+        """Muestra la página pedida (se ajusta a la primera o la última)"""
+        _, paginas = self.pagina()
+        self.inicio = (max(1, min(numero, paginas)) - 1) * self.filas_visibles
+        self.pintar()
+
+    # --- Pintado ---------------------------------------------------------
+
+    def valores_fila(self, posicion):
+        """Valores de una fila listos para el Treeview y su color de fondo"""
+        fila = {}
+        for col in self.columnas:
+            valor = self.datos[col][posicion]
+            fila[col] = valor if pd.notna(valor) else ''
+        return [fila[col] for col in self.columnas], self.color_fila(fila)
+
+    def etiqueta_color(self, color):
+        """Etiqueta del Treeview para un color de fondo, configurada una sola vez"""
+        etiqueta = f'color{color}'
+        if color not in self.colores_configurados:
+            self.tree.tag_configure(etiqueta, background=color)
+            self.colores_configurados.add(color)
+        return etiqueta
+
+    def pintar(self):
+        """Vuelca la ventana visible de la vista en los ítems del Treeview"""
+        with medidor.fase('tk'):
+            self.pintar_ventana()
+        if self.al_desplazar:
+            self.al_desplazar()
+
+    def pintar_ventana(self):
+        """Pintado en sí, medido como fase 'tk' de la operación en curso"""
+        self.inicio = max(0, min(self.inicio, len(self.vista) - self.filas_visibles))
+        ventana = self.vista[self.inicio:self.inicio + self.filas_visibles + self.SOBREBARRIDO]
+
+        # Ajustar la cantidad de ítems a la ventana
+        while len(self.items) < len(ventana):
+            self.items.append(self.tree.insert('', tk.END))
+        while len(self.items) > len(ventana):
+            self.tree.delete(self.items.pop())
+
+        seleccionados = []
+        self.item_por_id = {}
+        self.posicion_item = {}
+        ids = self.datos['ID']
+        for item, posicion in zip(self.items, ventana):
+            valores, color = self.valores_fila(posicion)
+            self.tree.item(item, values=valores, tags=(self.etiqueta_color(color),))
+            self.item_por_id[ids[posicion]] = item
+            self.posicion_item[item] = posicion
+            if posicion in self.seleccion:
+                seleccionados.append(item)
+        self.tree.selection_set(seleccionados)
+
+        total = len(self.vista)
+        if total:
+            self.v_scroll.set(self.inicio / total,
+                              min(1.0, (self.inicio + self.filas_visibles) / total))
+        else:
+            self.v_scroll.set(0.0, 1.0)
+
+    def calcular_filas_visibles(self):
+        """Filas que caben en la altura actual del Treeview"""
+        alto_fila = self.ALTO_FILA
+        y_primera = alto_fila + 5  # encabezados
+        if self.items:
+            caja = self.tree.bbox(self.items[0])
+            if caja:
+                y_primera, alto_fila = caja[1], caja[3]
+        return max(1, (self.tree.winfo_height() - y_primera) // alto_fila)
+
+    def al_redimensionar(self, event=None):
+        filas = self.calcular_filas_visibles()
+        if filas != self.filas_visibles:
+            self.filas_visibles = filas
+            self.pintar()
+
+    # --- Desplazamiento --------------------------------------------------
+
+    @medido('desplazar_tabla')
+    def yview(self, *args):
+        """Comando de la barra de desplazamiento vertical"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.inicio = int(float(args[1]) * len(self.vista))
+        elif args[0] == 'scroll':
+            cantidad = int(args[1])
+            if args[2] == 'pages':
+                cantidad *= self.filas_visibles
+            self.inicio += cantidad
+        self.pintar()
+
+    @medido('desplazar_tabla')
+    def desplazar(self, filas):
+        self.inicio += filas
+        self.pintar()
+        return 'break'
+
+    def al_rueda(self, event):
+        return self.desplazar(-3 if event.delta > 0 else 3)
+
+    def asegurar_visible(self, indice):
+        """Desplaza la ventana para que el índice de la vista quede visible"""
+        if indice < self.inicio:
+            self.inicio = indice
+        elif indice >= self.inicio + self.filas_visibles:
+            self.inicio = indice - self.filas_visibles + 1
+
+    # --- Selección -------------------------------------------------------
+
+    def seleccionar_indice(self, indice, extender=False, alternar=False):
+        """Actualiza la selección como lo haría un Treeview con selectmode extendido"""
+        posicion = int(self.vista[indice])
+        if extender and self.ancla is not None:
+            desde, hasta = sorted((self.ancla, indice))
+            self.seleccion = set(self.vista[desde:hasta + 1].tolist())
+        elif alternar:
+            self.seleccion.symmetric_difference_update({posicion})
+            self.ancla = indice
+        else:
+            self.seleccion = {posicion}
+            self.ancla = indice
+        self.cursor = indice
+
+    def al_click(self, event, extender=False, alternar=False):
+        self.tree.focus_set()
+        if self.tree.identify_region(event.x, event.y) == 'heading':
+            columna = self.tree.identify_column(event.x)
+            if self.ordenar is not None and columna.startswith('#') and columna != '#0':
+                self.ordenar_por(self.columnas[int(columna[1:]) - 1], agregar=extender)
+            return 'break'
+        item = self.tree.identify_row(event.y)
+        if item in self.items:
+            indice = self.inicio + self.items.index(item)
+            if indice < len(self.vista):
+                self.seleccionar_indice(indice, extender, alternar)
+                self.pintar()
+                self.notificar_seleccion()
+        return 'break'
+
+    def al_doble(self, event):
+        self.al_click(event)
+        if self.al_doble_click:
+            self.al_doble_click(event)
+        return 'break'
+
+    def mover_cursor(self, paso, extender=False):
+        """Mueve la fila activa con el teclado"""
+        total = len(self.vista)
+        if not total:
+            return 'break'
+        actual = self.cursor if self.cursor is not None else self.inicio
+        if paso == 'pagina-':
+            destino = actual - self.filas_visibles
+        elif paso == 'pagina+':
+            destino = actual + self.filas_visibles
+        elif paso == 'inicio':
+            destino = 0
+        elif paso == 'fin':
+            destino = total - 1
+        else:
+            destino = actual + paso
+        destino = max(0, min(destino, total - 1))
+        self.seleccionar_indice(destino, extender=extender)
+        self.asegurar_visible(destino)
+        self.pintar()
+        self.notificar_seleccion()
+        return 'break'
+
+    def notificar_seleccion(self):
+        if self.al_seleccionar:
+            self.al_seleccionar()
@@ -0,0 +1,49 @@
+"""Los agregados mantenidos fila por fila deben coincidir con los reconstruidos"""
+
+import pandas as pd
+
+from almacenamiento import COLUMNAS_CLIENTES, AlmacenamientoSQLite, asignar_valor
+from clientes import AlmacenClientes
+from esquema import concatenar
+from estadisticas import AgregadosClientes
+
+
+def almacen_con(tmp_path, filas):
+    almacenamiento = AlmacenamientoSQLite(str(tmp_path / 'clientes.db'), COLUMNAS_CLIENTES)
+    almacenamiento.inicializar()
+    almacenamiento.guardar(pd.DataFrame(filas, columns=COLUMNAS_CLIENTES))
+    clientes = AlmacenClientes(almacenamiento)
+    clientes.resumen()
+    return clientes
+
+
+def reconstruido(clientes):
+    agregados = AgregadosClientes()
+    agregados.construir(clientes.leer(), clientes.version)
+    return agregados.resumen()
+
+
+def test_vacios_en_sector_y_localidad_tras_editar_y_agregar(tmp_path):
+    clientes = almacen_con(tmp_path, [
+        {'ID': 1, 'Nombre_Empresa': 'Uno', 'Sector': 'Salud', 'Localidad': 'Cali'},
+        {'ID': 2, 'Nombre_Empresa': 'Dos', 'Sector': None, 'Localidad': ''},
+    ])
+
+    # El formulario envía todos los campos, también los que quedaron en blanco
+    cambios = {'Sector': '', 'Localidad': '  ', 'Interes': 'Alto'}
+    df = clientes.leer().copy()
+    mascara = df['ID'] == 2
+    for campo, valor in cambios.items():
+        asignar_valor(df, mascara, campo, valor)
+    clientes.actualizar(df, [2], cambios)
+
+    fila = {col: None for col in COLUMNAS_CLIENTES}
+    fila.update(ID=clientes.nuevos_ids()[0], Nombre_Empresa='Tres', Sector='', Localidad='Cali')
+    clientes.insertar(concatenar(clientes.leer(), pd.DataFrame([fila])), [fila])
+
+    resumen = clientes.resumen()
+    esperado = reconstruido(clientes)
+    assert resumen.conteos == esperado.conteos
+    assert resumen.distintos('Sector') == 1
+    assert resumen.distintos('Localidad') == 1
+    assert clientes.leer()['Sector'].isna().sum() == 2
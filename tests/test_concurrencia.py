@@ -0,0 +1,116 @@
+"""Dos copias de la aplicación sobre el mismo libro o la misma base"""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from almacenamiento import COLUMNAS_CLIENTES, AlmacenamientoExcel, AlmacenamientoSQLite
+from concurrencia import ConflictoEdicion
+
+
+def abrir(motor, ruta):
+    if motor == 'excel':
+        # Sin compactación en segundo plano: se compacta a mano
+        almacenamiento = AlmacenamientoExcel(ruta, COLUMNAS_CLIENTES, intervalo_compactacion=0)
+    else:
+        almacenamiento = AlmacenamientoSQLite(ruta, COLUMNAS_CLIENTES)
+    almacenamiento.inicializar()
+    return almacenamiento
+
+
+def dos_copias(motor, tmp_path, filas=()):
+    """Dos almacenamientos sobre el mismo archivo, con las filas dadas y ya leído por los dos"""
+    ruta = str(tmp_path / ('clientes.xlsx' if motor == 'excel' else 'clientes.db'))
+    uno, otro = abrir(motor, ruta), abrir(motor, ruta)
+    df = pd.DataFrame([dict(fila, Version=0) for fila in filas], columns=uno.columnas)
+    uno.guardar(df)
+    uno.leer()
+    otro.leer()
+    return ruta, uno, otro
+
+
+def fila_de(df, cliente_id):
+    return df[df['ID'] == cliente_id].iloc[0]
+
+
+@pytest.mark.parametrize('motor', ['excel', 'sqlite'])
+def test_version_vieja_no_pisa_el_cambio_del_otro(motor, tmp_path):
+    ruta, uno, otro = dos_copias(motor, tmp_path, [
+        {'ID': 1, 'Nombre_Empresa': 'Uno'},
+        {'ID': 2, 'Nombre_Empresa': 'Dos'},
+        {'ID': 3, 'Nombre_Empresa': 'Tres'},
+    ])
+    df = uno.leer()
+    uno.actualizar(df, [1], {'Interes': 'Alto'}, [0])
+
+    # La otra copia editó el cliente 1 en su versión 0, ya superada
+    with pytest.raises(ConflictoEdicion) as conflicto:
+        otro.actualizar(df, [1, 2], {'Interes': 'Bajo', 'Localidad': 'Cali'}, [0, 0])
+    assert conflicto.value.modificados == [1]
+    with pytest.raises(ConflictoEdicion) as conflicto:
+        otro.eliminar(df, [1], [0])
+    assert conflicto.value.modificados == [1]
+    # Eliminar lo que el otro ya eliminó no es un conflicto
+    uno.eliminar(df, [3], [0])
+    otro.eliminar(df, [3], [0])
+
+    releido = abrir(motor, ruta).leer()
+    assert sorted(releido['ID']) == [1, 2]
+    assert fila_de(releido, 1)['Interes'] == 'Alto'
+    assert pd.isna(fila_de(releido, 1)['Localidad'])
+    assert int(fila_de(releido, 1)['Version']) == 1
+    # El resto de la tanda sí se guardó
+    assert fila_de(releido, 2)['Interes'] == 'Bajo'
+    assert fila_de(releido, 2)['Localidad'] == 'Cali'
+    assert int(fila_de(releido, 2)['Version']) == 1
+
+
+def test_compactar_conserva_lo_anotado_mientras_tanto(tmp_path, monkeypatch):
+    ruta, uno, otro = dos_copias('excel', tmp_path, [{'ID': 1, 'Nombre_Empresa': 'Uno'}])
+    df = uno.leer()
+    uno.insertar(df, [{'ID': 2, 'Nombre_Empresa': 'Dos', 'Version': 1}])
+
+    # Mientras `uno` escribe el libro, sin el bloqueo, `otro` sigue anotando
+    escribir_temporales = uno.escribir_temporales
+
+    def escribir_con_otro_anotando(df):
+        otro.actualizar(otro.leer(), [1], {'Interes': 'Medio'}, [0])
+        return escribir_temporales(df)
+
+    monkeypatch.setattr(uno, 'escribir_temporales', escribir_con_otro_anotando)
+    uno.compactar()
+
+    with open(ruta + '.diario', 'rb') as f:
+        lineas = f.read().splitlines()
+    assert len(lineas) == 2 and lineas[0].startswith(AlmacenamientoExcel.PREFIJO_BASE)
+    assert b'"Medio"' in lineas[1]
+    libro = pd.read_excel(ruta)
+    assert sorted(libro['ID']) == [1, 2] and libro['Interes'].isna().all()
+
+    releido = abrir('excel', ruta).leer()
+    assert sorted(releido['ID']) == [1, 2]
+    assert fila_de(releido, 1)['Interes'] == 'Medio'
+    # La entrada que quedó en el diario conserva su versión tras el volcado
+    with pytest.raises(ConflictoEdicion):
+        uno.actualizar(df, [1], {'Interes': 'Alto'}, [0])
+
+
+@pytest.mark.parametrize('motor', ['excel', 'sqlite'])
+def test_reservas_de_ids_sin_solaparse(motor, tmp_path):
+    _, uno, otro = dos_copias(motor, tmp_path, [{'ID': 5, 'Nombre_Empresa': 'Cinco'}])
+    reservas = []
+
+    def reservar(almacenamiento, cantidad):
+        for _ in range(25):
+            reservas.append((almacenamiento.reservar_ids(cantidad), cantidad))
+
+    hilos = [threading.Thread(target=reservar, args=(almacenamiento, cantidad))
+             for almacenamiento in (uno, otro, uno, otro) for cantidad in (1, 7)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    ids = [inicio + i for inicio, cantidad in reservas for i in range(cantidad)]
+    assert len(ids) == len(set(ids)) == 4 * 25 * 8
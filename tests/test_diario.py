@@ -0,0 +1,81 @@
+"""El libro con el diario reaplicado debe dar los mismos clientes antes y después de compactar"""
+
+import pandas as pd
+
+from almacenamiento import COLUMNAS_CLIENTES, AlmacenamientoExcel, asignar_valor
+from clientes import AlmacenClientes
+from esquema import concatenar
+
+
+def abrir(ruta):
+    # Sin compactación en segundo plano: se compacta a mano
+    almacenamiento = AlmacenamientoExcel(ruta, COLUMNAS_CLIENTES, intervalo_compactacion=0)
+    almacenamiento.inicializar()
+    return AlmacenClientes(almacenamiento)
+
+
+def releido(ruta):
+    """Los clientes leídos por otra instancia, desde el libro y el diario en disco"""
+    return abrir(ruta).leer()
+
+
+def como_objetos(df):
+    """Columnas de objetos con los vacíos como None: del .xlsx el texto vuelve como str y los vacíos como NaN"""
+    return df.astype(object).where(df.notna(), None)
+
+
+def test_reaplicar_compactar_y_linea_cortada(tmp_path):
+    ruta = str(tmp_path / 'clientes.xlsx')
+    clientes = abrir(ruta)
+    filas = []
+    for nombre in ('Uno', 'Dos', 'Tres'):
+        fila = {col: None for col in COLUMNAS_CLIENTES}
+        fila.update(ID=clientes.nuevos_ids()[0], Nombre_Empresa=nombre, Sector='Salud',
+                    Fecha_Contacto='2024-01-02')
+        filas.append(fila)
+    clientes.insertar(concatenar(clientes.leer(), pd.DataFrame(filas)), filas)
+
+    cambios = {'Interes': 'Alto', 'Localidad': 'Cali'}
+    df = clientes.leer().copy()
+    mascara = df['ID'] == filas[1]['ID']
+    for campo, valor in cambios.items():
+        asignar_valor(df, mascara, campo, valor)
+    clientes.actualizar(df, [filas[1]['ID']], cambios)
+
+    df = clientes.leer()
+    clientes.eliminar(df[df['ID'] != filas[0]['ID']], [filas[0]['ID']])
+    esperado = clientes.leer()
+    assert list(esperado['Nombre_Empresa']) == ['Dos', 'Tres']
+    pd.testing.assert_frame_equal(releido(ruta), esperado)
+
+    # Una escritura cortada a medias deja una línea incompleta al final
+    with open(ruta + '.diario', 'ab') as f:
+        f.write(b'{"op": "eliminar", "ids": [')
+    pd.testing.assert_frame_equal(releido(ruta), esperado)
+
+    # Lo anotado después empieza en una línea propia
+    df = clientes.leer()
+    clientes.eliminar(df[df['ID'] != filas[2]['ID']], [filas[2]['ID']])
+    esperado = clientes.leer()
+    assert list(esperado['Nombre_Empresa']) == ['Dos']
+    pd.testing.assert_frame_equal(releido(ruta), esperado)
+
+    # El volcado deja solo la línea 'base', sin la línea cortada
+    clientes.almacenamiento.compactar()
+    with open(ruta + '.diario', 'rb') as f:
+        lineas = f.read().splitlines()
+    assert len(lineas) == 1 and lineas[0].startswith(AlmacenamientoExcel.PREFIJO_BASE)
+    pd.testing.assert_frame_equal(releido(ruta), esperado)
+
+    # Sin la instantánea, desde el .xlsx compactado
+    (tmp_path / 'clientes.xlsx.instantanea').unlink()
+    pd.testing.assert_frame_equal(como_objetos(releido(ruta)), como_objetos(esperado))
+
+    # Y lo anotado después de la línea 'base' se reaplica sobre el libro (su
+    # instantánea se regeneró desde el .xlsx, con los tipos de este)
+    cambios = {'Estado_Contacto': 'Contactado'}
+    df = clientes.leer().copy()
+    asignar_valor(df, df['ID'] == filas[1]['ID'], 'Estado_Contacto', 'Contactado')
+    clientes.actualizar(df, [filas[1]['ID']], cambios)
+    esperado = clientes.leer()
+    pd.testing.assert_frame_equal(como_objetos(releido(ruta)), como_objetos(esperado))
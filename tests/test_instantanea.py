@@ -0,0 +1,44 @@
+"""La instantánea del libro vuelve igual y no carga datos con pickle"""
+
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import instantanea
+from esquema import tipar
+
+
+def test_vuelve_igual_tal_como_se_leyo_y_tipado(tmp_path):
+    ruta = str(tmp_path / 'c.xlsx.instantanea')
+    crudo = pd.DataFrame({
+        'ID': [1, 2, 3],
+        'Nombre_Empresa': ['Ñandú', np.nan, ''],
+        'Telefono': [3001, 'abc', np.nan],
+        'Observaciones': ['a\x1fb\x00￿', 'c', np.nan],
+        'Fecha_Contacto': [pd.Timestamp('2024-01-02'), '2024-02-03', np.nan],
+        'Actualizado': [None, '2024-01-02T10:00:00', None],
+        'Version': [None, None, None],
+    })
+    for df in (crudo, crudo.iloc[:0], tipar(crudo.assign(Sector=['Salud', None, 'Salud']))):
+        instantanea.escribir(df, ruta)
+        pd.testing.assert_frame_equal(instantanea.leer(ruta), df.reset_index(drop=True))
+
+
+class Ejecuta:
+    def __reduce__(self):
+        return (os.remove, (self.ruta,))
+
+
+def test_no_carga_pickle(tmp_path):
+    testigo = tmp_path / 'testigo'
+    testigo.write_text('x')
+    dañino = Ejecuta()
+    dañino.ruta = str(testigo)
+    ruta = tmp_path / 'c.xlsx.instantanea'
+    ruta.write_bytes(pickle.dumps(dañino))
+    with pytest.raises(ValueError):
+        instantanea.leer(str(ruta))
+    assert testigo.exists()
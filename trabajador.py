@@ -0,0 +1,150 @@
+"""Hilo de entrada/salida del almacenamiento, fuera del bucle de eventos de Tk"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TrabajadorAlmacenamiento:
+    """Ejecuta en orden, en un único hilo, las lecturas y escrituras del almacenamiento.
+
+    Las escrituras se encolan y vuelven de inmediato. El hilo espera un
+    instante tras la primera para reunir las que lleguen seguidas y las pasa
+    juntas a `aplicar_lote` del motor, que las confirma con una sola
+    escritura (y descarta las anteriores a un guardado completo).
+
+    Los resultados no se entregan con callbacks desde este hilo: se dejan en
+    la cola `resultados` para que el hilo de la interfaz los recoja (en Tk,
+    sondeándola con `root.after`). Cada resultado es un diccionario con la
+    clave 'tipo': 'escritura', 'tarea' o 'progreso'.
+    """
+
+    # Espera tras la primera escritura para agrupar las siguientes, en segundos
+    RETARDO_AGRUPAR = 0.05
+
+    def __init__(self):
+        self.resultados = queue.Queue()
+        self._pendientes = []
+        self._en_curso = 0
+        self._retenido = 0
+        self._condicion = threading.Condition()
+        self._hilo = threading.Thread(target=self.ejecutar, daemon=True)
+        self._hilo.start()
+
+    # --- Encolado --------------------------------------------------------
+
+    def encolar(self, trabajo):
+        with self._condicion:
+            self._pendientes.append(trabajo)
+            self._condicion.notify_all()
+
+    def escribir(self, almacenamiento, operacion, *args):
+        """Encola una escritura (nombre del método del motor y sus argumentos)"""
+        self.encolar(('escritura', almacenamiento, operacion, args))
+
+    def tarea(self, nombre, funcion, contexto=None):
+        """Encola una función (p. ej. una lectura); su resultado llega como 'tarea'"""
+        self.encolar(('tarea', nombre, funcion, contexto))
+
+    def avisar(self, tipo, **datos):
+        """Publica un aviso (p. ej. el progreso de una lectura) para la interfaz"""
+        self.resultados.put(dict(datos, tipo=tipo))
+
+    @contextmanager
+    def agrupar(self):
+        """Retiene el hilo mientras dura el bloque: lo encolado dentro sale en una sola tanda.
+
+        No se debe llamar a `esperar` dentro del bloque.
+        """
+        with self._condicion:
+            self._retenido += 1
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._retenido -= 1
+                self._condicion.notify_all()
+
+    def escrituras_pendientes(self):
+        """Escrituras encoladas o en curso que aún no llegaron al disco"""
+        with self._condicion:
+            return self._en_curso + sum(1 for t in self._pendientes if t[0] == 'escritura')
+
+    def ocupado(self):
+        """Indica si hay trabajos encolados o en curso"""
+        with self._condicion:
+            return bool(self._pendientes) or self._en_curso > 0
+
+    def esperar(self, limite=None):
+        """Bloquea hasta completar todo lo encolado; devuelve False si se agotó el límite"""
+        with self._condicion:
+            return self._condicion.wait_for(
+                lambda: not self._pendientes and not self._en_curso, limite
+            )
+
+    # --- Hilo ------------------------------------------------------------
+
+    def ejecutar(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._pendientes)
+            # Reunir las escrituras que lleguen seguidas (p. ej. varias ediciones)
+            time.sleep(self.RETARDO_AGRUPAR)
+            with self._condicion:
+                self._condicion.wait_for(lambda: not self._retenido)
+                lote, self._pendientes = self._pendientes, []
+                self._en_curso = sum(1 for t in lote if t[0] == 'escritura')
+            try:
+                self.procesar(lote)
+            finally:
+                with self._condicion:
+                    self._en_curso = 0
+                    self._condicion.notify_all()
+
+    def procesar(self, lote):
+        """Ejecuta el lote en orden; las escrituras consecutivas van juntas"""
+        escrituras = []
+        for trabajo in lote:
+            if trabajo[0] == 'escritura':
+                escrituras.append(trabajo[1:])
+                continue
+            self.escribir_tanda(escrituras)
+            escrituras = []
+            self.ejecutar_tarea(*trabajo[1:])
+        self.escribir_tanda(escrituras)
+
+    def escribir_tanda(self, escrituras):
+        """Aplica una tanda de escrituras consecutivas, una llamada por motor"""
+        if not escrituras:
+            return
+        inicio = time.perf_counter()
+        confirmadas = 0
+        error = None
+        try:
+            # Tramos consecutivos sobre el mismo motor (cambia al migrar a SQLite)
+            tramo, almacenamiento = [], escrituras[0][0]
+            for motor, operacion, args in escrituras:
+                if motor is not almacenamiento:
+                    confirmadas += almacenamiento.aplicar_lote(tramo)
+                    tramo, almacenamiento = [], motor
+                tramo.append((operacion, args))
+            confirmadas += almacenamiento.aplicar_lote(tramo)
+        except Exception as e:
+            error = e
+        self.resultados.put({
+            'tipo': 'escritura', 'operaciones': len(escrituras), 'escrituras': confirmadas,
+            'error': error, 'segundos': time.perf_counter() - inicio,
+        })
+
+    def ejecutar_tarea(self, nombre, funcion, contexto):
+        inicio = time.perf_counter()
+        resultado = error = None
+        try:
+            resultado = funcion()
+        except Exception as e:
+            error = e
+        self.resultados.put({
+            'tipo': 'tarea', 'nombre': nombre, 'resultado': resultado, 'error': error,
+            'contexto': contexto, 'segundos': time.perf_counter() - inicio,
+        })